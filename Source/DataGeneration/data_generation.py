@@ -90,9 +90,10 @@ class M:
                 bucket_conversion.card_range_to_bucket_range(ranges[player], inputs[batch * batch_size : (batch + 1) * batch_size, player * bucket_count : (player + 1) * bucket_count])
             
             # computaton of values using re-solving
+            # all situations share the board, so they are re-solved together in one batched lookahead
             values = arguments.Tensor(constants.players_count, batch_size, game_settings.card_count)
+            current_nodes = []
             for i in range(batch_size): 
-                resolving = Resolving()
                 current_node = TreeNode()
 
                 current_node.board = board
@@ -100,12 +101,13 @@ class M:
                 current_node.current_player = constants.players.P1
                 pot_size = pot_size_features[i][0] * arguments.stack
                 current_node.bets = arguments.Tensor([pot_size, pot_size])
-                p1_range = ranges[0][i]
-                p2_range = ranges[1][i]
-                resolving.resolve_first_node(current_node, p1_range, p2_range)
-                root_values = resolving.get_root_cfv_both_players()
-                root_values.mul_(1/pot_size)
-                values[:, i, :].copy_(root_values)
+                current_nodes.append(current_node)
+            resolving = Resolving()
+            resolving.resolve_first_node_batch(current_nodes, ranges[0], ranges[1])
+            root_values = resolving.get_root_cfv_both_players()
+            pot_sizes = pot_size_features.view(batch_size, 1, 1).mul(arguments.stack)
+            root_values.div_(pot_sizes.expand_as(root_values))
+            values.copy_(root_values.transpose(0, 1))
             
             # translating values to nn targets
             for player in range(constants.players_count):
@@ -74,6 +74,51 @@ class M:
         else:
             assert False, 'unsupported size of hand!'
 
+    def batch_eval_boards(self, boards, impossible_hand_value=-1):
+        ''' Gives strength representations for all private hands on each of a batch of boards.
+
+        Evaluates every pair of board and private card at once with tensor operations,
+        giving the same values as @{evaluate}.
+
+        Params:
+            boards: an NxC tensor of N boards with C = 1 or 2 cards each
+            impossible_hand_value: the value to assign to hands which are invalid on a board
+        Return an NxK tensor containing a strength value or `impossible_hand_value` for
+        every private hand on every board'''
+        board_count, board_size = boards.size(0), boards.size(1)
+        assert board_size == 1 or board_size == 2, 'Incorrect board size for Leduc'
+        rank_count = game_settings.rank_count
+        cards = torch.arange(game_settings.card_count, device=boards.device).view(1, -1, 1)
+        hands = torch.cat([boards.long().view(board_count, 1, board_size).expand(-1, game_settings.card_count, -1),
+                           cards.expand(board_count, -1, -1)], dim=2)
+        ranks, _ = (hands // game_settings.suit_count).sort(dim=2)
+        if board_size == 1:
+            pair = ranks[:, :, 0] == ranks[:, :, 1]
+            hand_values = torch.where(pair, ranks[:, :, 0], (ranks[:, :, 0] + 1) * rank_count + ranks[:, :, 1])
+        else:
+            low_pair = ranks[:, :, 0] == ranks[:, :, 1]
+            high_pair = ranks[:, :, 1] == ranks[:, :, 2]
+            high_card = (ranks[:, :, 0] * rank_count + ranks[:, :, 1]) * rank_count + ranks[:, :, 2]
+            hand_values = torch.where(high_pair, ranks[:, :, 1] * rank_count + ranks[:, :, 0], high_card)
+            hand_values = torch.where(low_pair, ranks[:, :, 0] * rank_count + ranks[:, :, 2], hand_values)
+        # a hand is invalid if any card is repeated
+        sorted_hands, _ = hands.sort(dim=2)
+        impossible = (sorted_hands[:, :, 1:] == sorted_hands[:, :, :-1]).any(dim=2)
+        hand_values = hand_values.type(arguments.Tensor)
+        hand_values.masked_fill_(impossible.to(hand_values.device), impossible_hand_value)
+        return hand_values
+
+    def _get_strength_table(self):
+        ''' Gives the strength of every private hand on every second-round board,
+        computing the table at the first call for the current deck.
+
+        Return a BxK tensor indexed by @{card_tools.get_board_index} and the private card'''
+        deck = (game_settings.card_count, game_settings.board_card_count)
+        if getattr(self, '_strength_table_deck', None) != deck:
+            self._strength_table = self.batch_eval_boards(card_tools.get_second_round_boards())
+            self._strength_table_deck = deck
+        return self._strength_table
+
     def batch_eval(self, board, impossible_hand_value=-1):
         ''' Gives strength representations for all private hands on the given board.
 
@@ -82,18 +127,11 @@ class M:
             impossible_hand_value: the value to assign to hands which are invalid on the board
         Return a vector containing a strength value or `impossible_hand_value` for
         every private hand'''
-        hand_values = arguments.Tensor(game_settings.card_count).fill_(-1)
-        if board.dim() == 0:
-            for hand in range(game_settings.card_count): 
-                hand_values[hand] = (hand // game_settings.suit_count) + 1
-        else:
-            board_size = board.size(0)
-            assert board_size == 1 or board_size == 2, 'Incorrect board size for Leduc'
-            whole_hand = arguments.IntTensor(board_size + 1)
-            whole_hand[:-1].copy_(board)
-            for card in range(game_settings.card_count): 
-                whole_hand[-1] = card
-                hand_values[card] = self.evaluate(whole_hand, impossible_hand_value)
-        return hand_values
+        if board.dim() == 0 or board.size(0) == 0:
+            hand_values = (torch.arange(game_settings.card_count) // game_settings.suit_count).add(1)
+            return hand_values.type(arguments.Tensor)
+        if board.size(0) == game_settings.board_card_count and impossible_hand_value == -1:
+            return self._get_strength_table()[card_tools.get_board_index(board)].clone()
+        return self.batch_eval_boards(board.view(1, -1), impossible_hand_value)[0]
 
 evaluator = M()
\ No newline at end of file
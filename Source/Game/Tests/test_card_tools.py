@@ -0,0 +1,37 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.game_settings import game_settings
+from Source.Game.card_tools import card_tools
+import torch
+
+def loop_possible_hand_indexes(board):
+    # the valid hands from checking each hand with the board
+    out = arguments.Tensor(game_settings.card_count).fill_(1)
+    whole_hand = arguments.IntTensor(board.size(0) + 1)
+    whole_hand[:-1].copy_(board)
+    for card in range(game_settings.card_count):
+        whole_hand[-1] = card
+        if not card_tools.hand_is_possible(whole_hand):
+            out[card] = 0
+    return out
+
+if __name__ == "__main__":
+    for board_card_count in [1, 2]:
+        game_settings.board_card_count = board_card_count
+        boards = card_tools.get_second_round_boards()
+
+        indexes = card_tools.get_board_indexes(boards)
+        assert torch.equal(indexes.long(), torch.arange(boards.size(0)))
+        for i in range(boards.size(0)):
+            assert card_tools.get_board_index(boards[i]) == i
+            assert torch.equal(card_tools.get_possible_hand_indexes(boards[i]), loop_possible_hand_indexes(boards[i]))
+        assert torch.equal(card_tools.get_possible_hand_indexes(arguments.Tensor()), arguments.Tensor(game_settings.card_count).fill_(1))
+
+    # the masks are copies, so modifying one does not change the table
+    mask = card_tools.get_possible_hand_indexes(boards[0])
+    mask.mul_(2)
+    uniform_range = card_tools.get_uniform_range(boards[0])
+    impossible_hands = card_tools.get_impossible_hand_indexes(boards[0])
+    assert torch.equal(card_tools.get_possible_hand_indexes(boards[0]), loop_possible_hand_indexes(boards[0]))
+    print('board tables match the loops')
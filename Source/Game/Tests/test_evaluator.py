@@ -0,0 +1,44 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.game_settings import game_settings
+from Source.Game.card_tools import card_tools
+from Source.Game.Evaluation.evaluator import evaluator
+import torch
+import time
+
+def loop_eval(board):
+    # the strength of each hand from the evaluation of its cards
+    hand_values = arguments.Tensor(game_settings.card_count)
+    whole_hand = arguments.IntTensor(board.size(0) + 1)
+    whole_hand[:-1].copy_(board)
+    for card in range(game_settings.card_count):
+        whole_hand[-1] = card
+        hand_values[card] = evaluator.evaluate(whole_hand)
+    return hand_values
+
+if __name__ == "__main__":
+    # the one-card board of Leduc and the two-card board of extended Leduc
+    for board_card_count in [1, 2]:
+        game_settings.board_card_count = board_card_count
+        boards = card_tools.get_second_round_boards()
+
+        timer = time.time()
+        expected = torch.stack([loop_eval(boards[i]) for i in range(boards.size(0))])
+        loop_time = time.time() - timer
+
+        timer = time.time()
+        values = evaluator.batch_eval_boards(boards)
+        batch_time = time.time() - timer
+        print(f'{boards.size(0)} boards of {board_card_count} cards: loop {loop_time:.4f}s, vectorized {batch_time:.6f}s')
+        assert torch.equal(values, expected)
+
+    # the strength table follows the board index of the game's boards
+    game_settings.board_card_count = 1
+    boards = card_tools.get_second_round_boards()
+    for i in range(boards.size(0)):
+        assert torch.equal(evaluator.batch_eval(boards[i]), loop_eval(boards[i]))
+
+    # without a board, hands are ranked by their card's rank
+    expected = arguments.Tensor([card // game_settings.suit_count + 1 for card in range(game_settings.card_count)])
+    assert torch.equal(evaluator.batch_eval(arguments.IntTensor()), expected)
@@ -13,7 +13,19 @@ import numpy
 class M:
     def __init__(self):
         super().__init__()
+        self._init_board_tables()
+
+    def _init_board_tables(self):
+        ''' Initializes the tables which are looked up by board for the current deck.'''
+        self._board_tables_deck = (game_settings.card_count, game_settings.board_card_count)
         self._init_board_index_table()
+        self._init_board_mask_table()
+
+    def _check_board_tables(self):
+        ''' Rebuilds the board tables if the deck in `game_settings` has changed since
+        they were built.'''
+        if self._board_tables_deck != (game_settings.card_count, game_settings.board_card_count):
+            self._init_board_tables()
 
     def hand_is_possible(self, hand):
         ''' Gives whether a set of cards is valid.
@@ -30,21 +42,20 @@ class M:
     def get_possible_hand_indexes(self, board):
         ''' Gives the private hands which are valid with a given board.
 
+        The vector is a copy of a row of a precomputed table, so callers may modify it.
+
         Params:
             board: a possibly empty vector of board cards
         Return a vector with an entry for every possible hand (private card), which
         is `1` if the hand shares no cards with the board and `0` otherwise'''
-        out = arguments.Tensor(game_settings.card_count).fill_(0)
-        if board.dim() == 0:
-            out.fill_(1)
-            return out
-
-        whole_hand = arguments.IntTensor(board.size(0) + 1)
-        whole_hand[:-1].copy_(board)
-        for card in range(game_settings.card_count): 
-            whole_hand[-1] = card
-            if self.hand_is_possible(whole_hand):
-                out[card] = 1
+        self._check_board_tables()
+        if board.dim() == 0 or board.size(0) == 0:
+            return self._board_mask_table[-1].clone()
+        if board.size(0) == game_settings.board_card_count:
+            return self._board_mask_table[self.get_board_index(board)].clone()
+        # a partial board is not in the table
+        out = arguments.Tensor(game_settings.card_count).fill_(1)
+        out[board.long()] = 0
         return out
 
     def get_impossible_hand_indexes(self, board):
@@ -162,18 +173,37 @@ class M:
         else:
             assert False, 'unsupported board size'
 
+    def _init_board_mask_table(self):
+        ''' Initializes the table of the valid private hands on each board.
+
+        Row `i` belongs to the board with @{get_board_index} `i` and the last row to the
+        empty board. Its rows are only handed out as copies, so callers cannot modify it.'''
+        boards = self.get_second_round_boards()
+        self._board_mask_table = arguments.Tensor(boards.size(0) + 1, game_settings.card_count).fill_(1)
+        self._board_mask_table[:-1].scatter_(1, boards.long().to(self._board_mask_table.device), 0)
+
     def get_board_index(self, board):
         ''' Gives a numerical index for a set of board cards.
 
         Params:
             board: a non-empty vector of board cards
         Return the numerical index for the board'''
-        index = self._board_index_table
-        for i in range(board.size(0)):
-            index = index[board[i]]
+        self._check_board_tables()
+        index = self._board_index_table[tuple(board.long().tolist())]
         assert index >= 0, index
         return index
 
+    def get_board_indexes(self, boards):
+        ''' Gives the numerical indexes of a batch of boards.
+
+        Params:
+            boards: an NxC tensor of N boards with C cards each
+        Return a vector of the @{get_board_index} of each board'''
+        self._check_board_tables()
+        indexes = self._board_index_table[tuple(boards.long().t())]
+        assert indexes.min() >= 0, 'invalid board'
+        return indexes
+
     def normalize_range(self, board, _range):
         ''' Normalizes a range vector over hands which are valid with a given board.
 
@@ -0,0 +1,84 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.cfr_update_rules import cfr_update_rules
+from Source.Lookahead.resolving import Resolving
+from Source.Tree.tree_builder import TreeNode
+import torch
+
+def accumulate(iteration_regrets):
+    ''' Accumulates the regrets of each iteration with the discounts of the current rule.'''
+    regrets = iteration_regrets[0].clone().zero_()
+    for i in range(len(iteration_regrets)):
+        cfr_update_rules.discount_regrets(regrets, i)
+        regrets.add_(iteration_regrets[i])
+    return regrets
+
+def resolve(rule, player_range, opponent_cfvs):
+    arguments.cfr_update_rule = rule
+    resolving = Resolving()
+    current_node = TreeNode()
+
+    current_node.board = card_to_string.string_to_board('Ks')
+    current_node.street = 2
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    return resolving.resolve(current_node, player_range, opponent_cfvs)
+
+if __name__ == "__main__":
+    torch.manual_seed(0)
+    iteration_regrets = [arguments.Tensor(10).uniform_(-1, 1) for _ in range(5)]
+
+    arguments.cfr_update_rule = 'cfr+'
+    assert cfr_update_rules.clamps_regrets()
+    assert [cfr_update_rules.average_weight(i) for i in range(3)] == [1, 1, 1]
+    assert torch.allclose(accumulate(iteration_regrets), sum(iteration_regrets))
+
+    arguments.cfr_update_rule = 'cfr+_linear_avg'
+    assert cfr_update_rules.clamps_regrets()
+    assert [cfr_update_rules.average_weight(i) for i in range(3)] == [1, 2, 3]
+    assert cfr_update_rules.regret_discounts(3) == None
+
+    # linear CFR weights the regrets of iteration t by t, up to the common factor 1/T
+    arguments.cfr_update_rule = 'linear'
+    assert not cfr_update_rules.clamps_regrets()
+    assert [cfr_update_rules.average_weight(i) for i in range(3)] == [1, 2, 3]
+    weighted_regrets = sum((i + 1) * regrets for i, regrets in enumerate(iteration_regrets)) / len(iteration_regrets)
+    assert torch.allclose(accumulate(iteration_regrets), weighted_regrets, atol=1e-6)
+
+    # DCFR discounts positive and negative regrets separately
+    arguments.cfr_update_rule = 'dcfr'
+    assert not cfr_update_rules.clamps_regrets()
+    assert [cfr_update_rules.average_weight(i) for i in range(3)] == [1, 4, 9]
+    positive_discount, negative_discount = cfr_update_rules.regret_discounts(4)
+    assert abs(positive_discount - 4 ** 1.5 / (4 ** 1.5 + 1)) < 1e-12
+    assert negative_discount == 0.5
+    regrets = arguments.Tensor([2, -2])
+    cfr_update_rules.discount_regrets(regrets, 4)
+    assert torch.allclose(regrets, arguments.Tensor([2 * positive_discount, -1]))
+
+    arguments.cfr_update_rule = 'cfr'
+    try:
+        cfr_update_rules.clamps_regrets()
+        assert False, 'an unknown rule must be rejected'
+    except AssertionError as error:
+        assert str(error) == 'unknown cfr update rule'
+
+    # every rule re-solves to a strategy close to the cfr+ one, but not the same
+    board = card_to_string.string_to_board('Ks')
+    player_range = card_tools.get_random_range(board, 2)
+    opponent_cfvs = card_tools.get_random_range(board, 4)
+    strategies = {}
+    for rule in cfr_update_rules.rules:
+        strategy = resolve(rule, player_range, opponent_cfvs).strategy
+        assert torch.allclose(strategy.sum(0)[player_range.gt(0)], arguments.Tensor([1]), atol=1e-4)
+        strategies[rule] = strategy
+    arguments.cfr_update_rule = 'cfr+'
+    for rule in cfr_update_rules.rules[1:]:
+        difference = (strategies[rule] - strategies['cfr+']).abs().max().item()
+        print(f'{rule}: largest difference from cfr+ {difference:.4f}')
+        assert 0 < difference < 0.05
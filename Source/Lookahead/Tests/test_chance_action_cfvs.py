@@ -0,0 +1,49 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Lookahead.resolving import Resolving
+from Source.Tree.tree_builder import TreeNode
+import torch
+import time
+
+if __name__ == "__main__":
+    resolving = Resolving()
+    current_node = TreeNode()
+
+    current_node.board = arguments.Tensor()
+    current_node.street = 1
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    player_range = card_tools.get_random_range(current_node.board, 2)
+    opponent_range = card_tools.get_random_range(current_node.board, 4)
+    resolving.resolve_first_node(current_node, player_range, opponent_range)
+
+    boards = card_tools.get_second_round_boards()
+    for action in resolving.get_possible_actions():
+        # the call closes the first round, so the values only exist for bets
+        if action == constants.actions.fold or (action == constants.actions.ccall and resolving.lookahead.first_call_terminal):
+            continue
+        # the call of an allin ends the game, so no chance event follows it
+        if action == arguments.stack:
+            try:
+                resolving.get_chance_action_cfvs(action)
+            except AssertionError as error:
+                print(f'action {int(action)}: {error}')
+            else:
+                assert False, 'the values after an allin must not be given'
+            continue
+
+        timer = time.time()
+        all_boards_cfvs = resolving.get_chance_action_cfvs(action)
+        all_boards_time = time.time() - timer
+
+        timer = time.time()
+        for i in range(boards.size(0)):
+            board = boards[i]
+            board_cfvs = resolving.get_chance_action_cfv(action, board)
+            assert torch.allclose(board_cfvs, all_boards_cfvs[card_tools.get_board_index(board)], atol=1e-5)
+        board_time = time.time() - timer
+        print(f'action {int(action)}: all boards: {all_boards_time:.4f}s, board by board: {board_time:.4f}s')
@@ -0,0 +1,72 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.resolving import Resolving
+from Source.Tree.tree_builder import TreeNode
+import torch
+
+class ZeroNn:
+    ''' Gives zero values, so that only the allocations around the neural net are counted.'''
+    def get_value(self, inputs, output):
+        output.zero_()
+
+if __name__ == "__main__":
+    resolving = Resolving()
+    current_node = TreeNode()
+
+    current_node.board = card_to_string.string_to_board('Ks')
+    current_node.street = 2
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    player_range = card_tools.get_random_range(current_node.board, 2)
+    opponent_cfvs = card_tools.get_random_range(current_node.board, 4)
+
+    resolving.resolve(current_node, player_range, opponent_cfvs)
+    lookahead = resolving.lookahead
+
+    # the iterations after the first one must not allocate any memory
+    iters = 10
+    with torch.autograd.profiler.profile(profile_memory=True) as prof:
+        for i in range(iters):
+            lookahead._compute_iteration(arguments.cfr_iters + i)
+
+    allocations = [event.name for event in prof.function_events if event.self_cpu_memory_usage > 0]
+    print('allocations per iteration:', len(allocations) / iters)
+    assert len(allocations) == 0, allocations
+
+    # with pruning, only the iterations which check the pruned states allocate
+    arguments.lookahead_pruning = True
+    resolving = Resolving()
+    resolving.resolve(current_node, player_range, opponent_cfvs)
+    lookahead = resolving.lookahead
+    with torch.autograd.profiler.profile(profile_memory=True) as prof:
+        for i in range(1, arguments.lookahead_pruning_check_iters):
+            lookahead._compute_iteration(arguments.cfr_iters + i)
+    arguments.lookahead_pruning = False
+
+    allocations = [event.name for event in prof.function_events if event.self_cpu_memory_usage > 0]
+    print('allocations per pruned iteration:', len(allocations) / (arguments.lookahead_pruning_check_iters - 1))
+    assert len(allocations) == 0, allocations
+
+    # on the first street, the live states are gathered into preallocated buffers for the neural net
+    current_node.board = arguments.Tensor()
+    current_node.street = 1
+    player_range = card_tools.get_random_range(current_node.board, 2)
+    opponent_range = card_tools.get_random_range(current_node.board, 4)
+    arguments.lookahead_pruning = True
+    resolving = Resolving()
+    resolving.resolve_first_node(current_node, player_range, opponent_range)
+    lookahead = resolving.lookahead
+    lookahead.next_street_box.nn = ZeroNn()
+    with torch.autograd.profiler.profile(profile_memory=True) as prof:
+        for i in range(1, arguments.lookahead_pruning_check_iters):
+            lookahead._compute_iteration(arguments.cfr_iters + i)
+    arguments.lookahead_pruning = False
+
+    allocations = [event.name for event in prof.function_events if event.self_cpu_memory_usage > 0]
+    print('allocations per pruned first street iteration:', len(allocations) / (arguments.lookahead_pruning_check_iters - 1))
+    assert len(allocations) == 0, allocations
@@ -0,0 +1,40 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Settings.game_settings import game_settings
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.resolving import Resolving
+from Source.Tree.tree_builder import TreeNode
+import torch
+
+if __name__ == "__main__":
+    torch.set_printoptions(sci_mode=False)
+    board = card_to_string.string_to_board('Ks')
+    pot_sizes = [100, 300, 700]
+
+    nodes = []
+    player_ranges = arguments.Tensor(len(pot_sizes), game_settings.card_count)
+    opponent_ranges = arguments.Tensor(len(pot_sizes), game_settings.card_count)
+    for i in range(len(pot_sizes)):
+        current_node = TreeNode()
+        current_node.board = board
+        current_node.street = 2
+        current_node.current_player = constants.players.P1
+        current_node.bets = arguments.Tensor([pot_sizes[i], pot_sizes[i]])
+        nodes.append(current_node)
+        player_ranges[i].copy_(card_tools.get_random_range(board, 2 * i + 2))
+        opponent_ranges[i].copy_(card_tools.get_random_range(board, 2 * i + 3))
+
+    resolving = Resolving()
+    resolving.resolve_first_node_batch(nodes, player_ranges, opponent_ranges)
+    batch_values = resolving.get_root_cfv_both_players()
+
+    # every situation of the batch must match a separate re-solve
+    for i in range(len(pot_sizes)):
+        resolving = Resolving()
+        resolving.resolve_first_node(nodes[i], player_ranges[i], opponent_ranges[i])
+        values = resolving.get_root_cfv_both_players()
+        print(pot_sizes[i], (values - batch_values[i]).abs().max().item())
+        assert torch.allclose(values, batch_values[i], rtol=1e-3, atol=1e-2)
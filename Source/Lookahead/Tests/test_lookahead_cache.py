@@ -0,0 +1,49 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Settings.precision_policy import precision_policy
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead import resolving
+from Source.Tree.tree_builder import TreeNode
+import torch
+
+def resolve(player_range, opponent_cfvs):
+    current_resolving = resolving.Resolving()
+    current_node = TreeNode()
+
+    current_node.board = card_to_string.string_to_board('Ks')
+    current_node.street = 2
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    results = current_resolving.resolve(current_node, player_range.type(arguments.Tensor), opponent_cfvs.type(arguments.Tensor))
+    return results, current_resolving.lookahead_tree
+
+if __name__ == "__main__":
+    board = card_to_string.string_to_board('Ks')
+    player_range = card_tools.get_random_range(board, 2)
+    opponent_cfvs = card_tools.get_random_range(board, 4)
+    arguments.cfr_iters = 100
+    arguments.cfr_skip_iters = 50
+
+    # a re-solve at the same state reuses the template and gives the same results
+    results, tree = resolve(player_range, opponent_cfvs)
+    cached_results, cached_tree = resolve(player_range, opponent_cfvs)
+    assert len(resolving.lookahead_templates) == 1 and cached_tree is tree
+    assert torch.equal(results.strategy, cached_results.strategy)
+
+    # the settings the lookahead is built with need other templates
+    arguments.bet_sizing = [0.5, 1]
+    bet_sizing_results, bet_sizing_tree = resolve(player_range, opponent_cfvs)
+    assert len(resolving.lookahead_templates) == 2 and bet_sizing_tree is not tree
+    assert bet_sizing_results.strategy.size(0) == results.strategy.size(0) + 1
+    arguments.bet_sizing = [1]
+
+    precision_policy.configure('float64')
+    float64_results, _ = resolve(player_range, opponent_cfvs)
+    precision_policy.configure('float32')
+    assert len(resolving.lookahead_templates) == 3
+    assert float64_results.strategy.dtype == torch.float64
+    print(f'{len(resolving.lookahead_templates)} templates')
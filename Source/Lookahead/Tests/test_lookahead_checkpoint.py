@@ -0,0 +1,49 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.resolving import Resolving
+from Source.Tree.tree_builder import TreeNode
+import torch
+import os
+import tempfile
+
+def resolve(cfr_iters, street, board, player_range, opponent_cfvs, checkpoint_file=None):
+    arguments.cfr_iters = cfr_iters
+    resolving = Resolving()
+    resolving.checkpoint_file = checkpoint_file
+    current_node = TreeNode()
+
+    current_node.board = board
+    current_node.street = street
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    return resolving.resolve(current_node, player_range, opponent_cfvs)
+
+if __name__ == "__main__":
+    iters = arguments.cfr_iters
+    # the first street also restores the state of the neural net values, which are reused between evaluations
+    arguments.nn_eval_iters = 3
+    for street, board_string in [(2, 'Ks'), (1, '')]:
+        board = card_to_string.string_to_board(board_string)
+        player_range = card_tools.get_random_range(board, 2)
+        opponent_cfvs = card_tools.get_random_range(board, 4)
+
+        full_results = resolve(2 * iters, street, board, player_range, opponent_cfvs)
+
+        # the first half is saved, then continued by another re-solving from the file
+        checkpoint_file = os.path.join(tempfile.mkdtemp(), 'resolve.pt')
+        resolve(iters, street, board, player_range, opponent_cfvs, checkpoint_file)
+        print(f'street {street} checkpoint: {os.path.getsize(checkpoint_file)} bytes')
+        resumed_results = Resolving().resume_checkpoint(checkpoint_file, iters)
+
+        # resuming must give exactly the same results, including the NaN cfvs after the fold which the root cannot take
+        assert resumed_results.iterations == full_results.iterations
+        assert torch.equal(full_results.strategy, resumed_results.strategy)
+        assert torch.equal(full_results.achieved_cfvs, resumed_results.achieved_cfvs)
+        assert torch.allclose(full_results.children_cfvs, resumed_results.children_cfvs, rtol=0, atol=0, equal_nan=True)
+    arguments.cfr_iters = iters
+    arguments.nn_eval_iters = 1
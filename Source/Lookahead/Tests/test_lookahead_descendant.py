@@ -0,0 +1,58 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Settings.game_settings import game_settings
+from Source.Lookahead.resolving import Resolving
+from Source.Tree.tree_builder import *
+from Source.Tree.flat_tree_cfr import FlatTreeCFR
+import torch
+
+if __name__ == "__main__":
+    arguments.lookahead_average_all_depths = True
+    resolving = Resolving()
+    current_node = TreeNode()
+
+    current_node.board = card_to_string.string_to_board('Ks')
+    current_node.street = 2
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    player_range = card_tools.get_random_range(current_node.board, 2)
+    opponent_range = card_tools.get_random_range(current_node.board, 4)
+    resolving.resolve_first_node(current_node, player_range, opponent_range)
+
+    # P1 checks and P2 bets
+    check_node = resolving.lookahead_tree.children[1]
+    bet_node = check_node.children[2]
+    descendant = resolving.get_descendant(bet_node)
+    assert descendant != None
+    print(f'reach of the opponent actions: {descendant.resolve_results.reach:.3f}')
+
+    possible_hands = card_tools.get_possible_hand_indexes(current_node.board).bool()
+    strategy = descendant.resolve_results.strategy
+    assert strategy.size(0) == bet_node.actions.size(0)
+    assert torch.allclose(strategy.sum(dim=0)[possible_hands], torch.ones(int(possible_hands.sum())).type_as(strategy), atol=1e-4)
+
+    # on the last street the lookahead is the whole subgame, so solving the full tree with the same
+    # ranges gives the same average strategy at the decision
+    params = TreeParams()
+    params.root_node = current_node
+    flat_tree = PokerTreeBuilder().build_flat_tree(params)
+    starting_ranges = arguments.Tensor(constants.players_count, game_settings.card_count)
+    starting_ranges[0].copy_(player_range)
+    starting_ranges[1].copy_(opponent_range)
+    flat_tree_cfr = FlatTreeCFR()
+    flat_tree_cfr.run_cfr(flat_tree, starting_ranges, arguments.cfr_iters)
+    tree = flat_tree.to_tree(strategy=flat_tree_cfr.strategy)
+    tree_bet_node = tree.children[1].children[2]
+    assert torch.equal(tree_bet_node.bets, bet_node.bets)
+
+    # the hands which rarely reach the decision have barely converged, so the difference is weighted by the reach
+    reach = player_range * resolving.get_action_strategy(constants.actions.ccall)
+    reach = reach / reach.sum()
+    difference = ((strategy - tree_bet_node.strategy).abs().sum(dim=0) * reach).sum().item()
+    print(f'strategy difference to the full tree: {difference:.4f}')
+    assert difference < 0.05
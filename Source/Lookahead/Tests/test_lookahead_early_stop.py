@@ -0,0 +1,44 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.resolving import Resolving
+from Source.Tree.tree_builder import TreeNode
+import torch
+
+def resolve(early_stop, player_range, opponent_cfvs):
+    arguments.cfr_early_stop = early_stop
+    resolving = Resolving()
+    current_node = TreeNode()
+
+    current_node.board = card_to_string.string_to_board('Ks')
+    current_node.street = 2
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    return resolving.resolve(current_node, player_range, opponent_cfvs)
+
+if __name__ == "__main__":
+    board = card_to_string.string_to_board('Ks')
+    player_range = card_tools.get_random_range(board, 2)
+    opponent_cfvs = card_tools.get_random_range(board, 4)
+
+    full_results = resolve(False, player_range, opponent_cfvs)
+    early_results = resolve(True, player_range, opponent_cfvs)
+    print(f'iterations: {full_results.iterations} full, {early_results.iterations} with early stop')
+    print('strategy difference:', (full_results.strategy - early_results.strategy).abs().max().item())
+
+    # the re-solve stops at a convergence check once the minimum number of iterations is run
+    assert full_results.iterations == arguments.cfr_iters
+    assert arguments.cfr_min_iters <= early_results.iterations < arguments.cfr_iters
+    assert (early_results.iterations - arguments.cfr_skip_iters) % arguments.cfr_check_iters == 0
+    assert torch.allclose(full_results.strategy, early_results.strategy, atol=1e-2)
+
+    # without any tolerance the re-solve never stops early
+    arguments.cfr_tolerance = 0
+    strict_results = resolve(True, player_range, opponent_cfvs)
+    arguments.cfr_early_stop = False
+    assert strict_results.iterations == arguments.cfr_iters
+    assert torch.equal(full_results.strategy, strict_results.strategy)
@@ -0,0 +1,58 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.resolving import Resolving
+from Source.Lookahead import lookahead_kernels
+from Source.Tree.tree_builder import TreeNode
+import torch
+import time
+
+def resolve(kernel, player_range, opponent_cfvs):
+    arguments.lookahead_kernel = kernel
+    resolving = Resolving()
+    current_node = TreeNode()
+
+    current_node.board = card_to_string.string_to_board('Ks')
+    current_node.street = 2
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    timer = time.time()
+    results = resolving.resolve(current_node, player_range, opponent_cfvs)
+    return results, time.time() - timer
+
+if __name__ == "__main__":
+    board = card_to_string.string_to_board('Ks')
+    player_range = card_tools.get_random_range(board, 2)
+    opponent_cfvs = card_tools.get_random_range(board, 4)
+
+    # the first re-solve of each engine also compiles or builds, so it is not timed
+    resolve(None, player_range, opponent_cfvs)
+    resolve('script', player_range, opponent_cfvs)
+
+    eager_results, eager_time = resolve(None, player_range, opponent_cfvs)
+    script_results, script_time = resolve('script', player_range, opponent_cfvs)
+    print(f'eager: {eager_time:.3f}s, script: {script_time:.3f}s, speedup: {eager_time / script_time:.2f}x')
+
+    # the compiled kernel must give exactly the same results, including the NaN cfvs after the fold
+    # which the root cannot take
+    assert torch.equal(eager_results.strategy, script_results.strategy)
+    assert torch.equal(eager_results.achieved_cfvs, script_results.achieved_cfvs)
+    assert torch.allclose(eager_results.children_cfvs, script_results.children_cfvs, rtol=0, atol=0, equal_nan=True)
+
+    # the kernel leaves the terminal equities to the TerminalEquity, so it also matches a sort-based one
+    arguments.terminal_equity_sort_min_cards = 0
+    eager_results, _ = resolve(None, player_range, opponent_cfvs)
+    script_results, _ = resolve('script', player_range, opponent_cfvs)
+    arguments.terminal_equity_sort_min_cards = None
+    assert torch.equal(eager_results.strategy, script_results.strategy)
+    assert torch.allclose(eager_results.children_cfvs, script_results.children_cfvs, rtol=0, atol=0, equal_nan=True)
+
+    # lookaheads of other shapes reuse the same compiled kernels
+    arguments.bet_sizing = [0.5, 1]
+    resolve('script', player_range, opponent_cfvs)
+    arguments.bet_sizing = [1]
+    assert list(lookahead_kernels.compiled_kernels) == ['script']
@@ -0,0 +1,42 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.resolving import Resolving
+from Source.Lookahead.lookahead_profile import memory_report
+from Source.Tree.tree_builder import TreeNode
+import torch
+
+def resolve(compact_layout, player_range, opponent_range):
+    arguments.lookahead_compact_layout = compact_layout
+    resolving = Resolving()
+    current_node = TreeNode()
+
+    current_node.board = card_to_string.string_to_board('Ks')
+    current_node.street = 2
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    resolving.resolve_first_node(current_node, player_range, opponent_range)
+    return resolving.get_root_cfv_both_players(), resolving.lookahead.get_memory_footprint()
+
+if __name__ == "__main__":
+    # several bet sizes make the lookahead deeper and wider
+    arguments.bet_sizing = [1, 2]
+    board = card_to_string.string_to_board('Ks')
+    player_range = card_tools.get_random_range(board, 2)
+    opponent_range = card_tools.get_random_range(board, 4)
+
+    values, footprint = resolve(False, player_range, opponent_range)
+    compact_values, compact_footprint = resolve(True, player_range, opponent_range)
+    print(memory_report(footprint))
+    print(memory_report(compact_footprint))
+
+    total = sum(sum(family.values()) for family in footprint.values())
+    compact_total = sum(sum(family.values()) for family in compact_footprint.values())
+    print(f'full: {total} bytes, compact: {compact_total} bytes ({compact_total / total:.1%})')
+    assert compact_total < total
+    # the layout does not change the computation
+    assert torch.equal(values, compact_values)
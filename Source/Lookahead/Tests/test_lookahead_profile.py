@@ -0,0 +1,45 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.resolving import Resolving
+from Source.Tree.tree_builder import TreeNode
+import torch
+
+def resolve(board, street, profile_rate):
+    arguments.lookahead_profile_rate = profile_rate
+    resolving = Resolving()
+    current_node = TreeNode()
+
+    current_node.board = card_to_string.string_to_board(board)
+    current_node.street = street
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    player_range = card_tools.get_random_range(current_node.board, 2)
+    opponent_range = card_tools.get_random_range(current_node.board, 4)
+    return resolving.resolve_first_node(current_node, player_range, opponent_range)
+
+if __name__ == "__main__":
+    arguments.cfr_iters = 100
+    arguments.cfr_skip_iters = 50
+    for board, street in [('Ks', 2), ('', 1)]:
+        results = resolve(board, street, 0)
+        assert results.profile == None
+        profiled_results = resolve(board, street, 1)
+        profile = profiled_results.profile
+        print(profile.report())
+
+        # every phase runs once per iteration, and profiling does not change the re-solve
+        assert profile.iterations == arguments.cfr_iters
+        assert ('compute_terminal_equities_next_street_box' in profile.calls) == (street == 1)
+        assert len(profile.calls) == (11 if street == 1 else 10)
+        assert all(calls == profile.iterations for calls in profile.calls.values())
+        assert 0 < sum(profile.times.values()) <= profile.total_time
+        assert torch.equal(results.strategy, profiled_results.strategy)
+
+        # the tensors of every depth are recorded
+        assert sorted(profile.tensor_sizes) == sorted(profile.memory['ranges_data'])
+        assert all(size > 0 for size in profile.memory['ranges_data'].values())
@@ -0,0 +1,93 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Settings.game_settings import game_settings
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.resolving import Resolving
+from Source.Tree.tree_builder import TreeNode
+import torch
+import time
+
+def resolve(pruning, player_range, opponent_range, board='Ks', street=2):
+    arguments.lookahead_pruning = pruning
+    resolving = Resolving()
+    current_node = TreeNode()
+
+    current_node.board = card_to_string.string_to_board(board)
+    current_node.street = street
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    timer = time.time()
+    resolving.resolve_first_node(current_node, player_range, opponent_range)
+    return resolving, time.time() - timer
+
+def count_fold_ranges(lookahead):
+    ''' Gives the number of ranges at the fold states, those below padded actions and those evaluated at the end.'''
+    total, padded, live = 0, 0, 0
+    for d in range(1, lookahead.depth):
+        mask = lookahead.empty_action_mask[d][0].reshape(-1, game_settings.card_count)[:, 0]
+        total += mask.size(0) * constants.players_count
+        padded += int(mask.eq(0).sum()) * constants.players_count
+        live += lookahead.live_fold_states[d].size(0)
+    return total, padded, live
+
+def evaluate(lookahead, pruning):
+    ''' Computes the ranges and values of the current strategies, returns the values of every depth.'''
+    arguments.lookahead_pruning = pruning
+    lookahead.live_call_states = {}
+    lookahead.live_fold_states = {}
+    lookahead._compute_ranges()
+    lookahead._compute_pruning(0)
+    lookahead._compute_terminal_equities()
+    lookahead._compute_cfvs()
+    return [lookahead.cfvs_data[d].clone() for d in range(1, lookahead.depth)]
+
+if __name__ == "__main__":
+    # several bet sizes pad the lookahead
+    arguments.bet_sizing = [1, 2]
+    board = card_to_string.string_to_board('Ks')
+    opponent_range = card_tools.get_random_range(board, 4)
+    # with a single hand, the player soon never takes some actions and cannot reach the states below them
+    single_hand_range = arguments.Tensor(game_settings.card_count).zero_()
+    single_hand_range[0] = 1
+    for player_range in [card_tools.get_random_range(board, 2), single_hand_range]:
+        full_resolving, full_time = resolve(False, player_range, opponent_range)
+        pruned_resolving, pruned_time = resolve(True, player_range, opponent_range)
+        total, padded, live = count_fold_ranges(pruned_resolving.lookahead)
+        print(f'full: {full_time:.3f}s, pruned: {pruned_time:.3f}s, fold ranges: {total} in total, {padded} padded, {live} evaluated')
+
+        # the values of a player only depend on the opponent's range, so skipping unreached ranges is exact
+        values = full_resolving.get_root_cfv_both_players()
+        pruned_values = pruned_resolving.get_root_cfv_both_players()
+        assert torch.allclose(values, pruned_values, rtol=1e-5, atol=1e-4), (values - pruned_values).abs().max()
+        assert torch.allclose(full_resolving.get_action_strategy(constants.actions.fold),
+                              pruned_resolving.get_action_strategy(constants.actions.fold), atol=1e-5)
+        assert live < total - padded
+
+    # the player never checks at the root, but the values after the check still decide its regret
+    lookahead = pruned_resolving.lookahead
+    strategy = lookahead.current_strategy_data[1]
+    strategy[1].zero_()
+    strategy.div_(strategy.sum(dim=0, keepdim=True).clamp(min=1e-9))
+    full_cfvs = evaluate(lookahead, False)
+    pruned_cfvs = evaluate(lookahead, True)
+    assert lookahead.live_fold_states[2].size(0) < lookahead.ranges_data[2][0].numel() // game_settings.card_count
+    for full, pruned in zip(full_cfvs, pruned_cfvs):
+        assert torch.allclose(full, pruned, rtol=0, atol=0, equal_nan=True)
+
+    # on the first street, the neural net only evaluates the states which are reached. Pruning the states which
+    # are barely reached changes the strategies there, so without the threshold the values must stay the same
+    arguments.lookahead_pruning_threshold = 0
+    player_range = card_tools.get_random_range(arguments.Tensor(), 2)
+    opponent_range = card_tools.get_random_range(arguments.Tensor(), 4)
+    full_resolving, full_time = resolve(False, player_range, opponent_range, '', 1)
+    pruned_resolving, pruned_time = resolve(True, player_range, opponent_range, '', 1)
+    lookahead = pruned_resolving.lookahead
+    print(f'full: {full_time:.3f}s, pruned: {pruned_time:.3f}s, depth-limited states: {lookahead.next_street_boxes_inputs.size(0)} in total, {lookahead.live_boxes.size(0)} evaluated')
+    assert lookahead.live_boxes.size(0) < lookahead.next_street_boxes_inputs.size(0)
+    values = full_resolving.get_root_cfv_both_players()
+    pruned_values = pruned_resolving.get_root_cfv_both_players()
+    assert torch.allclose(values, pruned_values, rtol=1e-5, atol=1e-4), (values - pruned_values).abs().max()
@@ -0,0 +1,90 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Settings.game_settings import game_settings
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.resolving import Resolving
+from Source.Tree.tree_builder import *
+from Source.Tree.tree_values import TreeValues
+import torch
+
+def resolve(node, player_range, opponent_cfvs, iters, warm_start=None):
+    arguments.cfr_iters = iters
+    arguments.cfr_skip_iters = iters // 2
+    arguments.cfr_warm_start_iters = iters
+    resolving = Resolving()
+    resolving.resolve(node, player_range, opponent_cfvs, warm_start=warm_start)
+    return resolving
+
+def fill_strategies_dfs(node, resolving, root=False):
+    ''' Fills the re-solved strategies of P1 into a public tree, P2 plays uniformly.'''
+    if node.terminal:
+        return
+    node.strategy = arguments.Tensor(len(node.children), game_settings.card_count).fill_(1 / len(node.children))
+    if node.current_player == constants.players.P1:
+        descendant = resolving if root else resolving.get_descendant(node)
+        strategy = descendant.resolve_results.strategy
+        # hands which never reach the decision keep the uniform strategy
+        reached = strategy.sum(dim=0).gt(0.5)
+        node.strategy[:, reached] = strategy[:, reached]
+    for child in node.children:
+        fill_strategies_dfs(child, resolving)
+
+def best_response_value(node, resolving, starting_ranges):
+    ''' Gives the value of P2's best response to the re-solved strategy of P1, which
+    is lower the less exploitable the strategy is. Differently from the distance to a
+    reference strategy, it does not depend on how indifferent hands mix.'''
+    params = TreeParams()
+    params.root_node = node
+    tree = PokerTreeBuilder().build_tree(params)
+    fill_strategies_dfs(tree, resolving, True)
+    TreeValues().compute_values(tree, starting_ranges)
+    return tree.cfv_br_infset[constants.players.P2].item()
+
+if __name__ == "__main__":
+    arguments.lookahead_average_all_depths = True
+    # the iterations of a warm-started re-solve, which the cold one gets as well
+    iters = arguments.cfr_warm_start_iters
+    cold_values, warm_values = [], []
+    for seed in range(5):
+        root_node = TreeNode()
+        root_node.board = card_to_string.string_to_board('Ks')
+        root_node.street = 2
+        root_node.current_player = constants.players.P1
+        root_node.bets = arguments.Tensor([100, 100])
+
+        player_range = card_tools.get_random_range(root_node.board, 2 * seed + 10)
+        opponent_range = card_tools.get_random_range(root_node.board, 2 * seed + 11)
+        arguments.cfr_iters = 1000
+        arguments.cfr_skip_iters = 500
+        first_resolving = Resolving()
+        first_resolving.resolve_first_node(root_node, player_range, opponent_range)
+
+        # P1 checks and P2 bets, P1 re-solves with the cfvs bound of the check as continual re-solving does
+        lookahead_node = first_resolving.lookahead_tree.children[1].children[2]
+        bet_node = TreeNode()
+        bet_node.board = root_node.board
+        bet_node.street = root_node.street
+        bet_node.current_player = lookahead_node.current_player
+        bet_node.bets = lookahead_node.bets.clone()
+        check_range = player_range * first_resolving.get_action_strategy(constants.actions.ccall)
+        check_range = check_range / check_range.sum()
+        opponent_cfvs = first_resolving.get_action_cfv(constants.actions.ccall)
+        starting_ranges = torch.stack([check_range, opponent_range])
+
+        cold = resolve(bet_node, check_range, opponent_cfvs, iters)
+        warm = resolve(bet_node, check_range, opponent_cfvs, iters, first_resolving)
+        assert warm.lookahead.warm_started and not cold.lookahead.warm_started
+        cold_value = best_response_value(bet_node, cold, starting_ranges)
+        warm_value = best_response_value(bet_node, warm, starting_ranges)
+        full = resolve(bet_node, check_range, opponent_cfvs, 1000)
+        full_value = best_response_value(bet_node, full, starting_ranges)
+        print(f'range seed {seed}: best response value {cold_value:.4f} cold, {warm_value:.4f} warm, {full_value:.4f} with 1000 iterations')
+        # with 400 chips in the pot, a tenth of a chip is within the noise of the re-solves
+        assert warm_value <= cold_value + 0.1
+        assert warm_value <= full_value + 0.1
+        cold_values.append(cold_value)
+        warm_values.append(warm_value)
+    assert sum(warm_values) <= sum(cold_values)
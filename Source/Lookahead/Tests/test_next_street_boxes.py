@@ -0,0 +1,49 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Lookahead import lookahead_builder
+from Source.Lookahead.resolving import Resolving
+from Source.Nn.next_round_value import NextRoundValue
+from Source.Tree.tree_builder import TreeNode
+import torch
+
+if __name__ == "__main__":
+    # several bet sizes give depth-limited states at several depths
+    arguments.bet_sizing = [0.5, 1]
+    resolving = Resolving()
+    current_node = TreeNode()
+
+    current_node.board = arguments.Tensor()
+    current_node.street = 1
+    current_node.current_player = constants.players.P1
+    current_node.bets = arguments.Tensor([100, 100])
+
+    player_range = card_tools.get_random_range(current_node.board, 2)
+    opponent_range = card_tools.get_random_range(current_node.board, 4)
+    arguments.cfr_iters = 10
+    arguments.cfr_skip_iters = 5
+    resolving.resolve_first_node(current_node, player_range, opponent_range)
+    lookahead = resolving.lookahead
+    assert len(lookahead.next_street_boxes_offsets) > 1
+
+    # the ranges at the depth-limited states of all depths
+    ranges = lookahead.next_street_boxes_inputs.clone().uniform_()
+    ranges.div_(ranges.sum(dim=2, keepdim=True))
+
+    # one neural net call for all depths
+    fused_box = lookahead.next_street_box.clone()
+    fused_values = ranges.clone().zero_()
+    fused_box.get_value(ranges, fused_values)
+
+    # one call per depth, as each depth had its own box before
+    for d in lookahead.next_street_boxes_offsets:
+        start, end = lookahead.next_street_boxes_offsets[d]
+        depth_box = NextRoundValue(lookahead_builder.neural_net)
+        depth_box.start_computation(lookahead.pot_size[d][1, :, :, :, 0, 0].reshape(-1))
+        depth_values = ranges[start:end].clone().zero_()
+        depth_box.get_value(ranges[start:end].clone(), depth_values)
+        error = (depth_values - fused_values[start:end]).abs().max().item()
+        print(f'depth {d}: {end - start} boxes, max difference {error:.2e}')
+        assert torch.allclose(depth_values, fused_values[start:end], rtol=1e-5, atol=1e-6)
@@ -0,0 +1,65 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Settings.game_settings import game_settings
+from Source.Nn.value_nn import ValueNn
+from Source.Nn.next_round_value import NextRoundValue
+import torch
+
+class CountingNn:
+    ''' Counts the evaluations of the neural net it wraps.'''
+    def __init__(self, nn):
+        self.nn = nn
+        self.calls = 0
+
+    def get_value(self, inputs, output):
+        self.calls += 1
+        self.nn.get_value(inputs, output)
+
+def run(nn, ranges):
+    ''' Feeds the ranges of each iteration to a new box, returns its values and the net calls.'''
+    counting_nn = CountingNn(nn)
+    box = NextRoundValue(counting_nn)
+    box.start_computation(arguments.Tensor([100, 200, 400]))
+    values = [ranges[0].clone().zero_() for _ in ranges]
+    for i in range(len(ranges)):
+        box.get_value(ranges[i], values[i])
+    return values, counting_nn.calls
+
+if __name__ == "__main__":
+    nn = ValueNn()
+    iters = 7
+    torch.manual_seed(0)
+    base_range = arguments.Tensor(3, constants.players_count, game_settings.card_count).uniform_()
+    # the range masses change, the normalized inputs of the net do not
+    scaled_ranges = [base_range * (i + 1) for i in range(iters)]
+    changing_ranges = [base_range.clone().uniform_() for _ in range(iters)]
+
+    arguments.nn_eval_range_threshold = None
+    arguments.nn_eval_iters = 1
+    exact_values, calls = run(nn, scaled_ranges)
+    assert calls == iters, calls
+
+    # the net is evaluated on iterations 1, 4 and 7, the reused outputs are weighted with the current mass
+    arguments.nn_eval_iters = 3
+    reused_values, calls = run(nn, scaled_ranges)
+    print(f'nn_eval_iters 3: {calls} of {iters} evaluations')
+    assert calls == 3, calls
+    for exact, reused in zip(exact_values, reused_values):
+        assert torch.allclose(exact, reused, rtol=1e-5, atol=1e-6), (exact - reused).abs().max()
+
+    # moved inputs force an evaluation in between
+    arguments.nn_eval_range_threshold = 1e-4
+    _, calls = run(nn, changing_ranges)
+    print(f'threshold 1e-4: {calls} of {iters} evaluations')
+    assert calls == iters, calls
+
+    # inputs which only moved by round-off do not
+    _, calls = run(nn, scaled_ranges)
+    print(f'threshold 1e-4, unchanged inputs: {calls} of {iters} evaluations')
+    assert calls == 3, calls
+
+    arguments.nn_eval_range_threshold = 2
+    _, calls = run(nn, changing_ranges)
+    assert calls == 3, calls
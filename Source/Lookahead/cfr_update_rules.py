@@ -0,0 +1,75 @@
+''' Regret and average update rules of the CFR variants used during re-solving.
+
+The rule is selected with @{arguments.cfr_update_rule}.
+
+* `cfr+`: regrets are floored at zero, every averaged iteration has the same weight
+
+* `cfr+_linear_avg`: regrets are floored at zero, iteration `t` is averaged with weight `t`
+
+* `linear`: Linear CFR, iteration `t` contributes to regrets and the average with weight `t`
+
+* `dcfr`: Discounted CFR, accumulated positive and negative regrets are discounted by
+`t^alpha/(t^alpha+1)` and `t^beta/(t^beta+1)` and iteration `t` is averaged with weight `t^gamma`
+
+See [Solving Imperfect-Information Games via Discounted Regret Minimization](https://arxiv.org/abs/1809.04040)
+'''
+from Source.Settings.arguments import arguments
+
+class M:
+    rules = ['cfr+', 'cfr+_linear_avg', 'linear', 'dcfr']
+
+    def clamps_regrets(self):
+        ''' Gives whether accumulated regrets are floored at zero.
+
+        Return `True` for the CFR+ rules'''
+        assert arguments.cfr_update_rule in self.rules, 'unknown cfr update rule'
+        return arguments.cfr_update_rule == 'cfr+' or arguments.cfr_update_rule == 'cfr+_linear_avg'
+
+    def regret_discounts(self, _iter):
+        ''' Gives the factors by which accumulated regrets are discounted before the
+        regrets of the current iteration are added.
+
+        Params:
+            iter: the current iteration number (starting from 0)
+        Return a pair of the factors for positive and negative regrets, or `None`
+        if the rule does not discount regrets'''
+        if arguments.cfr_update_rule == 'linear':
+            # same as weighting the regrets of iteration t by t
+            return _iter / (_iter + 1), _iter / (_iter + 1)
+        elif arguments.cfr_update_rule == 'dcfr':
+            positive_discount = _iter ** arguments.dcfr_alpha / (_iter ** arguments.dcfr_alpha + 1)
+            negative_discount = _iter ** arguments.dcfr_beta / (_iter ** arguments.dcfr_beta + 1)
+            return positive_discount, negative_discount
+        return None
+
+    def discount_regrets(self, regrets, _iter):
+        ''' Discounts accumulated regrets in place before the regrets of the current
+        iteration are added.
+
+        Params:
+            regrets: a tensor of regrets accumulated over the previous iterations
+            iter: the current iteration number (starting from 0)
+        '''
+        discounts = self.regret_discounts(_iter)
+        if discounts == None:
+            return
+        positive_discount, negative_discount = discounts
+        if positive_discount == negative_discount:
+            regrets.mul_(positive_discount)
+        else:
+            regrets.mul_(regrets.gt(0).type_as(regrets).mul_(positive_discount - negative_discount).add_(negative_discount))
+
+    def average_weight(self, _iter):
+        ''' Gives the weight of an iteration in the average strategy and values.
+
+        Params:
+            iter: the iteration number (starting from 0)
+        Return the weight of the iteration'''
+        if arguments.cfr_update_rule == 'cfr+':
+            return 1
+        elif arguments.cfr_update_rule == 'dcfr':
+            return (_iter + 1) ** arguments.dcfr_gamma
+        else:
+            return _iter + 1
+
+cfr_update_rules = M()
@@ -5,7 +5,9 @@ See [Solving Imperfect Information Games Using Decomposition](http.//poker.cs.ua
 from Source.Settings.arguments import arguments
 from Source.Settings.constants import constants
 from Source.Game.card_tools import card_tools
+from Source.Lookahead.cfr_update_rules import cfr_update_rules
 from Source.Settings.game_settings import game_settings
+from Source.Settings.precision_policy import precision_policy
 import torch
 
 class CFRDGadget:
@@ -15,7 +17,8 @@ class CFRDGadget:
         Params:
             board: board card
             player_range: an initial range vector for the opponent
-            opponent_cfvs: the opponent counterfactual values vector used for re-solving'''
+            opponent_cfvs: the opponent counterfactual values vector used for re-solving
+                (or a BxK tensor of such vectors when re-solving a batch)'''
         super().__init__()
         assert(board != None)
 
@@ -29,21 +32,53 @@ class CFRDGadget:
         # 2 stands for 2 actions: play/terminate
         self.opponent_reconstruction_regret = arguments.Tensor(2, game_settings.card_count)
 
-        self.play_current_strategy = arguments.Tensor(game_settings.card_count).fill_(0)
-        self.terminate_current_strategy = arguments.Tensor(game_settings.card_count).fill_(1)
+        self.play_current_strategy = self.input_opponent_value.clone().fill_(0)
+        self.terminate_current_strategy = self.input_opponent_value.clone().fill_(1)
 
         # holds achieved CFVs at each iteration so that we can compute regret
-        self.total_values = arguments.Tensor(game_settings.card_count)
+        self.total_values = self.input_opponent_value.clone()
 
-        self.terminate_regrets = arguments.Tensor(game_settings.card_count).fill_(0)
-        self.play_regrets = arguments.Tensor(game_settings.card_count).fill_(0)
+        self.terminate_regrets = precision_policy.accumulator(self.input_opponent_value.clone().fill_(0))
+        self.play_regrets = precision_policy.accumulator(self.input_opponent_value.clone().fill_(0))
 
         # init range mask for masking out impossible hands
         self.range_mask = card_tools.get_possible_hand_indexes(board)
 
-        self.total_values_p2 = None
-        self.play_current_regret = None
-        self.terminate_current_regret = None
+        # buffers for the intermediate results of every iteration
+        self.total_values_p2 = self.input_opponent_value.clone()
+        self.play_current_regret = self.input_opponent_value.clone()
+        self.terminate_current_regret = self.input_opponent_value.clone()
+        self.regret_sum = self.input_opponent_value.clone()
+        self.play_possitive_regrets = self.input_opponent_value.clone()
+        self.terminate_possitive_regrets = self.input_opponent_value.clone()
+
+    def warm_start(self, gadget):
+        ''' Continues from the regrets and strategies reached by the gadget of a
+        previous re-solve.
+
+        Params:
+            gadget: the @{cfrd_gadget|CFRDGadget} used by the previous re-solve'''
+        self.play_regrets.copy_(gadget.play_regrets)
+        self.terminate_regrets.copy_(gadget.terminate_regrets)
+        self.play_current_strategy.copy_(gadget.play_current_strategy)
+        self.terminate_current_strategy.copy_(gadget.terminate_current_strategy)
+
+    def get_state(self):
+        ''' Gives the regrets and current strategies of the gadget, from which
+        @{set_state} continues.
+
+        Return a dict of tensors'''
+        return {'play_regrets': self.play_regrets.clone(), 'terminate_regrets': self.terminate_regrets.clone(),
+                'play_current_strategy': self.play_current_strategy.clone(),
+                'terminate_current_strategy': self.terminate_current_strategy.clone()}
+
+    def set_state(self, state):
+        ''' Continues from a state given by @{get_state}.
+
+        Params:
+            state: the state to continue from'''
+        for name in state:
+            getattr(self, name).copy_(state[name])
 
     def compute_opponent_range(self, current_opponent_cfvs, iteration):
         ''' Uses one iteration of the gadget game to generate an opponent range for
@@ -54,34 +89,33 @@ class CFRDGadget:
                 with the current strategy in the re-solve game
             iteration: the current iteration number of re-solving
         Return the opponent range vector for this iteration'''
-        play_values = current_opponent_cfvs
+        play_values = current_opponent_cfvs.view(self.input_opponent_value.shape)
         terminate_values = self.input_opponent_value
 
         # 1.0 compute current regrets  
-        self.total_values = torch.mul(play_values, self.play_current_strategy)
-        self.total_values_p2 = torch.mul(terminate_values, self.terminate_current_strategy)
+        torch.mul(play_values, self.play_current_strategy, out=self.total_values)
+        torch.mul(terminate_values, self.terminate_current_strategy, out=self.total_values_p2)
         self.total_values.add_(self.total_values_p2)
         
-        self.play_current_regret = play_values.clone()
-        self.play_current_regret.sub_(self.total_values.view(self.play_current_regret.shape))
-        
-        self.terminate_current_regret = terminate_values.clone()
-        self.terminate_current_regret.sub_(self.total_values.view(self.terminate_current_regret.shape))
+        torch.sub(play_values, self.total_values, out=self.play_current_regret)
+        torch.sub(terminate_values, self.total_values, out=self.terminate_current_regret)
 
         # 1.1 cumulate regrets
-        self.play_regrets.add_(self.play_current_regret.view(self.play_regrets.shape))
+        cfr_update_rules.discount_regrets(self.play_regrets, iteration)
+        cfr_update_rules.discount_regrets(self.terminate_regrets, iteration)
+        self.play_regrets.add_(self.play_current_regret)
         self.terminate_regrets.add_(self.terminate_current_regret)
         
-        # 2.0 we use cfr+ in reconstruction  
-        self.terminate_regrets.clamp_(self.regret_epsilon, constants.max_number)
-        self.play_regrets.clamp_(self.regret_epsilon, constants.max_number)
+        # 2.0 we use cfr+ in reconstruction, unless another update rule was chosen
+        if cfr_update_rules.clamps_regrets():
+            self.terminate_regrets.clamp_(self.regret_epsilon, constants.max_number)
+            self.play_regrets.clamp_(self.regret_epsilon, constants.max_number)
 
-        self.play_possitive_regrets = self.play_regrets
-        self.terminate_possitive_regrets = self.terminate_regrets
+        torch.clamp(self.play_regrets, self.regret_epsilon, constants.max_number, out=self.play_possitive_regrets)
+        torch.clamp(self.terminate_regrets, self.regret_epsilon, constants.max_number, out=self.terminate_possitive_regrets)
 
         # 3.0 regret matching
-        self.regret_sum = self.play_possitive_regrets.clone()
-        self.regret_sum.add_(self.terminate_possitive_regrets)
+        torch.add(self.play_possitive_regrets, self.terminate_possitive_regrets, out=self.regret_sum)
 
         self.play_current_strategy.copy_(self.play_possitive_regrets)
         self.terminate_current_strategy.copy_(self.terminate_possitive_regrets)
@@ -95,6 +129,6 @@ class CFRDGadget:
         self.play_current_strategy.mul_(self.range_mask)
         self.terminate_current_strategy.mul_(self.range_mask)
 
-        self.input_opponent_range = self.play_current_strategy.clone()  
+        self.input_opponent_range.copy_(self.play_current_strategy)
 
         return self.input_opponent_range
@@ -3,10 +3,18 @@
 from Source.Settings.arguments import arguments
 from Source.Settings.constants import constants
 from Source.Settings.game_settings import game_settings
-from Source.Lookahead.lookahead_builder import LookaheadBuilder
+from Source.Settings.precision_policy import precision_policy
+from Source.Game.card_tools import card_tools
+from Source.Lookahead.lookahead_builder import LookaheadBuilder, scratch_families
 from Source.TerminalEquity.terminal_equity import TerminalEquity
 from Source.Lookahead.cfrd_gadget import CFRDGadget
+from Source.Lookahead.cfr_update_rules import cfr_update_rules
+from Source.Lookahead.lookahead_profile import LookaheadProfile, tensor_families
+from Source.Lookahead.lookahead_kernels import LookaheadKernel
 import torch
+import copy
+import random
+import time
 
 class ResolveResult:
     def __init__(self):
@@ -16,13 +24,32 @@ class ResolveResult:
         self.root_cfvs = None
         self.root_cfvs_both_players = None
         self.children_cfvs = None
+        self.iterations = None
+        self.profile = None
+        self.reach = None
 
 class Lookahead:
     def __init__(self):
         super().__init__()
         self.reconstruction_opponent_cfvs = None
-        self.next_street_boxes_inputs = None
-        self.next_street_boxes_outputs = None
+        self.iterations = None
+        self.last_check_strategy = None
+        self.profile = None
+        self.live_call_states = {}
+        self.live_fold_states = {}
+        self.live_boxes = None
+        # scratch buffers into which the live ranges of terminal states are gathered
+        self.live_ranges = None
+        self.live_cfvs = None
+        self.warm_started = False
+        self.warm_start_gadget = None
+        self.averages_normalized = False
+        # the root average strategy and cfvs before they were normalized, from which resuming continues
+        self.average_sums = None
+        # a file to which the state of re-solving is saved every @{arguments.lookahead_checkpoint_iters} iterations
+        self.checkpoint_file = None
+        # a `threading.Event` which stops re-solving when it is set
+        self.cancel_event = None
         self.builder = LookaheadBuilder(self)
 
     def build_lookahead(self, tree):
@@ -31,13 +58,157 @@ class Lookahead:
         Must be called to initialize the lookahead.
 
         Params:
-            tree: a public tree'''
-        self.builder.build_from_tree(tree)
+            tree: a public tree, or a list of public trees which are re-solved
+                together as a batch (see @{lookahead_builder.build_from_trees}).
+                In the batched case all results gain a leading batch dimension.'''
+        self.batched = isinstance(tree, list)
+        if self.batched:
+            self.builder.build_from_trees(tree)
+        else:
+            self.builder.build_from_tree(tree)
+        tree = self.tree
 
         self.terminal_equity = TerminalEquity()
         self.terminal_equity.set_board(tree.board)
 
-    def resolve_first_node(self, player_range, opponent_range):
+    def clone(self):
+        ''' Gives a fresh copy of a lookahead which has been built but not re-solved.
+
+        The public tree, pot sizes, action masks and terminal equity are shared with
+        this lookahead, since re-solving never modifies them. Every tensor that
+        re-solving writes to is cloned, so both lookaheads can be re-solved
+        independently.
+
+        Return the new @{lookahead|Lookahead}'''
+        assert(self.iterations == None)
+        out = copy.copy(self)
+        out.builder = LookaheadBuilder(out)
+        for name in ['ranges_data', 'average_strategies_data', 'current_strategy_data', 'cfvs_data', 'average_cfvs_data',
+                     'regrets_data', 'current_regrets_data', 'positive_regrets_data', 'placeholder_data', 'regrets_sum', 'positive_regrets_sum',
+                     'inner_nodes', 'inner_nodes_p1', 'swap_data']:
+            data = getattr(self, name)
+            # the shared scratch buffers of the compact layout are re-allocated below
+            if self.compact_layout and name in scratch_families:
+                setattr(out, name, dict(data))
+            else:
+                setattr(out, name, {d: (data[d].clone() if data[d] is not None else None) for d in data})
+        if self.compact_layout:
+            out.builder.share_scratch_buffers()
+        if self.tree.street == 1:
+            out.next_street_box = self.next_street_box.clone()
+            out.next_street_boxes_inputs = self.next_street_boxes_inputs.clone()
+            out.next_street_boxes_outputs = self.next_street_boxes_outputs.clone()
+        return out
+
+    def get_memory_footprint(self):
+        ''' Gives the memory used by the per-depth tensors of the lookahead.
+
+        Tensors which share their storage with a tensor counted before (e.g. the
+        scratch buffers of the compact layout, see @{arguments.lookahead_compact_layout})
+        only count once.
+
+        Return a dict which gives the number of bytes of each depth of each tensor
+        family (see @{lookahead_profile.memory_report})'''
+        footprint = {}
+        counted = set()
+        for name in tensor_families:
+            data = getattr(self, name)
+            footprint[name] = {}
+            for d in sorted(data):
+                if data[d] is None:
+                    continue
+                # untyped storages only exist since torch 2.0
+                if hasattr(data[d], 'untyped_storage'):
+                    storage = data[d].untyped_storage()
+                    storage_bytes = storage.nbytes()
+                else:
+                    storage = data[d].storage()
+                    storage_bytes = storage.size() * data[d].element_size()
+                footprint[name][d] = 0 if storage.data_ptr() in counted else storage_bytes
+                counted.add(storage.data_ptr())
+        return footprint
+
+    def warm_start(self, lookahead):
+        ''' Seeds the regrets of the lookahead with those reached by a previous
+        re-solve, if its lookahead contains the root of this one.
+
+        The state of the previous @{cfrd_gadget|CFRDGadget} (if any) is carried over
+        to the gadget created by @{resolve}. A warm-started lookahead runs
+        @{arguments.cfr_warm_start_iters} iterations instead of @{arguments.cfr_iters}.
+
+        Only the regrets are seeded, and the average strategies and cfvs restart from
+        zero with @{average_weight_sum}. The previous average strategy of the root of
+        this lookahead is not kept: the first layer is normalized at the end of
+        re-solving and lower layers are only tracked with
+        @{arguments.lookahead_average_all_depths}, weighted by the reach from the
+        previous root. The seeded regrets already give a current strategy close to
+        the previous one, which the new average is built from.
+
+        Must be called after @{build_lookahead} and before re-solving.
+
+        Params:
+            lookahead: a re-solved @{lookahead|Lookahead}
+        Return `True` if the lookahead was warm-started'''
+        assert(self.iterations == None and lookahead.iterations != None)
+        assert(not self.batched and not lookahead.batched)
+
+        if lookahead.tree.street != self.tree.street or not torch.equal(lookahead.tree.board, self.tree.board):
+            return False
+        found = self._find_root_dfs(lookahead.tree, 0)
+        if found == None:
+            return False
+
+        previous_node, previous_layer = found
+        self._warm_start_dfs(self.tree, 0, lookahead, previous_node, previous_layer)
+        self.warm_started = True
+        if lookahead.reconstruction_opponent_cfvs != None:
+            self.warm_start_gadget = lookahead.reconstruction_gadget
+        return True
+
+    def _find_root_dfs(self, node, layer):
+        ''' Searches a public tree for a node with the public state of the root of
+        the lookahead.
+
+        Within a street, a player node is identified by the acting player and the bets.
+
+        Params:
+            node: the current node of the searched tree
+            layer: the depth of the current node
+        Return a pair of the matching node and its depth, or `None` if there is none'''
+        if node.terminal or node.current_player == constants.players.chance:
+            return None
+        if node.current_player == self.tree.current_player and torch.equal(node.bets, self.tree.bets):
+            return node, layer
+        for child in node.children:
+            found = self._find_root_dfs(child, layer+1)
+            if found != None:
+                return found
+        return None
+
+    def _warm_start_dfs(self, node, layer, lookahead, previous_node, previous_layer):
+        ''' Copies the regrets of the actions below a node from the matching node of
+        a previous lookahead.
+
+        Params:
+            node: the current node of the public tree of this lookahead
+            layer: the depth of the current node in this lookahead
+            lookahead: the previously re-solved @{lookahead|Lookahead}
+            previous_node: the node of the previous public tree matching `node`
+            previous_layer: the depth of `previous_node` in the previous lookahead
+        '''
+        assert(len(node.children) == len(previous_node.children))
+        for c in range(len(node.children)):
+            child = node.children[c]
+            previous_child = previous_node.children[c]
+            action_id, parent_id, gp_id = child.lookahead_coordinates.tolist()
+            previous_action_id, previous_parent_id, previous_gp_id = previous_child.lookahead_coordinates.tolist()
+
+            self.regrets_data[layer+1][action_id, parent_id, gp_id, 0, :].copy_(lookahead.regrets_data[previous_layer+1][previous_action_id, previous_parent_id, previous_gp_id, 0, :])
+
+            if not child.terminal and child.current_player != constants.players.chance:
+                self._warm_start_dfs(child, layer+1, lookahead, previous_child, previous_layer+1)
+
+    def resolve_first_node(self, player_range, opponent_range, time_budget=None):
         ''' Re-solves the lookahead using input ranges.
         
         Uses the input range for the opponent instead of a gadget range, so only
@@ -47,48 +218,305 @@ class Lookahead:
         @{build_lookahead} must be called first.
 
         Params:
-            player_range: a range vector for the re-solving player
-            opponent_range: a range vector for the opponent'''
-        self.ranges_data[0][:, :, :, 0, :].copy_(player_range)  
-        self.ranges_data[0][:, :, :, 1, :].copy_(opponent_range)  
-        self._compute()
-
-    def resolve(self, player_range, opponent_cfvs):
+            player_range: a range vector for the re-solving player, or a BxK
+                tensor of ranges for a batched lookahead
+            opponent_range: a range vector for the opponent, or a BxK tensor of
+                ranges for a batched lookahead
+            time_budget [opt]: the number of seconds re-solving may take (see @{_compute})'''
+        self.ranges_data[0][:, :, :, :, 0, :].copy_(player_range)  
+        self.ranges_data[0][:, :, :, :, 1, :].copy_(opponent_range)  
+        self._compute(time_budget)
+
+    def resolve(self, player_range, opponent_cfvs, time_budget=None):
         ''' Re-solves the lookahead using an input range for the player and
         the @{cfrd_gadget|CFRDGadget} to generate ranges for the opponent.
 
         @{build_lookahead} must be called first.
 
         Params:
-            player_range: a range vector for the re-solving player
-            opponent_cfvs: a vector of cfvs achieved by the opponent before re-solving'''
+            player_range: a range vector for the re-solving player, or a BxK
+                tensor of ranges for a batched lookahead
+            opponent_cfvs: a vector of cfvs achieved by the opponent before re-solving,
+                or a BxK tensor of cfvs for a batched lookahead
+            time_budget [opt]: the number of seconds re-solving may take (see @{_compute})'''
         assert(player_range != None)
         assert(opponent_cfvs != None)
         
         self.reconstruction_gadget = CFRDGadget(self.tree.board, player_range, opponent_cfvs)
+        if self.warm_start_gadget != None:
+            self.reconstruction_gadget.warm_start(self.warm_start_gadget)
         
-        self.ranges_data[0][:, :, :, 0, :].copy_(player_range)
+        self.ranges_data[0][:, :, :, :, 0, :].copy_(player_range)
         self.reconstruction_opponent_cfvs = opponent_cfvs
-        self._compute()
+        self._compute(time_budget)
 
-    def _compute(self):
+    def _compute(self, time_budget=None):
         ''' Re-solves the lookahead.
+
+        Params:
+            time_budget [opt]: the number of seconds re-solving may take. If given,
+                the number of iterations (and of preliminary iterations which are not
+                factored into the average) is scaled down to fit into the budget
         '''
+        # a warm-started lookahead runs fewer iterations, the preliminary ones scaled down in the same proportion
+        self.cfr_iters = arguments.cfr_warm_start_iters if self.warm_started else arguments.cfr_iters
+        self.skip_iters = self.cfr_iters * arguments.cfr_skip_iters // arguments.cfr_iters
+        self.max_iters = self.cfr_iters
+        if self.tree.street == 1 and self.skip_iters != arguments.cfr_skip_iters:
+            self.next_street_box.set_skip_iters(self.skip_iters)
+        self.average_weight_sum = 0
+        self._run_iterations(0, time_budget)
+
+    def _run_iterations(self, first_iter, time_budget=None):
+        ''' Runs the CFR iterations of re-solving, then normalizes the averages.
+
+        Params:
+            first_iter: the number of the first iteration
+            time_budget [opt]: the number of seconds the iterations may take (see @{_compute})
+        '''
+        self.live_call_states = {}
+        self.live_fold_states = {}
+        self.live_boxes = None
+        start_time = time.time()
+
+        if arguments.lookahead_profile_rate > 0 and random.random() < arguments.lookahead_profile_rate:
+            self.profile = LookaheadProfile(self)
+        # the compiled kernels evaluate every terminal state, so pruning runs the eager iterations
+        kernel = None
+        if arguments.lookahead_kernel != None and not arguments.lookahead_pruning:
+            kernel = LookaheadKernel(self)
+
         # 1.0 main loop
-        for i in range(arguments.cfr_iters):
-            self._set_opponent_starting_range(i)
-            self._compute_current_strategies()
-            self._compute_ranges()
-            self._compute_update_average_strategies(i)
-            self._compute_terminal_equities()   
-            self._compute_cfvs()
-            self._compute_regrets()
-            self._compute_cumulate_average_cfvs(i)
+        self.last_check_strategy = None
+        for i in range(first_iter, self.cfr_iters):
+            if self.profile != None:
+                self._compute_iteration_profiled(i)
+            elif kernel != None:
+                self._compute_iteration_kernel(kernel, i)
+            else:
+                self._compute_iteration(i)
+            self.iterations = i + 1
+
+            if self.checkpoint_file != None and self.iterations % arguments.lookahead_checkpoint_iters == 0:
+                self.save_checkpoint(self.checkpoint_file)
+            if self.cancel_event != None and self.cancel_event.is_set():
+                break
+            if self.iterations >= self.max_iters:
+                break
+            if arguments.cfr_early_stop and self._is_converged(i):
+                break
+            if time_budget != None and self._is_out_of_time(i, time.time() - start_time, time_budget):
+                break
 
         # 2.0 at the end normalize average strategy
+        self.average_sums = (self.average_strategies_data[1].clone(), self.average_cfvs_data[0].clone())
         self._compute_normalize_average_strategies()
         # 2.1 normalize root's CFVs
         self._compute_normalize_average_cfvs()
+        self.averages_normalized = True
+        if self.checkpoint_file != None:
+            self.save_checkpoint(self.checkpoint_file)
+
+        if self.profile != None:
+            self.profile.iterations = self.iterations
+            self.profile.total_time = time.time() - start_time
+
+    def resume(self, iterations=None, time_budget=None):
+        ''' Continues re-solving, after an interrupted or finished re-solve or after
+        @{load_checkpoint}.
+
+        Params:
+            iterations [opt]: the number of iterations to run on top of those already
+                run. By default, the iterations of the interrupted re-solve are finished
+            time_budget [opt]: the number of seconds re-solving may take (see @{_compute})'''
+        assert(self.iterations != None)
+        if self.averages_normalized:
+            # the averages are accumulated again as sums
+            self.average_strategies_data[1].copy_(self.average_sums[0])
+            self.average_cfvs_data[0].copy_(self.average_sums[1])
+            self.averages_normalized = False
+        if iterations != None:
+            self.cfr_iters = self.iterations + iterations
+            self.max_iters = self.cfr_iters
+        self._run_iterations(self.iterations, time_budget)
+
+    def get_checkpoint(self):
+        ''' Gives the state of re-solving, from which @{load_checkpoint} continues.
+
+        The state holds the public state of the root, the root ranges, the regrets
+        and averages, the state of the @{cfrd_gadget|CFRDGadget} and of the
+        @{next_round_value|NextRoundValue}, and the iteration counters. The
+        intermediate results of the iterations are not kept.
+
+        Return a dict of the state'''
+        assert(not self.batched and self.iterations != None)
+        checkpoint = {
+            'node': {'street': self.tree.street, 'board': self.tree.board.clone(),
+                     'current_player': self.tree.current_player, 'bets': self.tree.bets.clone()},
+            'iterations': self.iterations, 'cfr_iters': self.cfr_iters, 'skip_iters': self.skip_iters,
+            'max_iters': self.max_iters, 'average_weight_sum': self.average_weight_sum,
+            'ranges': self.ranges_data[0].clone(), 'root_cfvs': self.cfvs_data[0].clone(),
+            'regrets': {d: self.regrets_data[d].clone() for d in range(1, self.depth)},
+            'average_strategies': {d: self.average_strategies_data[d].clone() for d in range(1, self.depth)
+                                   if d == 1 or arguments.lookahead_average_all_depths},
+            'average_cfvs': {d: self.average_cfvs_data[d].clone() for d in self.average_cfvs_data}}
+        # the averages are saved as sums
+        if self.averages_normalized:
+            checkpoint['average_strategies'][1].copy_(self.average_sums[0])
+            checkpoint['average_cfvs'][0].copy_(self.average_sums[1])
+        if self.reconstruction_opponent_cfvs != None:
+            checkpoint['opponent_cfvs'] = self.reconstruction_opponent_cfvs.clone()
+            checkpoint['gadget'] = self.reconstruction_gadget.get_state()
+        if self.tree.street == 1:
+            checkpoint['next_street_box'] = self.next_street_box.get_state()
+        return checkpoint
+
+    def save_checkpoint(self, path):
+        ''' Saves the state of re-solving to a file (see @{get_checkpoint}).
+
+        Params:
+            path: the file name'''
+        torch.save(self.get_checkpoint(), path)
+
+    def load_checkpoint(self, checkpoint):
+        ''' Restores the state of re-solving given by @{get_checkpoint}, so that
+        @{resume} continues from it.
+
+        Must be called after @{build_lookahead}, on a lookahead built for the same
+        public state (and bet sizing), before re-solving.
+
+        Params:
+            checkpoint: the state of re-solving'''
+        assert(not self.batched and self.iterations == None)
+        self.iterations = checkpoint['iterations']
+        self.cfr_iters = checkpoint['cfr_iters']
+        self.skip_iters = checkpoint['skip_iters']
+        self.max_iters = checkpoint['max_iters']
+        self.average_weight_sum = checkpoint['average_weight_sum']
+        self.averages_normalized = False
+
+        self.ranges_data[0].copy_(checkpoint['ranges'])
+        self.cfvs_data[0].copy_(checkpoint['root_cfvs'])
+        for name, data in [('regrets', self.regrets_data), ('average_strategies', self.average_strategies_data),
+                           ('average_cfvs', self.average_cfvs_data)]:
+            for d in checkpoint[name]:
+                data[d].copy_(checkpoint[name][d])
+
+        if 'opponent_cfvs' in checkpoint:
+            self.reconstruction_opponent_cfvs = checkpoint['opponent_cfvs']
+            self.reconstruction_gadget = CFRDGadget(self.tree.board, self.ranges_data[0][0, 0, 0, 0, 0, :].clone(), self.reconstruction_opponent_cfvs)
+            self.reconstruction_gadget.set_state(checkpoint['gadget'])
+        if self.tree.street == 1:
+            self.next_street_box.set_state(checkpoint['next_street_box'])
+
+    def _compute_iteration(self, _iter):
+        ''' Runs one iteration of CFR on the lookahead.
+
+        Every step works in place on the buffers allocated by the
+        @{lookahead_builder|LookaheadBuilder}.
+
+        Params:
+            iter: the current iteration number of re-solving
+        '''
+        self._set_opponent_starting_range(_iter)
+        self._compute_current_strategies()
+        self._compute_ranges()
+        self._compute_pruning(_iter)
+        self._compute_update_average_strategies(_iter)
+        self._compute_terminal_equities()   
+        self._compute_cfvs()
+        self._compute_regrets(_iter)
+        self._compute_cumulate_average_cfvs(_iter)
+
+    def _compute_iteration_kernel(self, kernel, _iter):
+        ''' Runs one iteration of CFR on the lookahead like @{_compute_iteration},
+        with the per-depth loops in compiled kernels.
+
+        Params:
+            kernel: the @{lookahead_kernels|LookaheadKernel} bound to the lookahead
+            iter: the current iteration number of re-solving
+        '''
+        self._set_opponent_starting_range(_iter)
+        kernel.compute_strategies_and_ranges()
+        self._compute_update_average_strategies(_iter)
+        if self.tree.street == 1:
+            self._compute_terminal_equities_next_street_box()
+        self._compute_terminal_equities_terminal_equity()
+        kernel.compute_values_and_regrets(_iter)
+        self._compute_cumulate_average_cfvs(_iter)
+
+    def _compute_iteration_profiled(self, _iter):
+        ''' Runs one iteration of CFR on the lookahead like @{_compute_iteration},
+        timing each phase with the @{lookahead_profile|LookaheadProfile}.
+
+        Params:
+            iter: the current iteration number of re-solving
+        '''
+        profile = self.profile
+        profile.run('set_opponent_starting_range', self._set_opponent_starting_range, _iter)
+        profile.run('compute_current_strategies', self._compute_current_strategies)
+        profile.run('compute_ranges', self._compute_ranges)
+        profile.run('compute_pruning', self._compute_pruning, _iter)
+        profile.run('compute_update_average_strategies', self._compute_update_average_strategies, _iter)
+        if self.tree.street == 1:
+            profile.run('compute_terminal_equities_next_street_box', self._compute_terminal_equities_next_street_box)
+        profile.run('compute_terminal_equities_terminal_equity', self._compute_terminal_equities_terminal_equity)
+        profile.run('compute_terminal_equities_pot_size', self._compute_terminal_equities_pot_size)
+        profile.run('compute_cfvs', self._compute_cfvs)
+        profile.run('compute_regrets', self._compute_regrets, _iter)
+        profile.run('compute_cumulate_average_cfvs', self._compute_cumulate_average_cfvs, _iter)
+
+    def _is_out_of_time(self, _iter, elapsed, time_budget):
+        ''' Fits the number of iterations into a time budget.
+
+        Until the average strategy starts being accumulated, the number of
+        iterations which fit into the budget is estimated from the time taken so
+        far, and the preliminary iterations are scaled down in the same proportion
+        as @{arguments.cfr_skip_iters} to @{arguments.cfr_iters}. At least one
+        iteration is always averaged.
+
+        Params:
+            iter: the current iteration number of re-solving
+            elapsed: the number of seconds re-solving has taken so far
+            time_budget: the number of seconds re-solving may take
+        Return `True` if re-solving must stop'''
+        if _iter < self.skip_iters:
+            iters_estimate = int(time_budget * (_iter + 1) / elapsed) if elapsed > 0 else self.cfr_iters
+            self.max_iters = min(self.cfr_iters, iters_estimate)
+            self.skip_iters = max(self.max_iters * arguments.cfr_skip_iters // arguments.cfr_iters, _iter + 1)
+            self.max_iters = max(self.max_iters, self.skip_iters + 1)
+
+            if self.tree.street == 1:
+                self.next_street_box.set_skip_iters(self.skip_iters)
+            return False
+
+        return elapsed >= time_budget
+
+    def _is_converged(self, _iter):
+        ''' Checks whether the root average strategy has stopped changing.
+
+        Every @{arguments.cfr_check_iters} averaged iterations, the normalized root
+        average strategy is compared with the one from the previous check.
+
+        Params:
+            iter: the current iteration number of re-solving
+        Return `True` if the largest change is below @{arguments.cfr_tolerance}
+        and at least @{arguments.cfr_min_iters} iterations were run'''
+        averaged_iters = _iter + 1 - self.skip_iters
+        if averaged_iters <= 0 or averaged_iters % arguments.cfr_check_iters != 0:
+            return False
+
+        strategy = self.average_strategies_data[1].clone()
+        strategy_sum = strategy.sum(dim=0, keepdim=True)
+        strategy_sum[torch.eq(strategy_sum, 0)] = 1
+        strategy.div_(strategy_sum.expand_as(strategy))
+
+        converged = False
+        if self.last_check_strategy != None:
+            change = (strategy - self.last_check_strategy).abs().max().item()
+            converged = change < arguments.cfr_tolerance and _iter + 1 >= arguments.cfr_min_iters
+        self.last_check_strategy = strategy
+        return converged
 
     def _compute_current_strategies(self):
         ''' Uses regret matching to generate the players' current strategies.
@@ -102,10 +530,10 @@ class Lookahead:
 
             # 1.1  regret matching
             # note that the regrets as well as the CFVs have switched player indexing
-            self.regrets_sum[d] = self.positive_regrets_data[d].sum(dim=0)
+            torch.sum(self.positive_regrets_data[d], dim=0, keepdim=True, out=self.positive_regrets_sum[d])
             player_current_strategy = self.current_strategy_data[d]
             player_regrets = self.positive_regrets_data[d]
-            player_regrets_sum = self.regrets_sum[d]
+            player_regrets_sum = self.positive_regrets_sum[d]
 
             torch.div(player_regrets, player_regrets_sum.expand_as(player_regrets), out=player_current_strategy)
 
@@ -124,11 +552,13 @@ class Lookahead:
             gp_layer_terminal_actions_count = self.terminal_actions_count[d-2]
 
 
-            # copy the ranges of inner nodes and transpose
-            self.inner_nodes[d].copy_(current_level_ranges[prev_layer_terminal_actions_count :, : gp_layer_nonallin_bets_count, :, :, :].transpose(1,2).view(self.inner_nodes[d].shape))
+            # copy the ranges of inner nodes and transpose (the transposed slice cannot always be viewed
+            # in the shape of the buffer, so the buffer is viewed in its shape instead)
+            inner_nodes_ranges = current_level_ranges[prev_layer_terminal_actions_count :, : gp_layer_nonallin_bets_count, :, :, :].transpose(1,2)
+            self.inner_nodes[d].view(inner_nodes_ranges.shape).copy_(inner_nodes_ranges)
 
             super_view = self.inner_nodes[d]
-            super_view = super_view.view(1, prev_layer_bets_count, -1, constants.players_count, game_settings.card_count)
+            super_view = super_view.view(1, prev_layer_bets_count, -1, self.batch_size, constants.players_count, game_settings.card_count)
 
             super_view = super_view.expand_as(next_level_ranges)
             next_level_strategies = self.current_strategy_data[d+1]
@@ -136,7 +566,94 @@ class Lookahead:
             next_level_ranges.copy_(super_view)
 
             # multiply the ranges of the acting player by his strategy
-            next_level_ranges[:, :, :, self.acting_player[d], :].mul_(next_level_strategies)
+            next_level_ranges[:, :, :, :, self.acting_player[d], :].mul_(next_level_strategies)
+
+    def _compute_pruning(self, _iter):
+        ''' Finds the terminal and depth-limited states of the lookahead which are
+        worth evaluating, if pruning is enabled with @{arguments.lookahead_pruning}.
+
+        The values of a player only depend on the range of the opponent, so the
+        range of a player which cannot reach a terminal state gives zero values and
+        is not evaluated. This is always the case below padded actions. The values
+        of the other player are still evaluated, since they decide the regrets of
+        actions which that player currently never takes. A depth-limited state is
+        pruned if neither player can reach it. Deeper than the children of the
+        root's children (whose values continual re-solving reads), a state is also
+        pruned if the reach of both players is below @{arguments.lookahead_pruning_threshold}.
+        As in regret-based pruning, the pruned states are re-checked every
+        @{arguments.lookahead_pruning_check_iters} iterations.
+
+        Params:
+            iter: the current iteration number of re-solving
+        '''
+        if not arguments.lookahead_pruning or _iter % arguments.lookahead_pruning_check_iters != 0:
+            return
+
+        for d in range(1, self.depth):
+            if self.tree.street == 1:
+                call_ranges, call_mask = self.ranges_data[d][1][-1], self.empty_action_mask[d][1][-1]
+            else:
+                call_ranges, call_mask = self.ranges_data[d][1], self.empty_action_mask[d][1]
+            self.live_call_states[d] = self._live_ranges(d, call_ranges, call_mask).view(-1).nonzero().view(-1)
+            self.live_fold_states[d] = self._live_ranges(d, self.ranges_data[d][0], self.empty_action_mask[d][0]).view(-1).nonzero().view(-1)
+
+        live_count = max(states.size(0) for states in list(self.live_call_states.values()) + list(self.live_fold_states.values()))
+        if self.live_ranges is None or self.live_ranges.size(0) < live_count:
+            self.live_ranges = self.ranges_data[1].new_zeros(live_count, game_settings.card_count)
+            self.live_cfvs = self.cfvs_data[1].new_zeros(live_count, game_settings.card_count)
+
+        if self.tree.street == 1:
+            live_boxes = []
+            for d in self.next_street_boxes_offsets:
+                start, end = self.next_street_boxes_offsets[d]
+                live = self._live_ranges(d, self.ranges_data[d][1], self.empty_action_mask[d][1]).sum(dim=1).gt(0)
+                # the values after an allin call are given by the terminal equity
+                if d > 1:
+                    live.view(self.bets_count[d-2], -1)[-1].fill_(False)
+                live_boxes.append(live.nonzero().view(-1).add(start))
+            self.live_boxes = torch.cat(live_boxes) if live_boxes else None
+
+    def _live_ranges(self, d, ranges, mask):
+        ''' Decides which of the ranges at the states reached by one action of a layer
+        are evaluated.
+
+        Params:
+            d: the depth of the states
+            ranges: the players' ranges at the states
+            mask: the empty action mask of the states
+        Return a boolean tensor with one row per state and one column per player
+        (see @{_compute_pruning})'''
+        ranges = ranges.contiguous().view(-1, constants.players_count, game_settings.card_count)
+        reach = ranges.sum(dim=2)
+        live = mask.reshape(ranges.size(0), -1)[:, :1].gt(0) & reach.gt(0)
+        if d > 2:
+            live = live & reach.max(dim=1, keepdim=True)[0].ge(arguments.lookahead_pruning_threshold)
+        return live
+
+    def _terminal_value(self, value, ranges, cfvs, live):
+        ''' Evaluates the terminal equity at the states reached by one action of a
+        layer, skipping the pruned ranges.
+
+        Params:
+            value: the @{terminal_equity|TerminalEquity} method which evaluates the states
+            ranges: the players' ranges at the states
+            cfvs: a tensor of the same shape in which to store the values
+            live: a vector of the indexes of the evaluated ranges (over states and
+                players), or `None` to evaluate every range
+        '''
+        if live is None:
+            value(ranges.view(-1, game_settings.card_count), cfvs.view(-1, game_settings.card_count))
+            return
+
+        cfvs_view = cfvs.view(-1, game_settings.card_count)
+        cfvs_view.zero_()
+        if live.size(0) == 0:
+            return
+        live_ranges = self.live_ranges[:live.size(0)]
+        live_cfvs = self.live_cfvs[:live.size(0)]
+        torch.index_select(ranges.view(-1, game_settings.card_count), 0, live, out=live_ranges)
+        value(live_ranges, live_cfvs)
+        cfvs_view.index_copy_(0, live, live_cfvs)
 
     def _compute_update_average_strategies(self, _iter):
         ''' Updates the players' average strategies with their current strategies.
@@ -144,10 +661,16 @@ class Lookahead:
         Params:
             iter: the current iteration number of re-solving
         '''
-        if _iter >= arguments.cfr_skip_iters:
-            # no need to go through layers since we care for the average strategy only in the first node anyway
-            # note that if you wanted to average strategy on lower layers, you would need to weight the current strategy by the current reach probability
-            self.average_strategies_data[1].add_(self.current_strategy_data[1])
+        if _iter >= self.skip_iters:
+            weight = cfr_update_rules.average_weight(_iter)
+            # the root range of the re-solving player is the same in every iteration, so the first layer is not weighted by the reach
+            self.average_strategies_data[1].add_(self.current_strategy_data[1], alpha=weight)
+
+            # on lower layers the current strategy is weighted by the reach probability of the acting player,
+            # which is the range that each action reaches
+            if arguments.lookahead_average_all_depths:
+                for d in range(2, self.depth):
+                    self.average_strategies_data[d].add_(self.ranges_data[d][:, :, :, :, self.acting_player[d-1], :], alpha=weight)
 
     def _compute_terminal_equities_terminal_equity(self):
         ''' Using the players' reach probabilities, computes their counterfactual
@@ -158,61 +681,81 @@ class Lookahead:
             # call term eq evaluation
             if self.tree.street == 1:
                 if d > 1 or self.first_call_terminal:
-                    self.terminal_equity.call_value(self.ranges_data[d][1][-1].view(-1, game_settings.card_count), self.cfvs_data[d][1][-1].view(-1, game_settings.card_count)) 
+                    self._terminal_value(self.terminal_equity.call_value, self.ranges_data[d][1][-1], self.cfvs_data[d][1][-1], self.live_call_states.get(d))
             else:
                 assert(self.tree.street == 2)
                 # on river, any call is terminal 
                 if d > 1 or self.first_call_terminal:        
-                    self.terminal_equity.call_value(self.ranges_data[d][1].view(-1, game_settings.card_count), self.cfvs_data[d][1].view(-1, game_settings.card_count))
+                    self._terminal_value(self.terminal_equity.call_value, self.ranges_data[d][1], self.cfvs_data[d][1], self.live_call_states.get(d))
 
             # folds
-            self.terminal_equity.fold_value(self.ranges_data[d][0].view(-1, game_settings.card_count), self.cfvs_data[d][0].view(-1, game_settings.card_count))  
+            self._terminal_value(self.terminal_equity.fold_value, self.ranges_data[d][0], self.cfvs_data[d][0], self.live_fold_states.get(d))
 
-            # correctly set the folded player by mutliplying by -1
-            fold_mutliplier = (self.acting_player[d]*2 - 1)
-            self.cfvs_data[d][0, :, :, 0, :].mul_(fold_mutliplier)
-            self.cfvs_data[d][0, :, :, 1, :].mul_(-fold_mutliplier)
+            # correctly set the folded player, who acted at the parent, by negating his values
+            # (multiplying by a python number would allocate a tensor for it)
+            self.cfvs_data[d][0, :, :, :, self.acting_player[d], :].neg_()
 
     def _compute_terminal_equities_next_street_box(self):
         ''' Using the players' reach probabilities, calls the neural net to compute the
         players' counterfactual values at the depth-limited states of the lookahead.
+
+        The states of all depths are evaluated in a single neural net call.
         '''
         assert(self.tree.street == 1)
+        if not self.next_street_boxes_offsets:
+            return
 
-        for d in range(1, self.depth):
-            
-            if d > 1 or self.first_call_transition:
-                if self.next_street_boxes_inputs == None:
-                    self.next_street_boxes_inputs = {}
-                if self.next_street_boxes_outputs == None:
-                    self.next_street_boxes_outputs = {}
-                
-                if not d in self.next_street_boxes_inputs: 
-                    self.next_street_boxes_inputs[d] = self.ranges_data[d][1, :, :, :, :].view(-1, constants.players_count, game_settings.card_count).clone().fill_(0)
-                if not d in self.next_street_boxes_outputs: 
-                    self.next_street_boxes_outputs[d] = self.next_street_boxes_inputs[d].clone()
+        for d in self.next_street_boxes_offsets:
+            start, end = self.next_street_boxes_offsets[d]
+            self.next_street_boxes_outputs[start:end].copy_(self.ranges_data[d][1, :, :, :, :, :].view(self.next_street_boxes_outputs[start:end].shape))
                 
-                # now the neural net accepts the input for P1 and P2 respectively, so we need to swap the ranges if necessary
-                self.next_street_boxes_outputs[d].copy_(self.ranges_data[d][1, :, :, :, :].view(self.next_street_boxes_outputs[d].shape))
-                
-                if self.tree.current_player == 0:
-                    self.next_street_boxes_inputs[d].copy_(self.next_street_boxes_outputs[d])
-                else:
-                    self.next_street_boxes_inputs[d][:, 0, :].copy_(self.next_street_boxes_outputs[d][:, 1, :])
-                    self.next_street_boxes_inputs[d][:, 1, :].copy_(self.next_street_boxes_outputs[d][:, 0, :])
-                
-                self.next_street_boxes[d].get_value(self.next_street_boxes_inputs[d], self.next_street_boxes_outputs[d])      
-                
-                # now the neural net outputs for P1 and P2 respectively, so we need to swap the output values if necessary
-                if self.tree.current_player == 0:
-                    self.next_street_boxes_inputs[d].copy_(self.next_street_boxes_outputs[d])
-                    
-                    self.next_street_boxes_outputs[d][:, 0, :].copy_(self.next_street_boxes_inputs[d][:, 1, :])
-                    self.next_street_boxes_outputs[d][:, 1, :].copy_(self.next_street_boxes_inputs[d][:, 0, :])
-                
-                self.cfvs_data[d][1, :, :, :, :].copy_(self.next_street_boxes_outputs[d].view(self.cfvs_data[d][1, :, :, :, :].shape))
+        # now the neural net accepts the input for P1 and P2 respectively, so we need to swap the ranges if necessary
+        if self.tree.current_player == 0:
+            self.next_street_boxes_inputs.copy_(self.next_street_boxes_outputs)
+        else:
+            self.next_street_boxes_inputs[:, 0, :].copy_(self.next_street_boxes_outputs[:, 1, :])
+            self.next_street_boxes_inputs[:, 1, :].copy_(self.next_street_boxes_outputs[:, 0, :])
+        
+        self.next_street_box.get_value(self.next_street_boxes_inputs, self.next_street_boxes_outputs, self.live_boxes)
+        
+        # now the neural net outputs for P1 and P2 respectively, so we need to swap the output values if necessary
+        if self.tree.current_player == 0:
+            self.next_street_boxes_inputs.copy_(self.next_street_boxes_outputs)
+            
+            self.next_street_boxes_outputs[:, 0, :].copy_(self.next_street_boxes_inputs[:, 1, :])
+            self.next_street_boxes_outputs[:, 1, :].copy_(self.next_street_boxes_inputs[:, 0, :])
+        
+        for d in self.next_street_boxes_offsets:
+            start, end = self.next_street_boxes_offsets[d]
+            self.cfvs_data[d][1, :, :, :, :, :].copy_(self.next_street_boxes_outputs[start:end].view(self.cfvs_data[d][1, :, :, :, :, :].shape))
+
+    def _chance_action_box(self, action_index, path=()):
+        ''' Gives the depth and the index of the next street boxes reached after an
+        action of the re-solving player.
 
-    def get_chance_action_cfv(self, action_index, board):
+        No box follows an allin, after which the call of the opponent ends the game.
+
+        Params:
+            action_index: the index of the action taken by the re-solving player
+            path [opt]: the nodes from a child of the root to the node where the
+                action is taken (see @{find_descendant_path}), the root by default
+        Return the depth of the boxes and the index of the action's box among them'''
+        layer = len(path)
+        node = path[-1] if path else self.tree
+        child = node.children[action_index]
+        layer = layer + 1
+
+        # after a bet, the street ends with the call of the opponent
+        if child.current_player != constants.players.chance:
+            assert not child.terminal, 'no chance event follows a terminal action'
+            child = child.children[1]
+            layer = layer + 1
+        assert child.current_player == constants.players.chance, 'no chance event follows an allin, the call ends the game'
+
+        _, parent_id, gp_id = child.lookahead_coordinates.tolist()
+        return layer, parent_id * self.pot_size[layer].size(2) + gp_id
+
+    def get_chance_action_cfv(self, action_index, board, path=()):
         ''' Gives the average counterfactual values for the opponent during re-solving 
         after a chance event (the betting round changes and more cards are dealt).
 
@@ -220,40 +763,56 @@ class Lookahead:
         first be re-solved with @{resolve} or @{resolve_first_node}.
 
         Params:
-            action_index: the action taken by the re-solving player at the start of the lookahead
+            action_index: the action taken by the re-solving player
             board: a tensor of board cards, updated by the chance event
-        Return a vector of cfvs'''
-        box_outputs = None
-        next_street_box = None
-        batch_index = None
-        pot_mult = None
-        
-        assert(not ((action_index == 1) and (self.first_call_terminal)))
-        
-        # check if we should not use the first layer for transition call
-        if action_index == 1 and self.first_call_transition:
-            box_outputs = self.next_street_boxes_inputs[1].clone().fill_(0)
-            assert(box_outputs.size(0) == 1)
-            batch_index = 0
-            next_street_box = self.next_street_boxes[1]
-            pot_mult = self.pot_size[1][1]
-        else:
-            batch_index = action_index - 1 # remove fold
-            if self.first_call_transition:
-                batch_index = batch_index - 1
-        
-            box_outputs = self.next_street_boxes_inputs[2].clone().fill_(0)
-            next_street_box = self.next_street_boxes[2]
-            pot_mult = self.pot_size[2][1]
+            path [opt]: the nodes from a child of the root to the node where the
+                action is taken (see @{find_descendant_path}), the root by default
+        Return a vector of cfvs (a BxK tensor for a batched lookahead)'''
+        depth, batch_index = self._chance_action_box(action_index, path)
         
+        start, end = self.next_street_boxes_offsets[depth]
+        box_outputs = self.next_street_boxes_inputs.clone().fill_(0)
+        self.next_street_box.get_value_on_board(board, box_outputs)
+        box_outputs = box_outputs[start:end]
         
-        if box_outputs == None:
-            assert(False)
-        next_street_box.get_value_on_board(board, box_outputs)
+        box_outputs.mul_(self.pot_size[depth][1].reshape(end - start, *self.pot_size[depth].shape[-2:]))
         
-        box_outputs.mul_(pot_mult.view(box_outputs.shape))
-        
-        out = box_outputs[batch_index][1-self.tree.current_player]
+        # [boxes x batch x players x range]
+        box_outputs = box_outputs.view(-1, self.batch_size, constants.players_count, game_settings.card_count)
+        out = box_outputs[batch_index, :, 1-self.tree.current_player]
+        if not self.batched:
+            out = out[0]
+        return out
+
+    def get_chance_action_cfvs(self, action_index, path=()):
+        ''' Gives the average counterfactual values for the opponent during re-solving
+        after a chance event, on every possible board at once.
+
+        Gives the same values as @{get_chance_action_cfv} for each board, with a
+        single batched matrix multiplication for all boards.
+
+        Params:
+            action_index: the action taken by the re-solving player
+            path [opt]: the nodes from a child of the root to the node where the
+                action is taken (see @{find_descendant_path}), the root by default
+        Return a BxK tensor of cfvs, where B is the number of boards ordered by
+        @{card_tools.get_board_index} (an NxBxK tensor for a batched lookahead)'''
+        depth, batch_index = self._chance_action_box(action_index, path)
+
+        start, end = self.next_street_boxes_offsets[depth]
+        board_count = card_tools.get_boards_count()
+        box_outputs = arguments.Tensor(board_count, *self.next_street_boxes_inputs.shape)
+        self.next_street_box.get_value_on_all_boards(box_outputs)
+        box_outputs = box_outputs[:, start:end]
+
+        pot_size = self.pot_size[depth][1].reshape(1, end - start, *self.pot_size[depth].shape[-2:])
+        box_outputs = box_outputs * pot_size
+
+        # [boards x boxes x batch x players x range]
+        box_outputs = box_outputs.view(board_count, -1, self.batch_size, constants.players_count, game_settings.card_count)
+        out = box_outputs[:, batch_index, :, 1-self.tree.current_player].transpose(0, 1)
+        if not self.batched:
+            out = out[0]
         return out
 
     def _compute_terminal_equities(self):
@@ -267,6 +826,12 @@ class Lookahead:
 
         self._compute_terminal_equities_terminal_equity() 
 
+        self._compute_terminal_equities_pot_size()
+
+    def _compute_terminal_equities_pot_size(self):
+        ''' Scales the counterfactual values at the terminal states of the lookahead
+        by their pot sizes.
+        '''
         # multiply by pot scale factor
         for d in range(1, self.depth):
             self.cfvs_data[d].mul_(self.pot_size[d])
@@ -279,15 +844,15 @@ class Lookahead:
             gp_layer_terminal_actions_count = self.terminal_actions_count[d-2]
             ggp_layer_nonallin_bets_count = self.nonallinbets_count[d-3]
 
-            self.cfvs_data[d][:, :, :, 0, :].mul_(self.empty_action_mask[d])
-            self.cfvs_data[d][:, :, :, 1, :].mul_(self.empty_action_mask[d])
+            self.cfvs_data[d][:, :, :, :, 0, :].mul_(self.empty_action_mask[d])
+            self.cfvs_data[d][:, :, :, :, 1, :].mul_(self.empty_action_mask[d])
 
             self.placeholder_data[d].copy_(self.cfvs_data[d])
 
             # player indexing is swapped for cfvs
-            self.placeholder_data[d][:, :, :, self.acting_player[d], :].mul_(self.current_strategy_data[d])
+            self.placeholder_data[d][:, :, :, :, self.acting_player[d], :].mul_(self.current_strategy_data[d])
 
-            self.regrets_sum[d] = self.placeholder_data[d].sum(dim=0, keepdim=True)
+            torch.sum(self.placeholder_data[d], dim=0, keepdim=True, out=self.regrets_sum[d])
 
             # use a swap placeholder to change {{1,2,3}, {4,5,6}} into {{1,2}, {3,4}, {5,6}}
             swap = self.swap_data[d-1]
@@ -301,10 +866,17 @@ class Lookahead:
         Params:
             iter: the current iteration number of re-solving
         '''
-        if _iter >= arguments.cfr_skip_iters:
-            self.average_cfvs_data[0].add_(self.cfvs_data[0])
+        if _iter >= self.skip_iters:
+            weight = cfr_update_rules.average_weight(_iter)
+            self.average_weight_sum += weight
+
+            self.average_cfvs_data[0].add_(self.cfvs_data[0], alpha=weight)
             
-            self.average_cfvs_data[1].add_(self.cfvs_data[1])
+            self.average_cfvs_data[1].add_(self.cfvs_data[1], alpha=weight)
+
+            if arguments.lookahead_average_all_depths:
+                for d in range(2, self.depth):
+                    self.average_cfvs_data[d].add_(self.cfvs_data[d], alpha=weight)
 
     def _compute_normalize_average_strategies(self):
         ''' Normalizes the players' average strategies.
@@ -312,11 +884,8 @@ class Lookahead:
         Used at the end of re-solving so that we can track un-normalized average
         strategies, which are simpler to compute.
         '''
-        # using regrets_sum as a placeholder container
         player_avg_strategy = self.average_strategies_data[1]
-        player_avg_strategy_sum = self.regrets_sum[1]
-
-        player_avg_strategy_sum = player_avg_strategy.sum(dim=0)
+        player_avg_strategy_sum = player_avg_strategy.sum(dim=0, keepdim=True)
         player_avg_strategy.div_(player_avg_strategy_sum.expand_as(player_avg_strategy))
         
         # if the strategy is 'empty' (zero reach), strategy does not matter but we need to make sure
@@ -330,11 +899,14 @@ class Lookahead:
         Used at the end of re-solving so that we can track un-normalized average
         cfvs, which are simpler to compute.
         '''
-        self.average_cfvs_data[0].div_(arguments.cfr_iters - arguments.cfr_skip_iters)
+        self.average_cfvs_data[0].div_(self.average_weight_sum)
 
-    def _compute_regrets(self):
+    def _compute_regrets(self, _iter):
         ''' Using the players' counterfactual values, updates their total regrets
         for every state in the lookahead.
+
+        Params:
+            iter: the current iteration number of re-solving
         '''
         for d in range(self.depth-1, 0, -1):
             gp_layer_terminal_actions_count = self.terminal_actions_count[d-2]
@@ -342,21 +914,24 @@ class Lookahead:
             ggp_layer_nonallin_bets_count = self.nonallinbets_count[d-3]
 
             current_regrets = self.current_regrets_data[d]
-            current_regrets.copy_(self.cfvs_data[d][:, :, :, self.acting_player[d], :])
+            current_regrets.copy_(self.cfvs_data[d][:, :, :, :, self.acting_player[d], :])
 
             next_level_cfvs = self.cfvs_data[d-1]
 
             parent_inner_nodes = self.inner_nodes_p1[d-1]
-            parent_inner_nodes.copy_(next_level_cfvs[gp_layer_terminal_actions_count :, : ggp_layer_nonallin_bets_count, :, self.acting_player[d], :].transpose(1,2).view(parent_inner_nodes.shape))
-            parent_inner_nodes = parent_inner_nodes.view(1, gp_layer_bets_count, -1, game_settings.card_count)
+            parent_inner_nodes_cfvs = next_level_cfvs[gp_layer_terminal_actions_count :, : ggp_layer_nonallin_bets_count, :, :, self.acting_player[d], :].transpose(1,2)
+            parent_inner_nodes.view(parent_inner_nodes_cfvs.shape).copy_(parent_inner_nodes_cfvs)
+            parent_inner_nodes = parent_inner_nodes.view(1, gp_layer_bets_count, -1, self.batch_size, game_settings.card_count)
             parent_inner_nodes = parent_inner_nodes.expand_as(current_regrets)
 
             current_regrets.sub_(parent_inner_nodes)
             
-            self.regrets_data[d] = torch.add(self.regrets_data[d], current_regrets)
+            cfr_update_rules.discount_regrets(self.regrets_data[d], _iter)
+            self.regrets_data[d].add_(current_regrets)
 
             # (CFR+)
-            self.regrets_data[d].clamp_(0, constants.max_number)
+            if cfr_update_rules.clamps_regrets():
+                self.regrets_data[d].clamp_(0, constants.max_number)
 
 
     def get_results(self):
@@ -371,52 +946,203 @@ class Lookahead:
             * `achieved_cfvs`: a vector of the opponent's average counterfactual values at the 
                 root of the lookahead
             * `children_cfvs`: an AxK tensor of opponent average counterfactual values after
-                each action that the re-solve player can take at the root of the lookahead'''
+                each action that the re-solve player can take at the root of the lookahead
+            * `iterations`: the number of CFR iterations that were run
+            * `profile`: the @{lookahead_profile|LookaheadProfile} of the re-solve, or
+                `None` if it was not profiled (see @{arguments.lookahead_profile_rate})
+        For a batched lookahead every field gains a leading batch dimension and the
+        actions follow the padded layout of the lookahead (allin is always the last action).'''
         out = ResolveResult()
+        out.iterations = self.iterations
+        out.profile = self.profile
         
         actions_count = self.average_strategies_data[1].size(0)
+        batch_size = self.batch_size
 
         # 1.0 average strategy
-        # [actions x range]
+        # [batch x actions x range]
         # lookahead already computes the averate strategy we just convert the dimensions
-        out.strategy = self.average_strategies_data[1].view(-1, game_settings.card_count).clone()
+        out.strategy = self.average_strategies_data[1].view(actions_count, batch_size, game_settings.card_count).transpose(0, 1).contiguous().clone()
 
         # 2.0 achieved opponent's CFVs at the starting node  
-        out.achieved_cfvs = self.average_cfvs_data[0].view(constants.players_count, game_settings.card_count)[0].clone()
+        root_cfvs = self.average_cfvs_data[0].view(batch_size, constants.players_count, game_settings.card_count)
+        out.achieved_cfvs = root_cfvs[:, 0].clone()
         
         # 3.0 CFVs for the acting player only when resolving first node
         if self.reconstruction_opponent_cfvs != None:
             out.root_cfvs = None
         else:
-            out.root_cfvs = self.average_cfvs_data[0].view(constants.players_count, game_settings.card_count)[1].clone()
+            out.root_cfvs = root_cfvs[:, 1].clone()
             
             # swap cfvs indexing
-            out.root_cfvs_both_players = self.average_cfvs_data[0].view(constants.players_count, game_settings.card_count).clone()
-            out.root_cfvs_both_players[1].copy_(self.average_cfvs_data[0].view(constants.players_count, game_settings.card_count)[0])
-            out.root_cfvs_both_players[0].copy_(self.average_cfvs_data[0].view(constants.players_count, game_settings.card_count)[1])
+            out.root_cfvs_both_players = root_cfvs.clone()
+            out.root_cfvs_both_players[:, 1].copy_(root_cfvs[:, 0])
+            out.root_cfvs_both_players[:, 0].copy_(root_cfvs[:, 1])
         
         # 4.0 children CFVs
-        # [actions x range]
-        out.children_cfvs = self.average_cfvs_data[1][:, :, :, 0, :].clone().view(-1, game_settings.card_count)
+        # [batch x actions x range]
+        out.children_cfvs = self.average_cfvs_data[1][:, :, :, :, 0, :].clone().view(actions_count, batch_size, game_settings.card_count).transpose(0, 1).contiguous().clone()
 
         # IMPORTANT divide average CFVs by average strategy in here
-        scaler = self.average_strategies_data[1].view(-1, game_settings.card_count).clone()
+        scaler = out.strategy.clone()
 
-        range_mul = self.ranges_data[0][:, :, :, 0, :].view(1, game_settings.card_count).clone()
+        range_mul = self.ranges_data[0][:, :, :, :, 0, :].view(batch_size, 1, game_settings.card_count).clone()
         range_mul = range_mul.expand_as(scaler)
 
         scaler = scaler.mul(range_mul)
-        scaler = scaler.sum(dim=1, keepdim=True).expand_as(range_mul).clone()
-        scaler = scaler.mul(arguments.cfr_iters - arguments.cfr_skip_iters)   
+        scaler = scaler.sum(dim=2, keepdim=True).expand_as(range_mul).clone()
+        scaler = scaler.mul(self.average_weight_sum)   
         
         out.children_cfvs.div_(scaler)  
         
         assert(out.strategy != None)
         assert(out.achieved_cfvs != None)
         assert(out.children_cfvs != None)
+
+        # the results are given in the precision of the ranges, whatever the accumulators use
+        out.strategy = out.strategy.to(precision_policy.dtype)
+        out.achieved_cfvs = out.achieved_cfvs.to(precision_policy.dtype)
+        out.children_cfvs = out.children_cfvs.to(precision_policy.dtype)
+        if out.root_cfvs != None:
+            out.root_cfvs = out.root_cfvs.to(precision_policy.dtype)
+            out.root_cfvs_both_players = out.root_cfvs_both_players.to(precision_policy.dtype)
+
+        # a single situation is returned without the batch dimension
+        if not self.batched:
+            out.strategy = out.strategy[0]
+            out.achieved_cfvs = out.achieved_cfvs[0]
+            out.children_cfvs = out.children_cfvs[0]
+            if out.root_cfvs != None:
+                out.root_cfvs = out.root_cfvs[0]
+                out.root_cfvs_both_players = out.root_cfvs_both_players[0]
         
         return out
 
+    def find_descendant_path(self, node, start=()):
+        ''' Searches the public tree of the lookahead for a later decision of the street.
+
+        Within a street, a player node is identified by the acting player and the bets.
+
+        Params:
+            node: the game node of the decision
+            start [opt]: the path to the node where the search starts, the root by default
+        Return the list of nodes of the public tree from a child of the root to the
+        matching node, or `None` if the lookahead does not contain the node'''
+        parent = start[-1] if start else self.tree
+        for child in parent.children:
+            if child.terminal or child.current_player == constants.players.chance:
+                continue
+            path = list(start) + [child]
+            if child.current_player == node.current_player and torch.equal(child.bets, node.bets):
+                return path
+            path = self.find_descendant_path(node, path)
+            if path != None:
+                return path
+        return None
+
+    def _descendant_reach(self, path):
+        ''' Gives the average reach probabilities at the end of a path.
+
+        Params:
+            path: the nodes from a child of the root to the descendant
+        Return a pair of the re-solving player's average reach of each hand (weighted
+        by the sum of the averaging weights), and the probability that the opponent's
+        average strategy takes the opponent's actions on the path'''
+        player_reach = None
+        opponent_probability = 1.0
+        for layer in range(1, len(path)+1):
+            action_id, parent_id, gp_id = path[layer-1].lookahead_coordinates.tolist()
+            strategy = self.average_strategies_data[layer]
+            if layer == 1:
+                # the first layer holds the normalized strategy of the root
+                player_reach = self.ranges_data[0][0, 0, 0, 0, 0, :] * strategy[action_id, 0, 0, 0, :] * self.average_weight_sum
+            elif self.acting_player[layer-1] == 0:
+                player_reach = strategy[action_id, parent_id, gp_id, 0, :]
+            else:
+                node_reach = strategy[:, parent_id, gp_id, 0, :].sum().item()
+                action_reach = strategy[action_id, parent_id, gp_id, 0, :].sum().item()
+                opponent_probability = opponent_probability * (action_reach / node_reach if node_reach > 0 else 0)
+        return player_reach, opponent_probability
+
+    def get_action_probabilities(self, path):
+        ''' Gives the probability of each action at a later decision of the street,
+        under the average strategy of the acting player over all its hands.
+
+        Requires @{arguments.lookahead_average_all_depths}. The lookahead must first be
+        re-solved with @{resolve} or @{resolve_first_node}.
+
+        Params:
+            path: the nodes from a child of the root to the decision (see @{find_descendant_path})
+        Return a vector with the probability of each child of the decision'''
+        assert(arguments.lookahead_average_all_depths)
+        assert(not self.batched and self.iterations != None)
+        node = path[-1]
+        children_ids = [child.lookahead_coordinates[0].item() for child in node.children]
+        _, children_parent_id, children_gp_id = node.children[0].lookahead_coordinates.tolist()
+
+        # the averages hold the reach of the acting player after each action
+        reach = self.average_strategies_data[len(path)+1][children_ids, children_parent_id, children_gp_id, 0, :].sum(dim=1)
+        total = reach.sum().item()
+        if total == 0:
+            return reach.fill_(1 / len(children_ids))
+        return reach.div_(total)
+
+    def get_descendant_results(self, path):
+        ''' Gets the results of re-solving at a later decision of the street, read from
+        the averages of all depths (see @{arguments.lookahead_average_all_depths}).
+
+        The lookahead must first be re-solved with @{resolve} or
+        @{resolve_first_node}.
+
+        Params:
+            path: the nodes from a child of the root to the decision (see @{find_descendant_path})
+        Return a @{ResolveResult} with the fields `strategy`, `achieved_cfvs` and
+        `children_cfvs` of @{get_results} for the decision (the opponent cfvs are for
+        the normalized range of the re-solving player), and `reach`: the probability
+        that the opponent's average strategy takes the opponent's actions on the path.
+        Only the decisions reached with this probability are close to the strategy
+        of a re-solve, since their regrets are weighted by the opponent's reach.'''
+        assert(arguments.lookahead_average_all_depths)
+        assert(not self.batched and self.iterations != None)
+        node = path[-1]
+        layer = len(path)
+        assert(not node.terminal and node.current_player != constants.players.chance)
+
+        out = ResolveResult()
+        out.iterations = self.iterations
+        out.profile = self.profile
+
+        player_reach, out.reach = self._descendant_reach(path)
+        action_id, parent_id, gp_id = node.lookahead_coordinates.tolist()
+        children_ids = [child.lookahead_coordinates[0].item() for child in node.children]
+        _, children_parent_id, children_gp_id = node.children[0].lookahead_coordinates.tolist()
+
+        # 1.0 average strategy of the acting player [actions x range]
+        strategy = self.average_strategies_data[layer+1][children_ids, children_parent_id, children_gp_id, 0, :]
+        strategy.div_(strategy.sum(dim=0, keepdim=True).expand_as(strategy))
+        # as in the root, the strategy of hands which never reach the node is to fold
+        strategy[0][strategy[0].ne(strategy[0])] = 1
+        strategy[strategy.ne(strategy)] = 0
+        out.strategy = strategy
+
+        # 2.0 achieved opponent's CFVs at the node
+        scaler = player_reach.sum().item()
+        out.achieved_cfvs = self.average_cfvs_data[layer][action_id, parent_id, gp_id, 0, 0, :].div(scaler if scaler > 0 else 1)
+
+        # 3.0 children CFVs [actions x range]
+        out.children_cfvs = self.average_cfvs_data[layer+1][children_ids, children_parent_id, children_gp_id, 0, 0, :]
+        if self.acting_player[layer] == 0:
+            scaler = self.average_strategies_data[layer+1][children_ids, children_parent_id, children_gp_id, 0, :].sum(dim=1, keepdim=True)
+            scaler[torch.eq(scaler, 0)] = 1
+            out.children_cfvs.div_(scaler.expand_as(out.children_cfvs))
+        else:
+            out.children_cfvs.div_(scaler if scaler > 0 else 1)
+
+        out.strategy = out.strategy.to(precision_policy.dtype)
+        out.achieved_cfvs = out.achieved_cfvs.to(precision_policy.dtype)
+        out.children_cfvs = out.children_cfvs.to(precision_policy.dtype)
+        return out
+
     def _set_opponent_starting_range(self, iteration):
         ''' Generates the opponent's range for the current re-solve iteration using
         the @{cfrd_gadget|CFRDGadget}.
@@ -426,5 +1152,5 @@ class Lookahead:
         '''
         if self.reconstruction_opponent_cfvs != None:
             # note that CFVs indexing is swapped, thus the CFVs for the reconstruction player are for player '1'
-            opponent_range = self.reconstruction_gadget.compute_opponent_range(self.cfvs_data[0][:, :, :, 0, :], iteration)
-            self.ranges_data[0][:, :, :, 1, :].copy_(opponent_range)
\ No newline at end of file
+            opponent_range = self.reconstruction_gadget.compute_opponent_range(self.cfvs_data[0][:, :, :, :, 0, :], iteration)
+            self.ranges_data[0][:, :, :, :, 1, :].copy_(opponent_range)
\ No newline at end of file
@@ -2,11 +2,17 @@
 from Source.Settings.arguments import arguments
 from Source.Settings.constants import constants
 from Source.Settings.game_settings import game_settings
+from Source.Settings.precision_policy import precision_policy
 from Source.Nn.value_nn import ValueNn
 from Source.Nn.next_round_value import NextRoundValue
 import torch
 
 neural_net = None
+
+# the per-depth tensors which only hold intermediate results within the step of one depth,
+# they share a single buffer in the compact layout (see @{arguments.lookahead_compact_layout})
+scratch_families = ['placeholder_data', 'swap_data', 'inner_nodes', 'inner_nodes_p1', 'current_regrets_data']
+
 class LookaheadBuilder:
     # used to load NN only once
 
@@ -22,8 +28,13 @@ class LookaheadBuilder:
         self.lookahead.fold_action_index = 2
 
     def _construct_transition_boxes(self):
-        ''' Builds the neural net query boxes which estimate counterfactual values
+        ''' Builds the neural net query box which estimates counterfactual values
         at depth-limited states of the lookahead.
+
+        The depth-limited states of all depths are evaluated together by one
+        @{next_round_value|NextRoundValue}, so each iteration makes a single call to
+        the neural net. `next_street_boxes_offsets[d]` gives the rows of depth `d`
+        in the batch of that call.
         '''
         global neural_net
         if self.lookahead.tree.street == 2:
@@ -33,10 +44,23 @@ class LookaheadBuilder:
         if not neural_net:  
             neural_net = ValueNn()
         
-        self.lookahead.next_street_boxes = {}
+        self.lookahead.next_street_boxes_offsets = {}
+        pot_sizes = []
+        boxes_count = 0
         for d in range(1, self.lookahead.depth):
-            self.lookahead.next_street_boxes[d] = NextRoundValue(neural_net)
-            self.lookahead.next_street_boxes[d].start_computation(self.lookahead.pot_size[d][1, :, :, 0, 0].clone().view(-1))
+            if d > 1 or self.lookahead.first_call_transition:
+                depth_pot_sizes = self.lookahead.pot_size[d][1, :, :, :, 0, 0].clone().view(-1)
+                self.lookahead.next_street_boxes_offsets[d] = (boxes_count, boxes_count + depth_pot_sizes.size(0))
+                boxes_count = boxes_count + depth_pot_sizes.size(0)
+                pot_sizes.append(depth_pot_sizes)
+
+        self.lookahead.next_street_box = NextRoundValue(neural_net)
+        # the street may only end with calls of allins, then there are no boxes
+        self.lookahead.next_street_box.start_computation(torch.cat(pot_sizes) if pot_sizes else arguments.Tensor())
+
+        # [boxes x players x range]
+        self.lookahead.next_street_boxes_inputs = arguments.Tensor(boxes_count, constants.players_count, game_settings.card_count).fill_(0)
+        self.lookahead.next_street_boxes_outputs = self.lookahead.next_street_boxes_inputs.clone()
 
     def _compute_structure(self):
         ''' Computes the number of nodes at each depth of the tree.
@@ -110,6 +134,7 @@ class LookaheadBuilder:
         self.lookahead.positive_regrets_data = {}  
         self.lookahead.placeholder_data = {}
         self.lookahead.regrets_sum = {}  
+        self.lookahead.positive_regrets_sum = {}
         self.lookahead.empty_action_mask = {} # used to mask empty actions  
         # used to hold and swap inner (nonterminal) nodes when doing some transpose operations
         self.lookahead.inner_nodes = {}
@@ -117,13 +142,15 @@ class LookaheadBuilder:
         self.lookahead.swap_data = {}
 
         
+        batch_size = self.lookahead.batch_size
+
         # create the data structure for the first two layers
 
         # data structures [actions x parent_action x grandparent_id x batch x players x range]
-        self.lookahead.ranges_data[0] = arguments.Tensor(1, 1, 1, constants.players_count, game_settings.card_count).fill_(1.0 / game_settings.card_count)
-        self.lookahead.ranges_data[1] = arguments.Tensor(self.lookahead.actions_count[0], 1, 1, constants.players_count, game_settings.card_count).fill_(1.0 / game_settings.card_count)
-        self.lookahead.pot_size[0] = self.lookahead.ranges_data[0].clone().fill_(0)
-        self.lookahead.pot_size[1] = self.lookahead.ranges_data[1].clone().fill_(0)  
+        self.lookahead.ranges_data[0] = arguments.Tensor(1, 1, 1, batch_size, constants.players_count, game_settings.card_count).fill_(1.0 / game_settings.card_count)
+        self.lookahead.ranges_data[1] = arguments.Tensor(self.lookahead.actions_count[0], 1, 1, batch_size, constants.players_count, game_settings.card_count).fill_(1.0 / game_settings.card_count)
+        self.lookahead.pot_size[0] = self._constant_data(self.lookahead.ranges_data[0], 0, 2)
+        self.lookahead.pot_size[1] = self._constant_data(self.lookahead.ranges_data[1], 0, 2)
         self.lookahead.cfvs_data[0] = self.lookahead.ranges_data[0].clone().fill_(0)
         self.lookahead.cfvs_data[1] = self.lookahead.ranges_data[1].clone().fill_(0)
         self.lookahead.average_cfvs_data[0] = self.lookahead.ranges_data[0].clone().fill_(0)
@@ -131,9 +158,9 @@ class LookaheadBuilder:
         self.lookahead.placeholder_data[0] = self.lookahead.ranges_data[0].clone().fill_(0)
         self.lookahead.placeholder_data[1] = self.lookahead.ranges_data[1].clone().fill_(0)
 
-        # data structures for one player [actions x parent_action x grandparent_id x 1 x range]
+        # data structures for one player [actions x parent_action x grandparent_id x batch x range]
         self.lookahead.average_strategies_data[0] = None
-        self.lookahead.average_strategies_data[1] = arguments.Tensor(self.lookahead.actions_count[0], 1, 1, game_settings.card_count).fill_(0)  
+        self.lookahead.average_strategies_data[1] = arguments.Tensor(self.lookahead.actions_count[0], 1, 1, batch_size, game_settings.card_count).fill_(0)  
         self.lookahead.current_strategy_data[0] = None
         self.lookahead.current_strategy_data[1] = self.lookahead.average_strategies_data[1].clone().fill_(0)
         self.lookahead.regrets_data[0] = None
@@ -143,51 +170,100 @@ class LookaheadBuilder:
         self.lookahead.positive_regrets_data[0] = None
         self.lookahead.positive_regrets_data[1] = self.lookahead.average_strategies_data[1].clone().fill_(0)
         self.lookahead.empty_action_mask[0] = None
-        self.lookahead.empty_action_mask[1] = self.lookahead.average_strategies_data[1].clone().fill_(1)
+        self.lookahead.empty_action_mask[1] = self._constant_data(self.lookahead.average_strategies_data[1], 1, 1)
 
-        # data structures for summing over the actions [1 x parent_action x grandparent_id x range]
-        self.lookahead.regrets_sum[0] = arguments.Tensor(1, 1, 1, game_settings.card_count).fill_(0)
-        self.lookahead.regrets_sum[1] = arguments.Tensor(1, self.lookahead.bets_count[0], 1, game_settings.card_count).fill_(0)
+        # data structures for summing over the actions [1 x parent_action x grandparent_id x batch x players x range]
+        self.lookahead.regrets_sum[0] = arguments.Tensor(1, 1, 1, batch_size, constants.players_count, game_settings.card_count).fill_(0)
+        self.lookahead.regrets_sum[1] = arguments.Tensor(1, 1, 1, batch_size, constants.players_count, game_settings.card_count).fill_(0)
+        # data structures for summing over the actions for one player [1 x parent_action x grandparent_id x batch x range]
+        self.lookahead.positive_regrets_sum[0] = None
+        self.lookahead.positive_regrets_sum[1] = arguments.Tensor(1, 1, 1, batch_size, game_settings.card_count).fill_(0)
 
         # data structures for inner nodes (not terminal nor allin) [bets_count x parent_nonallinbetscount x gp_id x batch x players x range]
-        self.lookahead.inner_nodes[0] = arguments.Tensor(1, 1, 1, constants.players_count, game_settings.card_count).fill_(0)
+        self.lookahead.inner_nodes[0] = arguments.Tensor(1, 1, 1, batch_size, constants.players_count, game_settings.card_count).fill_(0)
         self.lookahead.swap_data[0] = self.lookahead.inner_nodes[0].transpose(1,2).clone()
-        self.lookahead.inner_nodes_p1[0] = arguments.Tensor(1, 1, 1, 1, game_settings.card_count).fill_(0)
+        self.lookahead.inner_nodes_p1[0] = arguments.Tensor(1, 1, 1, batch_size, 1, game_settings.card_count).fill_(0)
         
         if self.lookahead.depth > 1:
-            self.lookahead.inner_nodes[1] = arguments.Tensor(self.lookahead.bets_count[0], 1, 1, constants.players_count, game_settings.card_count).fill_(0)  
+            self.lookahead.inner_nodes[1] = arguments.Tensor(self.lookahead.bets_count[0], 1, 1, batch_size, constants.players_count, game_settings.card_count).fill_(0)  
             self.lookahead.swap_data[1] = self.lookahead.inner_nodes[1].transpose(1,2).clone()
-            self.lookahead.inner_nodes_p1[1] = arguments.Tensor(self.lookahead.bets_count[0], 1, 1, 1, game_settings.card_count).fill_(0)
+            self.lookahead.inner_nodes_p1[1] = arguments.Tensor(self.lookahead.bets_count[0], 1, 1, batch_size, 1, game_settings.card_count).fill_(0)
 
 
         # create the data structures for the rest of the layers
         for d in range(2, self.lookahead.depth):
 
             # data structures [actions x parent_action x grandparent_id x batch x players x range]
-            self.lookahead.ranges_data[d] = arguments.Tensor(self.lookahead.actions_count[d-1], self.lookahead.bets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], constants.players_count, game_settings.card_count).fill_(0)
+            self.lookahead.ranges_data[d] = arguments.Tensor(self.lookahead.actions_count[d-1], self.lookahead.bets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], batch_size, constants.players_count, game_settings.card_count).fill_(0)
             self.lookahead.cfvs_data[d] = self.lookahead.ranges_data[d].clone()
             self.lookahead.placeholder_data[d] = self.lookahead.ranges_data[d].clone()
-            self.lookahead.pot_size[d] = self.lookahead.ranges_data[d].clone().fill_(arguments.stack)
+            self.lookahead.pot_size[d] = self._constant_data(self.lookahead.ranges_data[d], arguments.stack, 2)
+            # the average cfvs below the children of the root are only kept when all depths are averaged
+            if arguments.lookahead_average_all_depths:
+                self.lookahead.average_cfvs_data[d] = self.lookahead.ranges_data[d].clone()
 
-            # data structures [actions x parent_action x grandparent_id x batch x 1 x range]
-            self.lookahead.average_strategies_data[d] = arguments.Tensor(self.lookahead.actions_count[d-1], self.lookahead.bets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], game_settings.card_count).fill_(0)
+            # data structures [actions x parent_action x grandparent_id x batch x range]
+            self.lookahead.average_strategies_data[d] = arguments.Tensor(self.lookahead.actions_count[d-1], self.lookahead.bets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], batch_size, game_settings.card_count).fill_(0)
             self.lookahead.current_strategy_data[d] = self.lookahead.average_strategies_data[d].clone()
             self.lookahead.regrets_data[d] = self.lookahead.average_strategies_data[d].clone().fill_(self.lookahead.regret_epsilon)
             self.lookahead.current_regrets_data[d] = self.lookahead.average_strategies_data[d].clone().fill_(0)
-            self.lookahead.empty_action_mask[d] = self.lookahead.average_strategies_data[d].clone().fill_(1)
+            self.lookahead.empty_action_mask[d] = self._constant_data(self.lookahead.average_strategies_data[d], 1, 1)
             self.lookahead.positive_regrets_data[d] = self.lookahead.regrets_data[d].clone()
 
             # data structures [1 x parent_action x grandparent_id x batch x players x range]
-            self.lookahead.regrets_sum[d] = arguments.Tensor(1, self.lookahead.bets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], constants.players_count, game_settings.card_count).fill_(0)
+            self.lookahead.regrets_sum[d] = arguments.Tensor(1, self.lookahead.bets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], batch_size, constants.players_count, game_settings.card_count).fill_(0)
+            # data structures [1 x parent_action x grandparent_id x batch x range]
+            self.lookahead.positive_regrets_sum[d] = arguments.Tensor(1, self.lookahead.bets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], batch_size, game_settings.card_count).fill_(0)
 
             # data structures for the layers except the last one
             if d < self.lookahead.depth - 1:
-                self.lookahead.inner_nodes[d] = arguments.Tensor(self.lookahead.bets_count[d-1], self.lookahead.nonallinbets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], constants.players_count, game_settings.card_count).fill_(0)
-                self.lookahead.inner_nodes_p1[d] = arguments.Tensor(self.lookahead.bets_count[d-1], self.lookahead.nonallinbets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], 1, game_settings.card_count).fill_(0)
+                self.lookahead.inner_nodes[d] = arguments.Tensor(self.lookahead.bets_count[d-1], self.lookahead.nonallinbets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], batch_size, constants.players_count, game_settings.card_count).fill_(0)
+                self.lookahead.inner_nodes_p1[d] = arguments.Tensor(self.lookahead.bets_count[d-1], self.lookahead.nonallinbets_count[d-2], self.lookahead.nonterminal_nonallin_nodes_count[d-2], batch_size, 1, game_settings.card_count).fill_(0)
 
                 self.lookahead.swap_data[d] = self.lookahead.inner_nodes[d].transpose(1, 2).clone()
 
-    def set_datastructures_from_tree_dfs(self, node, layer, action_id, parent_id, gp_id):
+        self.lookahead.compact_layout = arguments.lookahead_compact_layout
+        if self.lookahead.compact_layout:
+            self.share_scratch_buffers()
+
+        # the data accumulated over the iterations uses the precision of the accumulators
+        for data in [self.lookahead.regrets_data, self.lookahead.average_strategies_data, self.lookahead.average_cfvs_data]:
+            for d in data:
+                if data[d] is not None:
+                    data[d] = precision_policy.accumulator(data[d])
+
+    def _constant_data(self, data, value, dims):
+        ''' Allocates a tensor for data which is the same for the last dimensions
+        of another tensor (e.g. the pot size is the same for both players and all hands).
+
+        Params:
+            data: a tensor with the full shape
+            value: the initial value
+            dims: the number of last dimensions over which the data is the same
+        Return a tensor with the shape of `data`, or in the compact layout (see
+        @{arguments.lookahead_compact_layout}) with the last `dims` dimensions of size 1,
+        which broadcasts to that shape'''
+        shape = list(data.size())
+        if arguments.lookahead_compact_layout:
+            shape[-dims:] = [1] * dims
+        return arguments.Tensor(*shape).fill_(value)
+
+    def share_scratch_buffers(self):
+        ''' Replaces the per-depth tensors of each scratch family by views of a
+        single buffer, sized for the largest depth.
+
+        Re-solving only uses a scratch tensor within the step of one depth, so the
+        depths can share it.
+        '''
+        for name in scratch_families:
+            data = getattr(self.lookahead, name)
+            sizes = [data[d].numel() for d in data if data[d] is not None]
+            buffer = arguments.Tensor(max(sizes)).fill_(0)
+            for d in data:
+                if data[d] is not None:
+                    data[d] = buffer[: data[d].numel()].view(data[d].shape)
+
+    def set_datastructures_from_tree_dfs(self, node, layer, action_id, parent_id, gp_id, batch_id=0):
         ''' Traverses the tree to fill in lookahead data structures that summarize data
         contained in the tree.
 
@@ -199,10 +275,11 @@ class LookaheadBuilder:
             action_id: the index of the action that led to this node
             parent_id: the index of the current node's parent
             gp_id: the index of the current node's grandparent
+            batch_id [opt]: the index of the tree in the lookahead batch (default 0)
         '''
         # fill the potsize
         assert(node.pot)
-        self.lookahead.pot_size[layer][action_id, parent_id, gp_id, :, :] = node.pot  
+        self.lookahead.pot_size[layer][action_id, parent_id, gp_id, batch_id, :, :] = node.pot  
         
         node.lookahead_coordinates = arguments.IntTensor([action_id, parent_id, gp_id])
 
@@ -231,11 +308,12 @@ class LookaheadBuilder:
                 node_with_empty_actions = (len(node.children) < self.lookahead.actions_count[layer])
                 
                 if node_with_empty_actions:
-                    # we need to mask nonexisting padded bets
-                    assert(layer > 0)
+                    # we need to mask nonexisting padded bets, also at the root when the roots of a batch
+                    # have different numbers of bets
 
-                    terminal_actions_count = self.lookahead.terminal_actions_count[layer]
-                    assert(terminal_actions_count == 2)
+                    # fold and check/call always keep their indexes, even at the root where the check is not terminal
+                    terminal_actions_count = 2
+                    assert(self.lookahead.terminal_actions_count[layer] == 2 or layer == 0)
                     
                     existing_bets_count = len(node.children) - terminal_actions_count        
                     
@@ -246,25 +324,25 @@ class LookaheadBuilder:
                     for child_id in range(terminal_actions_count):
                         child_node = node.children[child_id]
                         # go deeper
-                        self.set_datastructures_from_tree_dfs(child_node, layer+1, child_id, next_parent_id, next_gp_id)
+                        self.set_datastructures_from_tree_dfs(child_node, layer+1, child_id, next_parent_id, next_gp_id, batch_id)
 
                     # we need to make sure that even though there are fewer actions, the last action/allin is has the same last index as if we had full number of actions
                     # we manually set the action_id as the last action (allin)        
                     for b in range(existing_bets_count):
-                        self.set_datastructures_from_tree_dfs(node.children[len(node.children)-b-1], layer+1, self.lookahead.actions_count[layer]-b-1, next_parent_id, next_gp_id)
+                        self.set_datastructures_from_tree_dfs(node.children[len(node.children)-b-1], layer+1, self.lookahead.actions_count[layer]-b-1, next_parent_id, next_gp_id, batch_id)
                     
                     # mask out empty actions
                     if existing_bets_count == 0: 
-                        self.lookahead.empty_action_mask[layer+1][terminal_actions_count:, next_parent_id, next_gp_id, :] = 0
+                        self.lookahead.empty_action_mask[layer+1][terminal_actions_count:, next_parent_id, next_gp_id, batch_id, :] = 0
                     else:
-                        self.lookahead.empty_action_mask[layer+1][terminal_actions_count:-existing_bets_count, next_parent_id, next_gp_id, :] = 0
+                        self.lookahead.empty_action_mask[layer+1][terminal_actions_count:-existing_bets_count, next_parent_id, next_gp_id, batch_id, :] = 0
                 
                 else:
                     # node has full action count, easy to handle
                     for child_id in range(len(node.children)):
                         child_node = node.children[child_id]
                         # go deeper
-                        self.set_datastructures_from_tree_dfs(child_node, layer+1, child_id, next_parent_id, next_gp_id)
+                        self.set_datastructures_from_tree_dfs(child_node, layer+1, child_id, next_parent_id, next_gp_id, batch_id)
 
 
     def build_from_tree(self, tree):
@@ -272,8 +350,30 @@ class LookaheadBuilder:
 
         Params:
             tree: the public tree used to construct the lookahead'''
+        self.build_from_trees([tree])
+
+    def build_from_trees(self, trees):
+        ''' Builds the lookahead's internal data structures for a batch of public
+        trees which are re-solved together.
+
+        All trees must share the street, board, acting player and whether the root
+        bets are matched. Their bet structures (e.g. because of different pot sizes)
+        may differ: every layer is sized for the largest node of any tree and the
+        missing actions are masked for each batch element.
+
+        Params:
+            trees: a list of public trees used to construct the lookahead'''
+        tree = trees[0]
+        for other_tree in trees:
+            assert(other_tree.street == tree.street)
+            assert(other_tree.current_player == tree.current_player)
+            assert(torch.equal(other_tree.board, tree.board))
+            assert((other_tree.bets[0] == other_tree.bets[1]) == (tree.bets[0] == tree.bets[1]))
+
         self.lookahead.tree = tree
-        self.lookahead.depth = tree.depth   
+        self.lookahead.trees = trees
+        self.lookahead.batch_size = len(trees)
+        self.lookahead.depth = max([other_tree.depth for other_tree in trees])
             
         # per layer information about tree actions
         # per layer actions are the max number of actions for any of the nodes on the layer
@@ -282,14 +382,15 @@ class LookaheadBuilder:
         self.lookahead.terminal_actions_count = {}
         self.lookahead.actions_count = {}
 
-        self._compute_tree_structures([tree], 0)
+        self._compute_tree_structures(trees, 0)
 
         # construct the initial data structures using the bet counts
         self.construct_data_structures()
 
-        # traverse the tree and fill the datastructures (pot sizes, non-existin actions, ...)
-        # node, layer, action, parent_action, gp_id
-        self.set_datastructures_from_tree_dfs(tree, 0, 0, 0, 0)
+        # traverse the trees and fill the datastructures (pot sizes, non-existin actions, ...)
+        # node, layer, action, parent_action, gp_id, batch_id
+        for batch_id in range(len(trees)):
+            self.set_datastructures_from_tree_dfs(trees[batch_id], 0, 0, 0, 0, batch_id)
         
         # set additional info  
         assert(self.lookahead.terminal_actions_count[0] == 1 or self.lookahead.terminal_actions_count[0] == 2)
@@ -297,7 +398,9 @@ class LookaheadBuilder:
         self.lookahead.first_call_terminal = self.lookahead.tree.children[1].terminal
         self.lookahead.first_call_transition = self.lookahead.tree.children[1].current_player == constants.players.chance
         self.lookahead.first_call_check = (not self.lookahead.first_call_terminal) and (not self.lookahead.first_call_transition)
-        
+        for other_tree in trees:
+            assert(other_tree.children[1].terminal == self.lookahead.first_call_terminal)
+            assert((other_tree.children[1].current_player == constants.players.chance) == self.lookahead.first_call_transition)
 
         # we mask out fold as a possible action when check is for free, due to 
         # 1) fewer actions means faster convergence
@@ -0,0 +1,189 @@
+''' Compiled kernels for the CFR iterations of a @{lookahead|Lookahead}.
+
+The shapes of the lookahead tensors are fixed once the lookahead is built, so the
+per-depth loops of an iteration can run as a TorchScript function (or through
+`torch.compile` when available) instead of the Python interpreter. The kernels
+run exactly the same tensor operations in the same order as the eager
+@{lookahead._compute_iteration}, so with TorchScript the results match it bit for
+bit. The terminal equities are left to the @{terminal_equity|TerminalEquity} of
+the lookahead, which may evaluate them without its matrices. Compiled kernels are
+cached by the shape of the lookahead.
+
+The kernel is selected with @{arguments.lookahead_kernel}.
+
+The count lists taken by the kernels are shifted by 2, so that index `d+2`
+holds the count of depth `d` (the lookahead also uses depths -1 and -2).
+'''
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Settings.game_settings import game_settings
+from Source.Lookahead.cfr_update_rules import cfr_update_rules
+from typing import List
+import torch
+
+def compute_strategies_and_ranges(regrets: List[torch.Tensor], positive_regrets: List[torch.Tensor], positive_regrets_sum: List[torch.Tensor],
+                                  current_strategy: List[torch.Tensor], empty_action_mask: List[torch.Tensor], ranges: List[torch.Tensor],
+                                  inner_nodes: List[torch.Tensor], acting_player: List[int], terminal_actions_count: List[int],
+                                  bets_count: List[int], nonallinbets_count: List[int], depth: int, batch_size: int,
+                                  players_count: int, card_count: int, regret_epsilon: float, max_number: float):
+    ''' Runs @{lookahead._compute_current_strategies} and @{lookahead._compute_ranges}.'''
+    # regret matching
+    for d in range(1, depth):
+        positive_regrets[d].copy_(regrets[d])
+        positive_regrets[d].clamp_(regret_epsilon, max_number)
+        positive_regrets[d].mul_(empty_action_mask[d])
+
+        torch.sum(positive_regrets[d], dim=[0], keepdim=True, out=positive_regrets_sum[d])
+        torch.div(positive_regrets[d], positive_regrets_sum[d].expand_as(positive_regrets[d]), out=current_strategy[d])
+
+    # reach probabilities
+    for d in range(depth-1):
+        current_level_ranges = ranges[d]
+        next_level_ranges = ranges[d+1]
+
+        prev_layer_terminal_actions_count = terminal_actions_count[d+1]
+        prev_layer_bets_count = bets_count[d+1]
+        gp_layer_nonallin_bets_count = nonallinbets_count[d]
+
+        inner_nodes_ranges = current_level_ranges[prev_layer_terminal_actions_count :, : gp_layer_nonallin_bets_count].transpose(1,2)
+        inner_nodes[d].view(inner_nodes_ranges.shape).copy_(inner_nodes_ranges)
+
+        super_view = inner_nodes[d].view(1, prev_layer_bets_count, -1, batch_size, players_count, card_count)
+        next_level_ranges.copy_(super_view.expand_as(next_level_ranges))
+
+        next_level_ranges[:, :, :, :, acting_player[d], :].mul_(current_strategy[d+1])
+
+def compute_values_and_regrets(cfvs: List[torch.Tensor], pot_size: List[torch.Tensor], placeholder: List[torch.Tensor],
+                               regrets_sum: List[torch.Tensor], swap: List[torch.Tensor], current_strategy: List[torch.Tensor],
+                               empty_action_mask: List[torch.Tensor], current_regrets: List[torch.Tensor], inner_nodes_p1: List[torch.Tensor],
+                               regrets: List[torch.Tensor], acting_player: List[int], terminal_actions_count: List[int],
+                               bets_count: List[int], nonallinbets_count: List[int], depth: int, batch_size: int,
+                               card_count: int, max_number: float, discount: bool, positive_discount: float,
+                               negative_discount: float, clamp: bool):
+    ''' Runs @{lookahead._compute_terminal_equities_pot_size}, @{lookahead._compute_cfvs}
+    and @{lookahead._compute_regrets}.'''
+    # pot sizes
+    for d in range(1, depth):
+        cfvs[d].mul_(pot_size[d])
+
+    # counterfactual values
+    for d in range(depth-1, 0, -1):
+        gp_layer_terminal_actions_count = terminal_actions_count[d]
+        ggp_layer_nonallin_bets_count = nonallinbets_count[d-1]
+
+        cfvs[d][:, :, :, :, 0, :].mul_(empty_action_mask[d])
+        cfvs[d][:, :, :, :, 1, :].mul_(empty_action_mask[d])
+
+        placeholder[d].copy_(cfvs[d])
+        placeholder[d][:, :, :, :, acting_player[d], :].mul_(current_strategy[d])
+
+        torch.sum(placeholder[d], dim=[0], keepdim=True, out=regrets_sum[d])
+
+        swap[d-1].copy_(regrets_sum[d].view(swap[d-1].shape))
+        cfvs[d-1][gp_layer_terminal_actions_count :, : ggp_layer_nonallin_bets_count].copy_(swap[d-1].transpose(1,2))
+
+    # regrets
+    for d in range(depth-1, 0, -1):
+        gp_layer_terminal_actions_count = terminal_actions_count[d]
+        gp_layer_bets_count = bets_count[d]
+        ggp_layer_nonallin_bets_count = nonallinbets_count[d-1]
+
+        current_regrets[d].copy_(cfvs[d][:, :, :, :, acting_player[d], :])
+
+        parent_inner_nodes = inner_nodes_p1[d-1]
+        parent_inner_nodes_cfvs = cfvs[d-1][gp_layer_terminal_actions_count :, : ggp_layer_nonallin_bets_count, :, :, acting_player[d], :].transpose(1,2)
+        parent_inner_nodes.view(parent_inner_nodes_cfvs.shape).copy_(parent_inner_nodes_cfvs)
+        parent_inner_nodes = parent_inner_nodes.view(1, gp_layer_bets_count, -1, batch_size, card_count)
+
+        current_regrets[d].sub_(parent_inner_nodes.expand_as(current_regrets[d]))
+
+        if discount:
+            if positive_discount == negative_discount:
+                regrets[d].mul_(positive_discount)
+            else:
+                regrets[d].mul_(regrets[d].gt(0).type_as(regrets[d]).mul_(positive_discount - negative_discount).add_(negative_discount))
+        regrets[d].add_(current_regrets[d])
+
+        if clamp:
+            regrets[d].clamp_(0, max_number)
+
+# compiled kernels, keyed by the compilation mode. The shapes of a lookahead are arguments of the kernels, so
+# one compilation serves every lookahead (torch.compile keeps its own bounded cache of specializations)
+compiled_kernels = {}
+
+def _compile(function):
+    ''' Compiles a kernel function with the mode set by @{arguments.lookahead_kernel}.
+
+    Params:
+        function: the kernel function
+    Return the compiled function'''
+    if arguments.lookahead_kernel == 'compile' and hasattr(torch, 'compile'):
+        return torch.compile(function, dynamic=False)
+    return torch.jit.script(function)
+
+class LookaheadKernel:
+    def __init__(self, lookahead):
+        ''' Binds the compiled kernels to the tensors of a built lookahead.
+
+        Params:
+            lookahead: the @{lookahead|Lookahead} whose iterations are run'''
+        super().__init__()
+        self.lookahead = lookahead
+        depth = lookahead.depth
+
+        mode = arguments.lookahead_kernel
+        if mode not in compiled_kernels:
+            compiled_kernels[mode] = (_compile(compute_strategies_and_ranges), _compile(compute_values_and_regrets))
+        self.strategies_and_ranges, self.values_and_regrets = compiled_kernels[mode]
+
+        # the counts of the depths -2 to depth-1
+        self.acting_player = [int(lookahead.acting_player[d]) for d in range(depth+1)]
+        self.terminal_actions_count = [lookahead.terminal_actions_count[d] for d in range(-2, depth)]
+        self.bets_count = [lookahead.bets_count[d] for d in range(-2, depth)]
+        self.nonallinbets_count = [lookahead.nonallinbets_count[d] for d in range(-2, depth)]
+
+        # the kernels take lists, so the missing tensors of the first depths are replaced by empty ones
+        empty = arguments.Tensor()
+        def as_list(data):
+            return [data[d] if d in data and data[d] is not None else empty for d in range(depth)]
+        self.regrets = as_list(lookahead.regrets_data)
+        self.positive_regrets = as_list(lookahead.positive_regrets_data)
+        self.positive_regrets_sum = as_list(lookahead.positive_regrets_sum)
+        self.current_strategy = as_list(lookahead.current_strategy_data)
+        self.empty_action_mask = as_list(lookahead.empty_action_mask)
+        self.ranges = as_list(lookahead.ranges_data)
+        self.inner_nodes = as_list(lookahead.inner_nodes)
+        self.cfvs = as_list(lookahead.cfvs_data)
+        self.pot_size = as_list(lookahead.pot_size)
+        self.placeholder = as_list(lookahead.placeholder_data)
+        self.regrets_sum = as_list(lookahead.regrets_sum)
+        self.swap = as_list(lookahead.swap_data)
+        self.current_regrets = as_list(lookahead.current_regrets_data)
+        self.inner_nodes_p1 = as_list(lookahead.inner_nodes_p1)
+
+    def compute_strategies_and_ranges(self):
+        ''' Computes the current strategies and the reach probabilities of the lookahead.'''
+        lookahead = self.lookahead
+        self.strategies_and_ranges(self.regrets, self.positive_regrets, self.positive_regrets_sum, self.current_strategy,
+                                   self.empty_action_mask, self.ranges, self.inner_nodes, self.acting_player,
+                                   self.terminal_actions_count, self.bets_count, self.nonallinbets_count, lookahead.depth,
+                                   lookahead.batch_size, constants.players_count, game_settings.card_count,
+                                   lookahead.regret_epsilon, float(constants.max_number))
+
+    def compute_values_and_regrets(self, _iter):
+        ''' Computes the counterfactual values of the lookahead and updates its regrets.
+
+        The terminal equities and the neural net values of the depth-limited states
+        must already be computed.
+
+        Params:
+            iter: the current iteration number of re-solving
+        '''
+        lookahead = self.lookahead
+        discounts = cfr_update_rules.regret_discounts(_iter)
+        positive_discount, negative_discount = discounts if discounts != None else (1.0, 1.0)
+        self.values_and_regrets(self.cfvs, self.pot_size, self.placeholder, self.regrets_sum, self.swap,
+                                self.current_strategy, self.empty_action_mask, self.current_regrets, self.inner_nodes_p1,
+                                self.regrets, self.acting_player, self.terminal_actions_count, self.bets_count,
+                                self.nonallinbets_count, lookahead.depth, lookahead.batch_size, game_settings.card_count, float(constants.max_number), discounts != None,
+                                float(positive_discount), float(negative_discount), cfr_update_rules.clamps_regrets())
@@ -0,0 +1,79 @@
+''' Collects timings and counters of the phases of a lookahead re-solve.
+
+Re-solves are profiled with probability @{arguments.lookahead_profile_rate}, the
+profile is then available as the `profile` field of the re-solve results.
+'''
+from Source.Settings.arguments import arguments
+import torch
+import time
+
+# the per-depth tensors of a lookahead whose sizes are recorded
+tensor_families = ['ranges_data', 'pot_size', 'cfvs_data', 'average_cfvs_data', 'placeholder_data', 'average_strategies_data',
+                   'current_strategy_data', 'regrets_data', 'current_regrets_data', 'positive_regrets_data', 'empty_action_mask',
+                   'regrets_sum', 'positive_regrets_sum', 'inner_nodes', 'inner_nodes_p1', 'swap_data']
+
+class LookaheadProfile:
+    def __init__(self, lookahead):
+        ''' Constructor
+
+        Params:
+            lookahead: the @{lookahead|Lookahead} which is profiled'''
+        super().__init__()
+        # the accumulated seconds and the number of calls of each phase
+        self.times = {}
+        self.calls = {}
+        self.total_time = 0
+        self.iterations = 0
+        # the sizes of the lookahead tensors, per depth and tensor name
+        self.tensor_sizes = {}
+        for name in tensor_families:
+            data = getattr(lookahead, name)
+            for d in data:
+                if data[d] is not None:
+                    self.tensor_sizes.setdefault(d, {})[name] = list(data[d].size())
+        # the bytes used by each depth of each tensor family
+        self.memory = lookahead.get_memory_footprint()
+        # with the GPU, the timings are only meaningful if the device is synchronized
+        self.synchronize = arguments.gpu and torch.cuda.is_available()
+
+    def run(self, phase, function, *args):
+        ''' Calls a phase of re-solving and adds its duration to the phase.
+
+        Params:
+            phase: the name of the phase
+            function: the function which runs the phase
+            args: the arguments of the function
+        '''
+        if self.synchronize:
+            torch.cuda.synchronize()
+        start = time.time()
+        function(*args)
+        if self.synchronize:
+            torch.cuda.synchronize()
+        self.times[phase] = self.times.get(phase, 0) + time.time() - start
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def report(self):
+        ''' Gives a human readable summary of the profile.
+
+        Return a string with one line per phase'''
+        lines = [f'{self.iterations} iterations in {self.total_time:.3f}s']
+        for phase in sorted(self.times, key=self.times.get, reverse=True):
+            share = self.times[phase] / self.total_time if self.total_time > 0 else 0
+            lines.append(f'{phase}: {self.times[phase]:.3f}s ({share:.1%}) in {self.calls[phase]} calls')
+        lines.append(memory_report(self.memory))
+        return '\n'.join(lines)
+
+def memory_report(footprint):
+    ''' Gives a human readable summary of the memory used by a lookahead.
+
+    Params:
+        footprint: the bytes of each tensor family and depth, as given by
+            @{lookahead.get_memory_footprint}
+    Return a string with one line per tensor family, largest first'''
+    totals = {name: sum(footprint[name].values()) for name in footprint}
+    lines = [f'memory: {sum(totals.values()) / 1024:.1f} KiB']
+    for name in sorted(totals, key=totals.get, reverse=True):
+        depths = ', '.join(f'{d}: {footprint[name][d] / 1024:.1f}' for d in footprint[name])
+        lines.append(f'{name}: {totals[name] / 1024:.1f} KiB ({depths})')
+    return '\n'.join(lines)
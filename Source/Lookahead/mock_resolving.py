@@ -7,6 +7,7 @@ Used for debugging.
 from Source.Settings.arguments import arguments
 from Source.Settings.constants import constants
 from Source.Settings.game_settings import game_settings
+from Source.Game.card_tools import card_tools
 
 class MockResolving:
     def resolve_first_node(self, node, player_range, opponent_range):
@@ -62,6 +63,15 @@ class MockResolving:
         '''
         return arguments.Tensor(game_settings.card_count).fill_(1)
 
+    def get_chance_action_cfvs(self, player_action):
+        ''' Returns an arbitrary tensor.
+
+        Params:
+            player_action [opt]: not used
+        Return a BxK tensor of 1s, where B is the number of boards
+        '''
+        return arguments.Tensor(card_tools.get_boards_count(), game_settings.card_count).fill_(1)
+
     def get_action_strategy(self, action):
         ''' Returns an arbitrary vector.
 
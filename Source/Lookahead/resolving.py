@@ -3,27 +3,89 @@ Internally uses @{cfrd_gadget|CFRDGadget} TODO SOLVER
 '''
 from Source.Settings.arguments import arguments
 from Source.Settings.constants import constants
+from Source.Settings.game_settings import game_settings
 from Source.Tree.tree_builder import *
 from Source.Lookahead.lookahead import Lookahead
+import torch
+import copy
+import threading
+
+# built lookaheads which are not re-solved yet, keyed by the public state of their root and the settings they were built with
+lookahead_templates = {}
+# guards the templates, since lookaheads may be created by several threads (see @{continual_resolving})
+lookahead_templates_lock = threading.Lock()
+
+def _template_settings():
+    ''' Gives the settings which a built lookahead depends on, besides the public
+    state of its root.
+
+    The update rule and the iteration counts are only read while re-solving, so
+    they do not matter for a template.
+
+    Return a tuple of the settings'''
+    return (tuple(arguments.bet_sizing), arguments.stack, arguments.ante, game_settings.suit_count, game_settings.rank_count,
+            game_settings.board_card_count, arguments.Tensor().type(), arguments.precision, arguments.lookahead_compact_layout,
+            arguments.lookahead_average_all_depths, arguments.terminal_equity_cache, arguments.terminal_equity_sort_min_cards)
 
 class Resolving:
     def __init__(self):
         super().__init__()
         self.tree_builder = PokerTreeBuilder()
+        # the nodes from a child of the root of the lookahead to the re-solved node (see @{get_descendant})
+        self.lookahead_path = []
+        # if set, the state of re-solving is saved to this file during and after re-solving (see @{save_checkpoint})
+        self.checkpoint_file = None
+        # if set, re-solving stops as soon as this `threading.Event` is set
+        self.cancel_event = None
 
     def _create_lookahead_tree(self, node):
         ''' Builds a depth-limited public tree rooted at a given game node.
 
         Params:
             node: the root of the tree
+        Return the root of the built tree
         '''
         build_tree_params = TreeParams()
         build_tree_params.root_node = node
         build_tree_params.limit_to_street = True
 
         self.lookahead_tree = self.tree_builder.build_tree(build_tree_params)
+        return self.lookahead_tree
+
+    def _create_lookahead(self, node):
+        ''' Builds the depth-limited public tree and the lookahead rooted at a given game node.
+
+        Lookaheads only depend on the public state of their root and a few settings
+        (such as the bet sizing and the precision), so a built one is kept as a
+        template in `lookahead_templates` and later re-solves at the same state with
+        the same settings get a fresh @{lookahead.clone} of it instead of rebuilding.
+
+        Params:
+            node: the root of the tree
+        '''
+        if arguments.lookahead_cache_size == 0:
+            self._create_lookahead_tree(node)
+            self.lookahead = Lookahead()
+            self.lookahead.build_lookahead(self.lookahead_tree)
+            return
+
+        key = (node.street, node.current_player, tuple(node.board.tolist()), tuple(node.bets.tolist()), _template_settings())
+        with lookahead_templates_lock:
+            template = lookahead_templates.get(key)
+        if template == None:
+            self._create_lookahead_tree(node)
+            template = Lookahead()
+            template.build_lookahead(self.lookahead_tree)
+            with lookahead_templates_lock:
+                # forget the oldest template when the cache is full
+                if len(lookahead_templates) >= arguments.lookahead_cache_size:
+                    del lookahead_templates[next(iter(lookahead_templates))]
+                lookahead_templates[key] = template
+
+        self.lookahead_tree = template.tree
+        self.lookahead = template.clone()
 
-    def resolve_first_node(self, node, player_range, opponent_range):
+    def resolve_first_node(self, node, player_range, opponent_range, time_budget=None):
         ''' Re-solves a depth-limited lookahead using input ranges.
         
         Uses the input range for the opponent instead of a gadget range, so only
@@ -33,33 +95,59 @@ class Resolving:
         Params:
             node: the public node at which to re-solve
             player_range: a range vector for the re-solving player
-            opponent_range: a range vector for the opponent'''
-        self._create_lookahead_tree(node)
+            opponent_range: a range vector for the opponent
+            time_budget [opt]: the number of seconds the lookahead may re-solve for'''
+        self._create_lookahead(node)
+        self.lookahead.checkpoint_file = self.checkpoint_file
+        self.lookahead.cancel_event = self.cancel_event
         
-        self.lookahead = Lookahead()
-        self.lookahead.build_lookahead(self.lookahead_tree)  
-        
-        self.lookahead.resolve_first_node(player_range, opponent_range)
+        self.lookahead.resolve_first_node(player_range, opponent_range, time_budget)
         
         self.resolve_results = self.lookahead.get_results()
         return self.resolve_results
 
-    def resolve(self, node, player_range, opponent_cfvs):
+    def resolve_first_node_batch(self, nodes, player_ranges, opponent_ranges):
+        ''' Re-solves a batch of depth-limited lookaheads together using input ranges.
+
+        All nodes must share the street, board and acting player, but may have
+        different pot sizes. The results are only meaningful at the root, so the
+        batch is intended for data generation via @{get_root_cfv_both_players}.
+
+        Params:
+            nodes: a list of B public nodes at which to re-solve
+            player_ranges: a BxK tensor of ranges for the re-solving player
+            opponent_ranges: a BxK tensor of ranges for the opponent'''
+        self.lookahead_trees = [self._create_lookahead_tree(node) for node in nodes]
+        self.lookahead_tree = self.lookahead_trees[0]
+
+        self.lookahead = Lookahead()
+        self.lookahead.build_lookahead(self.lookahead_trees)
+
+        self.lookahead.resolve_first_node(player_ranges, opponent_ranges)
+
+        self.resolve_results = self.lookahead.get_results()
+        return self.resolve_results
+
+    def resolve(self, node, player_range, opponent_cfvs, time_budget=None, warm_start=None):
         ''' Re-solves a depth-limited lookahead using an input range for the player and
         the @{cfrd_gadget|CFRDGadget} to generate ranges for the opponent.
 
         Params:
             node: the public node at which to re-solve
             player_range: a range vector for the re-solving player
-            opponent_cfvs: a vector of cfvs achieved by the opponent before re-solving'''
+            opponent_cfvs: a vector of cfvs achieved by the opponent before re-solving
+            time_budget [opt]: the number of seconds the lookahead may re-solve for
+            warm_start [opt]: a previous @{resolving|Resolving} whose lookahead contains
+                the node. Re-solving then starts from its regrets (see @{lookahead.warm_start})'''
         assert(card_tools.is_valid_range(player_range, node.board))
         
-        self._create_lookahead_tree(node)
+        self._create_lookahead(node)
+        self.lookahead.checkpoint_file = self.checkpoint_file
+        self.lookahead.cancel_event = self.cancel_event
+        if warm_start != None:
+            self.lookahead.warm_start(warm_start.lookahead)
         
-        self.lookahead = Lookahead()  
-        self.lookahead.build_lookahead(self.lookahead_tree)
-        
-        self.lookahead.resolve(player_range, opponent_cfvs)
+        self.lookahead.resolve(player_range, opponent_cfvs, time_budget)
         
         self.resolve_results = self.lookahead.get_results()
         return self.resolve_results
@@ -106,9 +194,11 @@ class Resolving:
         
         Usefull for data generation for neural net training
         
-        The node must first be re-solved with @{resolve_first_node}.
+        The node must first be re-solved with @{resolve_first_node} or
+        @{resolve_first_node_batch}.
         
-        Return a 2xK tensor of cfvs, where K is the range size'''
+        Return a 2xK tensor of cfvs, where K is the range size (a Bx2xK tensor
+        after @{resolve_first_node_batch})'''
         return self.resolve_results.root_cfvs_both_players
 
     def get_action_cfv(self, action):
@@ -137,7 +227,20 @@ class Resolving:
             board: a vector of board cards which were updated by the chance event
         Return a vector of cfvs'''
         action_id = self._action_to_action_id(action)
-        return self.lookahead.get_chance_action_cfv(action_id, board)
+        return self.lookahead.get_chance_action_cfv(action_id, board, self.lookahead_path)
+
+    def get_chance_action_cfvs(self, action):
+        ''' Gives the average counterfactual values that the opponent received
+        during re-solving after a chance event, on every possible board.
+
+        The node must first be re-solved with @{resolve} or @{resolve_first_node}.
+
+        Params:
+            action: the action taken by the re-solve player at the node being re-solved
+        Return a BxK tensor of cfvs, where B is the number of boards ordered by
+        @{card_tools.get_board_index}'''
+        action_id = self._action_to_action_id(action)
+        return self.lookahead.get_chance_action_cfvs(action_id, self.lookahead_path)
 
     def get_action_strategy(self, action):
         ''' Gives the probability that the re-solved strategy takes a given action.
@@ -149,4 +252,90 @@ class Resolving:
         Return a vector giving the probability of taking the action with each 
         private hand'''
         action_id = self._action_to_action_id(action)
-        return self.resolve_results.strategy[action_id]
\ No newline at end of file
+        return self.resolve_results.strategy[action_id]
+
+    def get_descendant(self, node):
+        ''' Gives the re-solved strategy at a later decision of the same street,
+        read from the averages of all depths of the lookahead (see
+        @{arguments.lookahead_average_all_depths}) instead of re-solving.
+
+        The node must first be re-solved with @{resolve} or @{resolve_first_node}.
+
+        Params:
+            node: the game node of the decision
+        Return a @{resolving|Resolving} at the decision which shares the lookahead
+        of this one, or `None` if the lookahead does not contain the decision. Its
+        results have an extra field `reach` (see @{lookahead.get_descendant_results})'''
+        if node.street != self.lookahead_tree.street:
+            return None
+        path = self.lookahead.find_descendant_path(node, self.lookahead_path)
+        if path == None:
+            return None
+
+        out = copy.copy(self)
+        out.lookahead_path = path
+        out.lookahead_tree = path[-1]
+        out.resolve_results = self.lookahead.get_descendant_results(path)
+        return out
+
+    def save_checkpoint(self, path):
+        ''' Saves the state of re-solving to a file, from which @{resume_checkpoint}
+        continues (see @{lookahead.get_checkpoint}).
+
+        The node must first be re-solved with @{resolve} or @{resolve_first_node}.
+
+        Params:
+            path: the file name'''
+        self.lookahead.save_checkpoint(path)
+
+    def resume(self, iterations=None, time_budget=None):
+        ''' Continues re-solving the node with more iterations.
+
+        The node must first be re-solved with @{resolve} or @{resolve_first_node}.
+
+        Params:
+            iterations [opt]: the number of iterations to run on top of those already
+                run. By default, the iterations of an interrupted re-solve are finished
+            time_budget [opt]: the number of seconds the lookahead may re-solve for
+        Return the new results of re-solving'''
+        self.lookahead.resume(iterations, time_budget)
+        self.resolve_results = self.lookahead.get_results()
+        return self.resolve_results
+
+    def resume_checkpoint(self, path, iterations=None, time_budget=None):
+        ''' Continues re-solving from the state saved to a file, e.g. by a re-solve
+        which was interrupted (see @{checkpoint_file}) or to extend a finished one.
+
+        Params:
+            path: the file name
+            iterations [opt]: the number of iterations to run on top of those of the
+                saved re-solve. By default, the iterations of an interrupted re-solve are finished
+            time_budget [opt]: the number of seconds the lookahead may re-solve for
+        Return the results of re-solving'''
+        checkpoint = torch.load(path)
+        node = TreeNode()
+        node.street = checkpoint['node']['street']
+        node.board = checkpoint['node']['board']
+        node.current_player = checkpoint['node']['current_player']
+        node.bets = checkpoint['node']['bets']
+
+        self._create_lookahead(node)
+        self.lookahead.checkpoint_file = self.checkpoint_file
+        self.lookahead.cancel_event = self.cancel_event
+        self.lookahead.load_checkpoint(checkpoint)
+        return self.resume(iterations, time_budget)
+
+    def get_reply_probabilities(self, action):
+        ''' Gives the probability of each reply of the opponent to an action of the
+        re-solve player, under the opponent's average strategy.
+
+        The node must first be re-solved with @{resolve} or @{resolve_first_node}.
+
+        Params:
+            action: the action taken by the re-solve player at the node being re-solved
+        Return a vector with the probability of each child of the opponent's node, or
+        `None` if only the root strategy is averaged (see @{arguments.lookahead_average_all_depths})'''
+        if not arguments.lookahead_average_all_depths:
+            return None
+        action_id = self._action_to_action_id(action)
+        return self.lookahead.get_action_probabilities(self.lookahead_path + [self.lookahead_tree.children[action_id]])
@@ -6,7 +6,7 @@ Can be used to replace the neural net during debugging.
 
 from Source.Settings.arguments import arguments
 from Source.Settings.game_settings import game_settings
-from Source.TerminalEquity.terminal_equity import TerminalEquity
+from Source.TerminalEquity.batched_terminal_equity import BatchedTerminalEquity
 from Source.Game.card_tools import card_tools
 from Source.Nn.bucketer import Bucketer
 import torch
@@ -21,11 +21,12 @@ class MockNnTerminal:
         # filling equity matrix
         boards = card_tools.get_second_round_boards()
         self.board_count = boards.size(0)
-        self.terminal_equity = TerminalEquity()
+        self.terminal_equity = BatchedTerminalEquity()
+        self.terminal_equity.set_boards(boards)
+        call_matrices = self.terminal_equity.get_call_matrices()
         for i in range(self.board_count): 
             board = boards[i]
-            self.terminal_equity.set_board(board)
-            call_matrix = self.terminal_equity.get_call_matrix()
+            call_matrix = call_matrices[i]
             buckets = self.bucketer.compute_buckets(board)
             for c1 in range(game_settings.card_count): 
                 for c2 in range(game_settings.card_count): 
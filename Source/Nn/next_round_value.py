@@ -4,9 +4,12 @@
 from Source.Settings.arguments import arguments
 from Source.Settings.constants import constants
 from Source.Settings.game_settings import game_settings
+from Source.Settings.precision_policy import precision_policy
 from Source.Game.card_tools import card_tools
 from Source.Nn.bucketer import Bucketer
+from Source.Lookahead.cfr_update_rules import cfr_update_rules
 import torch
+import copy
 
 class NextRoundValue:
     def __init__(self, nn):
@@ -51,6 +54,9 @@ class NextRoundValue:
             # matrix for transformation from card ranges to strength class ranges 
             self._range_matrix_board_view[:, idx, :][torch.eq(class_ids, card_buckets)] = 1
 
+        # matrices for transformation from class values to card values on each board [boards x buckets x K]
+        self._board_value_matrices = self._range_matrix_board_view.permute(1, 2, 0).contiguous()
+
         # matrix for transformation from class values to card values
         self._reverse_value_matrix = self._range_matrix.T.clone()
         # we need to div the matrix by the sum of possible boards (from point of view of each hand)
@@ -85,11 +91,25 @@ class NextRoundValue:
             card_value: a vector in which to store the output values over private hands
         '''
         board_idx = card_tools.get_board_index(board)
-        board_matrix = self._range_matrix_board_view[:, board_idx, :].T.clone()
+        board_matrix = self._board_value_matrices[board_idx]
         serialized_card_value = card_value.view(-1, game_settings.card_count)
-        serialized_bucket_value = bucket_value[:, :, board_idx, :].clone().view(-1, self.bucket_count)
+        serialized_bucket_value = bucket_value[:, :, board_idx, :].clone().type_as(board_matrix).view(-1, self.bucket_count)
         torch.mm(serialized_bucket_value, board_matrix, out=serialized_card_value)
 
+    def _bucket_value_to_card_value_on_all_boards(self, bucket_value, card_value):
+        ''' Converts value vectors over buckets to value vectors over private hands
+        on every possible board, with a single batched matrix multiplication.
+
+        Params:
+            bucket_value: a NxPxBxb tensor of values over the buckets of each board
+            card_value: a BxNxPxK tensor in which to store the output values over
+            private hands, where B is the number of boards
+        '''
+        serialized_card_value = card_value.view(self.board_count, -1, game_settings.card_count)
+        # [boards x (batch x players) x buckets]
+        serialized_bucket_value = bucket_value.permute(2, 0, 1, 3).reshape(self.board_count, -1, self.bucket_count).type_as(self._board_value_matrices)
+        torch.bmm(serialized_bucket_value, self._board_value_matrices, out=serialized_card_value)
+
     def start_computation(self, pot_sizes):
         ''' Initializes the value calculator with the pot size of each state that
         we are going to evaluate.
@@ -99,11 +119,64 @@ class NextRoundValue:
 
         Params:
             pot_sizes: a vector of pot sizes betting round ends'''
+        self._values_are_prepared = False
         self.iter = 0
+        self.skip_iters = arguments.cfr_skip_iters
         self.pot_sizes = pot_sizes.view(-1, 1).clone()
         self.batch_size = pot_sizes.size(0)
 
-    def get_value(self, ranges, values):
+    def clone(self):
+        ''' Gives a new value calculator which shares the bucketing matrices and
+        the neural net with this one.
+
+        @{start_computation} must have been called. The returned object is reset
+        to the state right after that call.
+
+        Return the new @{next_round_value|NextRoundValue}'''
+        out = copy.copy(self)
+        out.start_computation(self.pot_sizes)
+        return out
+
+    def set_skip_iters(self, skip_iters):
+        ''' Sets the number of preliminary iterations whose values are not remembered
+        for @{get_value_on_board} (default @{arguments.cfr_skip_iters}).
+
+        Can only be changed before any values have been remembered.
+
+        Params:
+            skip_iters: the number of preliminary iterations'''
+        assert(self.iter <= self.skip_iters and self.iter <= skip_iters)
+        self.skip_iters = skip_iters
+
+    def _init_iteration_buffers(self):
+        ''' Allocates the buffers used by every call to @{get_value}.
+        '''
+        # initializing data structures
+        self.next_round_inputs = arguments.Tensor(self.batch_size,  self.board_count, (self.bucket_count * constants.players_count + 1)).zero_()
+        self.next_round_values = arguments.Tensor(self.batch_size, self.board_count, constants.players_count,  self.bucket_count ).zero_()
+        # raw outputs of the last neural net evaluation, reused until the next one
+        self.next_round_nn_values = self.next_round_values.clone()
+        self.last_nn_iter = 0
+        self.transposed_next_round_values = arguments.Tensor(self.batch_size, constants.players_count, self.board_count, self.bucket_count)
+        self.next_round_extended_range = arguments.Tensor(self.batch_size, constants.players_count, self.board_count * self.bucket_count ).zero_()
+        self.next_round_serialized_range = self.next_round_extended_range.view(-1, self.bucket_count)
+        self.range_normalization = arguments.Tensor(self.batch_size * constants.players_count * self.board_count, 1)
+        # comparing with a tensor instead of a python number does not allocate
+        self.range_normalization_zero = torch.zeros(self.range_normalization.shape, dtype=torch.bool, device=self.range_normalization.device)
+        self.zero = arguments.Tensor(1).zero_()
+        self.value_normalization = arguments.Tensor(self.batch_size, constants.players_count, self.board_count)
+        # handling pot feature for the nn
+        nn_bet_input = self.pot_sizes.clone().mul(1/ arguments.stack)
+        nn_bet_input = nn_bet_input.view(-1, 1).expand(self.batch_size, self.board_count)
+        self.next_round_inputs[:, :, -1].copy_(nn_bet_input)
+        self.last_nn_inputs = self.next_round_inputs.clone()
+        # the rows of the live states (see @{get_value}) and the buffers into which they are gathered
+        self.live_states = None
+        self.live_rows = None
+        self.live_nn_inputs = self.next_round_inputs.view(self.batch_size * self.board_count, -1).clone()
+        self.live_nn_values = self.next_round_nn_values.view(self.batch_size * self.board_count, -1).clone()
+
+    def get_value(self, ranges, values, live_states=None):
         ''' Gives the predicted counterfactual values at each evaluated state, given
         input ranges.
 
@@ -116,41 +189,37 @@ class NextRoundValue:
             ranges: An Nx2xK tensor, where N is the number of states evaluated
                 (must match input to @{start_computation}), 2 is the number of players, and
                 K is the number of private hands. Contains N sets of 2 range vectors.
-            values: an Nx2xK tensor in which to store the N sets of 2 value vectors which are output'''
+            values: an Nx2xK tensor in which to store the N sets of 2 value vectors which are output
+            live_states [opt]: a vector of the indexes of the states which are evaluated
+                with the neural net. The other states get zero values. By default all
+                states are evaluated'''
         assert ranges != None and values != None
         assert(ranges.size(0) == self.batch_size)
         self.iter = self.iter + 1
         if self.iter == 1:
-            # initializing data structures
-            self.next_round_inputs = arguments.Tensor(self.batch_size,  self.board_count, (self.bucket_count * constants.players_count + 1)).zero_()
-            self.next_round_values = arguments.Tensor(self.batch_size, self.board_count, constants.players_count,  self.bucket_count ).zero_()
-            self.transposed_next_round_values = arguments.Tensor(self.batch_size, constants.players_count, self.board_count, self.bucket_count)
-            self.next_round_extended_range = arguments.Tensor(self.batch_size, constants.players_count, self.board_count * self.bucket_count ).zero_()
-            self.next_round_serialized_range = self.next_round_extended_range.view(-1, self.bucket_count)
-            self.range_normalization = arguments.Tensor()
-            self.value_normalization = arguments.Tensor(self.batch_size, constants.players_count, self.board_count)
-            # handling pot feature for the nn
-            nn_bet_input = self.pot_sizes.clone().mul(1/ arguments.stack)
-            nn_bet_input = nn_bet_input.view(-1, 1).expand(self.batch_size, self.board_count)
-            self.next_round_inputs[:, :, -1].copy_(nn_bet_input)
+            self._init_iteration_buffers()
         
         # we need to find if we need remember something in this iteration
-        use_memory = self.iter > arguments.cfr_skip_iters
-        if use_memory and self.iter == arguments.cfr_skip_iters + 1:
+        use_memory = self.iter > self.skip_iters
+        if use_memory and self.iter == self.skip_iters + 1:
             # first iter that we need to remember something - we need to init data structures
-            self.range_normalization_memory = arguments.Tensor(self.batch_size * self.board_count * constants.players_count, 1).zero_()
-            self.counterfactual_value_memory = arguments.Tensor(self.batch_size, constants.players_count, self.board_count, self.bucket_count).zero_()
+            self.range_normalization_memory = precision_policy.accumulator(arguments.Tensor(self.batch_size * self.board_count * constants.players_count, 1).zero_())
+            self.counterfactual_value_memory = precision_policy.accumulator(arguments.Tensor(self.batch_size, constants.players_count, self.board_count, self.bucket_count).zero_())
+        if use_memory:
+            # the averages change, so they are prepared again when needed
+            self._values_are_prepared = False
 
         # computing bucket range in next street for both players at once
         self._card_range_to_bucket_range(ranges.view(self.batch_size * constants.players_count, -1), self.next_round_extended_range.view(self.batch_size * constants.players_count, -1))
-        self.range_normalization = self.next_round_serialized_range.sum(dim=1, keepdim=True)
+        torch.sum(self.next_round_serialized_range, dim=1, keepdim=True, out=self.range_normalization)
         rn_view = self.range_normalization.view(self.batch_size, constants.players_count, self.board_count)
         for player in range(constants.players_count):
             self.value_normalization[:, player, :].copy_(rn_view[:, 1 - player, :])
         if use_memory:
-            self.range_normalization_memory.add_(self.value_normalization.view(self.range_normalization_memory.shape))
+            self.range_normalization_memory.add_(self.value_normalization.view(self.range_normalization_memory.shape), alpha=cfr_update_rules.average_weight(self.iter - 1))
         # eliminating division by zero
-        self.range_normalization[torch.eq(self.range_normalization, 0)] = 1
+        torch.eq(self.range_normalization, self.zero, out=self.range_normalization_zero)
+        self.range_normalization.masked_fill_(self.range_normalization_zero, 1)
         self.next_round_serialized_range.div_(self.range_normalization.expand_as(self.next_round_serialized_range))
         serialized_range_by_player = self.next_round_serialized_range.view(self.batch_size, constants.players_count, self.board_count, self.bucket_count)
         for player in range(constants.players_count):
@@ -158,10 +227,30 @@ class NextRoundValue:
 
         # usning nn to compute values 
         serialized_inputs_view= self.next_round_inputs.view(self.batch_size * self.board_count, -1)
-        serialized_values_view= self.next_round_values.view(self.batch_size * self.board_count, -1)
+        serialized_values_view= self.next_round_nn_values.view(self.batch_size * self.board_count, -1)
 
-        # computing value in the next round
-        self.nn.get_value(serialized_inputs_view, serialized_values_view)
+        # computing value in the next round, unless the last evaluation can be reused
+        if self._needs_nn_evaluation():
+            if live_states is None:
+                self.nn.get_value(serialized_inputs_view, serialized_values_view)
+            else:
+                # the live states only change when the lookahead re-checks them
+                if live_states is not self.live_states:
+                    # the rows of a state's boards are consecutive
+                    board_indexes = torch.arange(self.board_count, device=live_states.device).view(1, -1)
+                    self.live_rows = live_states.view(-1, 1).mul(self.board_count).add(board_indexes).view(-1)
+                    self.live_states = live_states
+                live_count = self.live_rows.size(0)
+                serialized_values_view.zero_()
+                if live_count > 0:
+                    live_inputs = self.live_nn_inputs[:live_count]
+                    live_values = self.live_nn_values[:live_count]
+                    torch.index_select(serialized_inputs_view, 0, self.live_rows, out=live_inputs)
+                    self.nn.get_value(live_inputs, live_values)
+                    serialized_values_view.index_copy_(0, self.live_rows, live_values)
+            self.last_nn_iter = self.iter
+            self.last_nn_inputs.copy_(self.next_round_inputs)
+        self.next_round_values.copy_(self.next_round_nn_values)
 
         # normalizing values back according to the orginal range sum
         normalization_view = self.value_normalization.view(self.batch_size, constants.players_count, self.board_count, 1).transpose(1,2)
@@ -170,10 +259,27 @@ class NextRoundValue:
         self.transposed_next_round_values.copy_(self.next_round_values.transpose(2,1))
         # remembering the values for the next round
         if use_memory:
-            self.counterfactual_value_memory.add_(self.transposed_next_round_values)
+            self.counterfactual_value_memory.add_(self.transposed_next_round_values, alpha=cfr_update_rules.average_weight(self.iter - 1))
         # translating bucket values back to the card values
         self._bucket_value_to_card_value(self.transposed_next_round_values.view(self.batch_size * constants.players_count, -1), values.view(self.batch_size * constants.players_count, -1)) 
 
+    def _needs_nn_evaluation(self):
+        ''' Decides whether the neural net has to be evaluated in the current iteration
+        of @{get_value}.
+
+        The net is evaluated every @{arguments.nn_eval_iters} iterations, and in
+        between as soon as any input has moved by more than
+        @{arguments.nn_eval_range_threshold} since the last evaluation. Otherwise the
+        outputs of the last evaluation are reused. They are values for normalized
+        ranges, so they are still weighted with the current range mass.
+
+        Return `True` if the neural net has to be evaluated'''
+        if self.iter == 1 or self.iter - self.last_nn_iter >= arguments.nn_eval_iters:
+            return True
+        if arguments.nn_eval_range_threshold != None:
+            return (self.next_round_inputs - self.last_nn_inputs).abs().max().item() > arguments.nn_eval_range_threshold
+        return False
+
     def get_value_on_board(self, board, values):
         ''' Gives the average counterfactual values on the given board across previous
         calls to @{get_value}.
@@ -184,31 +290,88 @@ class NextRoundValue:
         Params:
             board: a non-empty vector of board cards
             values: a tensor in which to store the values'''
-        # check if we have evaluated correct number of iterations
-        assert(self.iter == arguments.cfr_iters )
+        # check if we have remembered the values of some iterations
+        assert(self.iter > self.skip_iters)
         batch_size = values.size(0)
         assert(batch_size == self.batch_size)
 
         self._prepare_next_round_values()
 
-        self._bucket_value_to_card_value_on_board(board, self.counterfactual_value_memory, values)
+        self._bucket_value_to_card_value_on_board(board, self.average_value_memory, values)
+
+    def get_value_on_all_boards(self, values):
+        ''' Gives the average counterfactual values on every possible board across
+        previous calls to @{get_value}.
+
+        Equivalent to calling @{get_value_on_board} for each board, in one batched
+        matrix multiplication.
+
+        Params:
+            values: a BxNxPxK tensor in which to store the values, where B is the
+            number of boards, ordered by @{card_tools.get_board_index}'''
+        # check if we have remembered the values of some iterations
+        assert(self.iter > self.skip_iters)
+        assert(values.size(0) == self.board_count)
+        assert(values.size(1) == self.batch_size)
+
+        self._prepare_next_round_values()
+
+        self._bucket_value_to_card_value_on_all_boards(self.average_value_memory, values)
 
     def _prepare_next_round_values(self):
         ''' Normalizes the counterfactual values remembered between @{get_value} calls
         so that they are an average rather than a sum.
+
+        The average is stored in `average_value_memory`, the sums are kept so that
+        more iterations can be remembered afterwards.
         '''
-        assert(self.iter == arguments.cfr_iters )
+        assert(self.iter > self.skip_iters)
 
         # do nothing if already prepared
         if self._values_are_prepared:
             return
 
         # eliminating division by zero
-        self.range_normalization_memory[torch.eq(self.range_normalization_memory, 0)] = 1
+        range_normalization = self.range_normalization_memory.clone()
+        range_normalization[torch.eq(range_normalization, 0)] = 1
         serialized_memory_view = self.counterfactual_value_memory.view(-1, self.bucket_count) 
-        serialized_memory_view.div_(self.range_normalization_memory.expand_as(serialized_memory_view))
+        self.average_value_memory = serialized_memory_view.div(range_normalization.expand_as(serialized_memory_view)).view(self.counterfactual_value_memory.shape)
 
         self._values_are_prepared = True
 
+    def get_state(self):
+        ''' Gives the iteration counter and the values remembered so far, from
+        which @{set_state} continues.
+
+        Return a dict of the state'''
+        state = {'iter': self.iter, 'skip_iters': self.skip_iters}
+        if self.iter > 0:
+            state['last_nn_iter'] = self.last_nn_iter
+            state['next_round_nn_values'] = self.next_round_nn_values.clone()
+            state['last_nn_inputs'] = self.last_nn_inputs.clone()
+        if self.iter > self.skip_iters:
+            state['range_normalization_memory'] = self.range_normalization_memory.clone()
+            state['counterfactual_value_memory'] = self.counterfactual_value_memory.clone()
+        return state
+
+    def set_state(self, state):
+        ''' Continues from a state given by @{get_state}.
+
+        @{start_computation} must be called first, with the same pot sizes.
+
+        Params:
+            state: the state to continue from'''
+        self.iter = state['iter']
+        self.skip_iters = state['skip_iters']
+        self._values_are_prepared = False
+        if self.iter > 0:
+            self._init_iteration_buffers()
+            self.last_nn_iter = state['last_nn_iter']
+            self.next_round_nn_values.copy_(state['next_round_nn_values'])
+            self.last_nn_inputs.copy_(state['last_nn_inputs'])
+        if self.iter > self.skip_iters:
+            self.range_normalization_memory = state['range_normalization_memory'].clone()
+            self.counterfactual_value_memory = state['counterfactual_value_memory'].clone()
+
 
 
@@ -1,6 +1,7 @@
 ''' Wraps the calls to the final neural net.'''
 
 from Source.Settings.arguments import arguments
+from Source.Settings.precision_policy import precision_policy
 import torch
 
 class ValueNn:
@@ -16,6 +17,8 @@ class ValueNn:
 
         # 2.0 load model  
         self.mlp = torch.load(net_file + '.pt')
+        self.nn_dtype = precision_policy.nn_dtype
+        self.mlp.to(self.nn_dtype)
         self.mlp.eval()
         print('NN architecture:')
         print(self.mlp)
@@ -23,10 +26,16 @@ class ValueNn:
     def get_value(self, inputs, output):
         ''' Gives the neural net output for a batch of inputs.
 
+        The net is evaluated in the precision of @{precision_policy}, the inputs
+        and outputs are cast at the boundary.
+
         Params:
             inputs: An NxI tensor containing N instances of neural net inputs. 
                 See @{net_builder} for details of each input.
             output: An NxO tensor in which to store N sets of neural net outputs. 
                 See @{net_builder} for details of each output.'''
+        if self.nn_dtype != precision_policy.nn_dtype:
+            self.nn_dtype = precision_policy.nn_dtype
+            self.mlp.to(self.nn_dtype)
         with torch.no_grad():
-            output.copy_(self.mlp(inputs))
+            output.copy_(self.mlp(inputs.to(self.nn_dtype)))
@@ -0,0 +1,46 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Player.continual_resolving import ContinualResolving
+from Source.Tree.tree_builder import TreeNode
+import time
+
+class State:
+    def __init__(self):
+        super().__init__()
+        self.position = constants.players.P1
+        self.hand_id = 0
+
+if __name__ == "__main__":
+    continual_resolving = ContinualResolving()
+    continual_resolving.start_new_hand(State())
+
+    # P1 re-solves the first street after calling a bet of P2, which is slow with the neural net
+    node = TreeNode()
+    node.board = arguments.Tensor()
+    node.street = 1
+    node.current_player = constants.players.P1
+    node.bets = arguments.Tensor([300, 300])
+    continual_resolving.decision_id = 1
+    continual_resolving.last_node = node
+    continual_resolving.current_player_range = card_tools.get_random_range(node.board, 2)
+    continual_resolving.current_opponent_cfvs_bound = card_tools.get_random_range(node.board, 4)
+
+    # the first re-solve also builds the lookahead, so it is not timed
+    continual_resolving._resolve_node(node, State())
+    full_iterations = continual_resolving.resolving.resolve_results.iterations
+
+    for time_budget in [0.2, 0.5]:
+        timer = time.time()
+        continual_resolving._resolve_node(node, State(), time.time() + time_budget)
+        resolve_time = time.time() - timer
+        results = continual_resolving.resolving.resolve_results
+        print(f'budget {time_budget}s: {resolve_time:.3f}s, {results.iterations} of {full_iterations} iterations')
+
+        # the re-solve fits into the budget (up to the last iteration) and still averages some iterations
+        assert resolve_time < time_budget * 1.5
+        assert results.iterations < full_iterations
+        assert not results.strategy.isnan().any()
+    continual_resolving.close()
@@ -0,0 +1,66 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Game.card_tools import card_tools
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Lookahead.resolving import Resolving
+from Source.Player.continual_resolving import ContinualResolving
+from Source.Tree.tree_builder import TreeNode
+import threading
+import time
+
+def river_node(bets):
+    node = TreeNode()
+    node.board = card_to_string.string_to_board('Ks')
+    node.street = 2
+    node.current_player = constants.players.P1
+    node.bets = arguments.Tensor(bets)
+    return node
+
+def start_speculative_resolve(continual_resolving, node):
+    ''' Starts a re-solve in the background as @{continual_resolving} does after acting.'''
+    player_range = card_tools.get_random_range(node.board, 2)
+    opponent_cfvs = card_tools.get_random_range(node.board, 4)
+    resolving = Resolving()
+    resolving.cancel_event = threading.Event()
+    future = continual_resolving.speculative_pool.submit(resolving.resolve, node, player_range, opponent_cfvs)
+    continual_resolving.speculative_resolves[continual_resolving._node_key(node)] = (resolving, future)
+    return resolving
+
+if __name__ == "__main__":
+    arguments.speculative_workers = 2
+    continual_resolving = ContinualResolving()
+    arguments.cfr_iters = 200
+    arguments.cfr_skip_iters = 100
+
+    # the re-solve of the node which is reached is used, the other one is cancelled
+    hit = start_speculative_resolve(continual_resolving, river_node([100, 100]))
+    miss = start_speculative_resolve(continual_resolving, river_node([300, 300]))
+    resolving = continual_resolving._take_speculative_resolve(river_node([100, 100]))
+    assert resolving is hit and resolving.resolve_results.iterations == arguments.cfr_iters
+    assert miss.cancel_event.is_set() and len(continual_resolving.speculative_resolves) == 0
+
+    # a re-solve which cannot finish by the deadline is stopped with the iterations run so far
+    arguments.cfr_iters = 1000000
+    arguments.cfr_skip_iters = 10
+    slow = start_speculative_resolve(continual_resolving, river_node([100, 100]))
+    time.sleep(0.5)
+    timer = time.time()
+    resolving = continual_resolving._take_speculative_resolve(river_node([100, 100]), time.time() + 0.5)
+    wait_time = time.time() - timer
+    print(f'waited {wait_time:.3f}s for a re-solve stopped after {resolving.resolve_results.iterations} iterations')
+    assert resolving is slow and slow.cancel_event.is_set()
+    assert resolving.resolve_results.iterations < arguments.cfr_iters and wait_time < 1
+    assert not resolving.resolve_results.strategy.isnan().any()
+
+    # closing stops the running re-solves and their threads, and no new ones are started
+    running = start_speculative_resolve(continual_resolving, river_node([100, 100]))
+    time.sleep(0.2)
+    pool = continual_resolving.speculative_pool
+    continual_resolving.close()
+    assert running.cancel_event.is_set() and continual_resolving.speculative_pool == None
+    pool.shutdown()
+    assert all(not thread.is_alive() for thread in pool._threads)
+    continual_resolving._start_speculative_resolves(river_node([100, 100]))
+    assert len(continual_resolving.speculative_resolves) == 0
@@ -8,11 +8,19 @@ from Source.Settings.arguments import arguments
 from Source.Settings.constants import constants
 from Source.Game.card_tools import card_tools
 from Source.Tree.tree_builder import TreeNode
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import threading
 import torch
+import time
 
 class ContinualResolving:
     def __init__(self):
         ''' Constructor. Does a depth-limited solve of the game's first node.'''
+        # the re-solves of our likely next decisions running in the background, keyed by their public state
+        self.speculative_resolves = {}
+        self.speculative_pool = None
+        if arguments.speculative_workers > 0:
+            self.speculative_pool = ThreadPoolExecutor(arguments.speculative_workers)
         self.starting_player_range = card_tools.get_uniform_range(arguments.Tensor())
         self.resolve_first_node()
 
@@ -47,12 +55,13 @@ class ContinualResolving:
         Params:
             state: the first state where the re-solving player acts in the new
                 game (a table of the type returned by @{protocol_to_node.parse_state})'''
+        self._cancel_speculative_resolves()
         self.last_node = None
         self.decision_id = 0
         self.position = state.position
         self.hand_id = state.hand_id
 
-    def _resolve_node(self, node, state):
+    def _resolve_node(self, node, state, deadline=None):
         ''' Re-solves a node to choose the re-solving player's next action.
 
         Params:
@@ -60,6 +69,8 @@ class ContinualResolving:
                 the type returned by @{protocol_to_node.parsed_state_to_node})
             state: the game state where the re-solving player is to act
                 (a table of the type returned by @{protocol_to_node.parse_state})
+            deadline [opt]: the time (as given by `time.time()`) by which re-solving
+                must be finished
         '''
         assert(self.decision_id)
         # 1.0 first node and P1 position
@@ -75,10 +86,164 @@ class ContinualResolving:
 
             # 2.1 update the invariant based on actions we did not make
             self._update_invariant(node, state)
+
+            # 2.2 a later decision of the street may be read from the previous re-solve
+            if self._reuse_resolving(node):
+                return
+
+            # 2.3 the node may have been re-solved while the opponent was thinking
+            resolving = self._take_speculative_resolve(node, deadline)
+            if resolving != None:
+                self.resolving = resolving
+                return
             
-            # 2.2 re-solve
+            # 2.4 re-solve
+            time_budget = None
+            if deadline != None:
+                time_budget = max(deadline - time.time(), 0)
+            # on the same street, the previous lookahead contains the node
+            warm_start = None
+            if arguments.cfr_warm_start and self.last_node and self.last_node.street == node.street:
+                warm_start = self.resolving
             self.resolving = Resolving()    
-            self.resolving.resolve(node, self.current_player_range, self.current_opponent_cfvs_bound)
+            self.resolving.resolve(node, self.current_player_range, self.current_opponent_cfvs_bound, time_budget, warm_start)
+
+    def _reuse_resolving(self, node):
+        ''' Reads the strategy at a node from the previous re-solve of the street, if
+        the opponent's actions since then are likely enough under its average strategy
+        (see @{arguments.resolve_reuse_reach}).
+
+        Params:
+            node: the game node where the re-solving player is to act
+        Return `True` if the re-solving at the node was taken from the previous re-solve'''
+        if arguments.resolve_reuse_reach == None or not self.last_node or self.last_node.street != node.street:
+            return False
+        descendant = self.resolving.get_descendant(node)
+        if descendant == None or descendant.resolve_results.reach < arguments.resolve_reuse_reach:
+            return False
+        self.resolving = descendant
+        return True
+
+    def _node_key(self, node):
+        ''' Gives the public state of a node, which identifies a speculative re-solve.
+
+        Params:
+            node: a game node
+        Return a hashable key'''
+        return (node.street, node.current_player, tuple(node.board.tolist()), tuple(node.bets.tolist()))
+
+    def _start_speculative_resolves(self, node):
+        ''' Starts re-solving our likely next decisions in the background, while
+        the opponent is thinking (see @{arguments.speculative_workers}).
+
+        After our action, each reply of the opponent leads to a known decision: a
+        raise leads to our decision on the same street, and if we act first on the
+        next street, a call leads to our first decision there on each board. The
+        invariant of that decision is already known. The
+        @{arguments.speculative_resolves} most likely decisions are re-solved, by the
+        opponent's average strategy if all depths are averaged
+        (see @{arguments.lookahead_average_all_depths}).
+
+        Params:
+            node: the game node where the re-solving player just acted
+        '''
+        self._cancel_speculative_resolves()
+        if self.speculative_pool == None:
+            return
+        actions = self.resolving.get_possible_actions()
+        opponent_node = self.resolving.lookahead_tree.children[(actions == self.last_bet).nonzero().view(-1)[0].item()]
+        if opponent_node.terminal or opponent_node.current_player == constants.players.chance:
+            return
+
+        probabilities = self.resolving.get_reply_probabilities(self.last_bet)
+        # [probability, node, player range, opponent cfvs]
+        candidates = []
+        for i in range(len(opponent_node.children)):
+            reply = opponent_node.children[i]
+            probability = probabilities[i].item() if probabilities != None else 1
+            if reply.terminal:
+                continue
+            if reply.current_player == self.position:
+                candidates.append((probability, reply, self.current_player_range.clone(), self.current_opponent_cfvs_bound.clone()))
+            elif reply.current_player == constants.players.chance and self.position == constants.players.P1:
+                boards = card_tools.get_second_round_boards()
+                boards_cfvs = self.resolving.get_chance_action_cfvs(self.last_bet)
+                for b in range(boards.size(0)):
+                    board = boards[b].type(arguments.Tensor)
+                    # the boards which hold our card cannot be dealt
+                    if card_tools.get_possible_hand_indexes(board)[self.hand_id] == 0:
+                        continue
+                    next_node = TreeNode()
+                    next_node.street = node.street + 1
+                    next_node.board = board
+                    next_node.current_player = constants.players.P1
+                    next_node.bets = reply.bets.clone()
+                    player_range = card_tools.normalize_range(board, self.current_player_range)
+                    candidates.append((probability / boards.size(0), next_node, player_range, boards_cfvs[card_tools.get_board_index(board)].clone()))
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        for probability, next_node, player_range, opponent_cfvs in candidates[:arguments.speculative_resolves]:
+            warm_start = None
+            if arguments.cfr_warm_start and next_node.street == node.street:
+                warm_start = self.resolving
+            resolving = Resolving()
+            resolving.cancel_event = threading.Event()
+            future = self.speculative_pool.submit(resolving.resolve, next_node, player_range, opponent_cfvs, None, warm_start)
+            self.speculative_resolves[self._node_key(next_node)] = (resolving, future)
+
+    def _take_speculative_resolve(self, node, deadline=None):
+        ''' Gives the background re-solve of a node, and cancels the other ones
+        which are stale now.
+
+        A re-solve still in progress is waited for until the deadline, then it is
+        stopped and its average strategy so far is used. A re-solve which has not
+        started, or was stopped before it averaged any iteration, is cancelled and
+        the node is re-solved as usual.
+
+        Params:
+            node: the game node where the re-solving player is to act
+            deadline [opt]: the time (as given by `time.time()`) by which re-solving
+                must be finished
+        Return the @{resolving|Resolving} of the node, or `None` if it was not re-solved
+        in the background'''
+        job = self.speculative_resolves.pop(self._node_key(node), None)
+        self._cancel_speculative_resolves()
+        if job == None:
+            return None
+        resolving, future = job
+        if future.cancel():
+            return None
+        timeout = None
+        if deadline != None:
+            timeout = max(deadline - time.time(), 0)
+        try:
+            future.result(timeout)
+        except TimeoutError:
+            # the lookahead stops after its current iteration
+            resolving.cancel_event.set()
+            future.result()
+            if resolving.lookahead.average_weight_sum == 0:
+                return None
+        return resolving
+
+    def _cancel_speculative_resolves(self):
+        ''' Stops all the re-solves running in the background.'''
+        for resolving, future in self.speculative_resolves.values():
+            resolving.cancel_event.set()
+            future.cancel()
+        self.speculative_resolves = {}
+
+    def close(self):
+        ''' Stops the re-solves running in the background and the threads which run
+        them.
+
+        Must be called when the match ends, after which no background re-solves are
+        started.'''
+        self._cancel_speculative_resolves()
+        if self.speculative_pool != None:
+            # the pending re-solves are cancelled, so the threads exit after their current iteration
+            self.speculative_pool.shutdown(wait=False)
+            self.speculative_pool = None
 
     def _update_invariant(self, node, state):
         ''' Updates the player's range and the opponent's counterfactual values to be
@@ -113,7 +278,7 @@ class ContinualResolving:
         else:
             assert(self.last_node.street == node.street)
 
-    def compute_action(self, node, state):
+    def compute_action(self, node, state, time_budget=None):
         ''' Re-solves a node and chooses the re-solving player's next action.
 
         Params:
@@ -121,16 +286,28 @@ class ContinualResolving:
                 the type returned by @{protocol_to_node.parsed_state_to_node})
             state: the game state where the re-solving player is to act
                 (a table of the type returned by @{protocol_to_node.parse_state})
+            time_budget [opt]: the number of seconds the action may take to compute
+                (default @{arguments.resolve_time_budget}). Re-solving then runs as
+                many iterations as fit into the budget and uses the average strategy
+                reached so far
         Return an action sampled from the re-solved strategy at the given state,
         with the fields:
             * `action`: an element of @{constants.acpc_actions}
             * `raise_amount`: the number of chips to raise (if `action` is raise)'''
-        self._resolve_node(node, state)  
+        if time_budget == None:
+            time_budget = arguments.resolve_time_budget
+        deadline = None
+        if time_budget != None:
+            deadline = time.time() + time_budget
+        
+        self._resolve_node(node, state, deadline)  
         sampled_bet = self._sample_bet(node, state)  
         
         self.decision_id = self.decision_id + 1
         self.last_bet = sampled_bet
         self.last_node = node
+
+        self._start_speculative_resolves(node)
         
         out = self._bet_to_action(node, sampled_bet)
         return out
@@ -8,6 +8,8 @@ class params:
     # the tensor datatype used for storing DeepStack's internal data
     Tensor = torch.FloatTensor
     IntTensor = torch.IntTensor
+    # the numeric precision of the subsystems: 'float32', 'mixed' or 'float64' (see precision_policy)
+    precision = 'float32'
     # list of pot-scaled bet sizes to use in tree
     bet_sizing = [1]
     # the number of betting rounds in the game
@@ -20,6 +22,66 @@ class params:
     cfr_iters = 1000
     # the number of preliminary CFR iterations which DeepStack doesn't factor into the average strategy (included in cfr_iters)
     cfr_skip_iters = 500
+    # whether re-solving may stop before cfr_iters once the root average strategy has converged
+    cfr_early_stop = False
+    # how often (in averaged iterations) convergence is checked when cfr_early_stop is set
+    cfr_check_iters = 50
+    # the minimum number of iterations that DeepStack runs CFR for when cfr_early_stop is set (included in cfr_iters)
+    cfr_min_iters = 600
+    # the largest change of the root average strategy between two checks which is considered converged
+    cfr_tolerance = 1e-3
+    # how regrets and averages are updated during re-solving: 'cfr+', 'cfr+_linear_avg', 'linear' or 'dcfr'
+    cfr_update_rule = 'cfr+'
+    # the discounting exponents used by 'dcfr' for positive regrets, negative regrets and the average strategy
+    dcfr_alpha = 1.5
+    dcfr_beta = 0
+    dcfr_gamma = 2
+    # how often (in iterations) the neural net re-evaluates depth-limited states, the last outputs are reused in between
+    nn_eval_iters = 1
+    # if set, the neural net is also re-evaluated as soon as one of its inputs moved by more than this since the last evaluation
+    nn_eval_range_threshold = None
+    # the number of seconds DeepStack may re-solve for when choosing an action, None for no limit
+    resolve_time_budget = None
+    # the number of threads which re-solve our likely next decisions while the opponent is thinking, 0 disables it
+    speculative_workers = 0
+    # the number of next decisions which are re-solved in the background after each of our actions
+    speculative_resolves = 4
+    # whether a re-solve on the same street as the previous one starts from its regrets
+    cfr_warm_start = False
+    # the number of CFR iterations of a warm-started re-solve (preliminary iterations are scaled down in proportion)
+    cfr_warm_start_iters = 300
+    # whether the lookahead averages the strategies and cfvs of every depth, not only those of the root
+    lookahead_average_all_depths = False
+    # the smallest probability of the opponent's actions since the last re-solve for which a later decision on the
+    # same street is read from that re-solve instead of re-solving (needs lookahead_average_all_depths), None always re-solves
+    resolve_reuse_reach = None
+    # whether the lookahead skips evaluating terminal and depth-limited states which are (almost) never reached.
+    # It only pays off when the evaluations dominate the iteration, e.g. a large neural net or deck: skipping a state
+    # costs a gather and a scatter, and in Leduc this makes re-solving about 15% slower on the last street and about
+    # as fast on the first street (where the neural net rows of more than half of the states are skipped)
+    lookahead_pruning = False
+    # the reach of both players below which a deep state of the lookahead is pruned
+    lookahead_pruning_threshold = 1e-6
+    # how often (in iterations) the pruned states are re-checked
+    lookahead_pruning_check_iters = 10
+    # runs the lookahead iterations in compiled kernels: None (eager), 'script' (TorchScript) or 'compile' (torch.compile)
+    lookahead_kernel = None
+    # the fraction of re-solves whose phases are timed (see LookaheadProfile), 0 disables profiling
+    lookahead_profile_rate = 0
+    # how many built lookaheads (keyed by the public state of their root) are kept for reuse, 0 disables the cache
+    lookahead_cache_size = 128
+    # how often (in iterations) a re-solve with a checkpoint file saves its state
+    lookahead_checkpoint_iters = 100
+    # whether the lookahead shares its scratch tensors across depths and stores the pot sizes and action masks broadcastably
+    lookahead_compact_layout = False
+    # the deck size from which the terminal equity on last-round boards is computed by sorting the hands by strength
+    # instead of by K x K matrix products, None always uses the matrices
+    terminal_equity_sort_min_cards = None
+    # whether the call and fold matrices of each board are computed once per process and shared by every TerminalEquity
+    terminal_equity_cache = True
+    # a file of precomputed call and fold matrices (see main_terminal_equity) which is memory-mapped at the first
+    # look-up, so that worker processes share it, None computes the matrices on demand
+    terminal_equity_cache_file = None
     # how many poker situations are solved simultaneously during data generation
     gen_batch_size = 10
     # how many poker situations are used in each neural net training batch
@@ -45,6 +107,14 @@ class params:
 
 arguments = params()
 assert(arguments.cfr_iters > arguments.cfr_skip_iters)
+assert(arguments.cfr_iters >= arguments.cfr_min_iters and arguments.cfr_min_iters > arguments.cfr_skip_iters)
+assert(arguments.cfr_warm_start_iters <= arguments.cfr_iters)
+assert(arguments.resolve_reuse_reach == None or arguments.lookahead_average_all_depths)
+assert(arguments.lookahead_kernel in [None, 'script', 'compile'])
+assert(arguments.cfr_update_rule in ['cfr+', 'cfr+_linear_avg', 'linear', 'dcfr'])
+assert(arguments.precision in ['float32', 'mixed', 'float64'])
+if arguments.precision == 'float64':
+    arguments.Tensor = torch.DoubleTensor
 if arguments.gpu and torch.cuda.is_available():
-    arguments.Tensor = torch.cuda.FloatTensor
+    arguments.Tensor = torch.cuda.DoubleTensor if arguments.precision == 'float64' else torch.cuda.FloatTensor
     arguments.IntTensor = torch.cuda.IntTensor
\ No newline at end of file
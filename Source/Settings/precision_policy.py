@@ -0,0 +1,67 @@
+''' The numeric precision used by each subsystem of DeepStack.
+
+The policy is selected with @{arguments.precision}:
+
+* `float32`: every tensor uses the type of @{arguments.Tensor}
+
+* `mixed`: the regrets, averages and neural net value memories are accumulated in
+float64 and the neural net is evaluated in bfloat16, the ranges, values and terminal
+equities stay in float32
+
+* `float64`: @{arguments.Tensor} is switched to float64, only the neural net is
+evaluated in float32
+
+On the CPU, `mixed` is not faster than `float32`: neither bfloat16 nor the float64
+accumulators are faster there, and a Leduc re-solve on the first street takes about
+10% longer. Its gain is precision: on the last street its values are about twice as
+close to `float64` as those of `float32`. The bfloat16 net only pays off on hardware
+with fast bfloat16 arithmetic.
+
+Data is cast explicitly where it crosses from one precision to another: accumulators
+are created with `accumulation_dtype`, and @{value_nn|ValueNn} casts its inputs to
+`nn_dtype` and its outputs back.
+'''
+from Source.Settings.arguments import arguments
+import torch
+
+class PrecisionPolicy:
+    def __init__(self, precision):
+        ''' Constructor
+
+        Params:
+            precision: the name of the policy (see @{configure})'''
+        super().__init__()
+        self.configure(precision)
+
+    def configure(self, precision):
+        ''' Switches to another policy.
+
+        Only affects the data structures created afterwards, so lookaheads built
+        before (including the templates cached by @{resolving}) keep their precision.
+
+        Params:
+            precision: 'float32', 'mixed' or 'float64'
+        '''
+        assert(precision in ['float32', 'mixed', 'float64'])
+        arguments.precision = precision
+        if arguments.gpu and torch.cuda.is_available():
+            arguments.Tensor = torch.cuda.DoubleTensor if precision == 'float64' else torch.cuda.FloatTensor
+        else:
+            arguments.Tensor = torch.DoubleTensor if precision == 'float64' else torch.FloatTensor
+
+        # the type of ranges, values and terminal equities
+        self.dtype = arguments.Tensor().dtype
+        # the type of the tensors accumulated over the iterations of re-solving
+        self.accumulation_dtype = self.dtype if precision == 'float32' else torch.float64
+        # the type in which the neural net is evaluated
+        self.nn_dtype = torch.bfloat16 if precision == 'mixed' else torch.float32
+
+    def accumulator(self, tensor):
+        ''' Gives an accumulator with the values of a tensor.
+
+        Params:
+            tensor: the initial values
+        Return a tensor of type `accumulation_dtype` (the tensor itself if it has this type)'''
+        return tensor.to(self.accumulation_dtype)
+
+precision_policy = PrecisionPolicy(arguments.precision)
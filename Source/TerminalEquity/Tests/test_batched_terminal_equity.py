@@ -0,0 +1,33 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.game_settings import game_settings
+from Source.Game.card_tools import card_tools
+from Source.TerminalEquity.terminal_equity import TerminalEquity
+from Source.TerminalEquity.batched_terminal_equity import BatchedTerminalEquity
+import torch
+
+if __name__ == "__main__":
+    batch_size = 10
+    # the first-round board and every second-round board
+    second_round_boards = card_tools.get_second_round_boards()
+    boards = [arguments.Tensor()] + [second_round_boards[i] for i in range(second_round_boards.size(0))]
+
+    batched_terminal_equity = BatchedTerminalEquity()
+    batched_terminal_equity.set_boards(boards)
+    torch.manual_seed(0)
+    ranges = arguments.Tensor(len(boards), batch_size, game_settings.card_count).uniform_()
+    call_values = ranges.clone()
+    fold_values = ranges.clone()
+    batched_terminal_equity.call_value(ranges, call_values)
+    batched_terminal_equity.fold_value(ranges, fold_values)
+
+    terminal_equity = TerminalEquity()
+    board_values = ranges[0].clone()
+    for i in range(len(boards)):
+        terminal_equity.set_board(boards[i])
+        terminal_equity.call_value(ranges[i], board_values)
+        assert torch.allclose(call_values[i], board_values)
+        terminal_equity.fold_value(ranges[i], board_values)
+        assert torch.allclose(fold_values[i], board_values)
+    print('batched values match the values of each board')
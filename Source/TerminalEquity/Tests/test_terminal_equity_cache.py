@@ -0,0 +1,52 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.precision_policy import precision_policy
+from Source.Game.card_tools import card_tools
+from Source.TerminalEquity import terminal_equity as terminal_equity_module
+from Source.TerminalEquity.terminal_equity import TerminalEquity
+import torch
+import os
+import tempfile
+import time
+
+def set_board(board, cache):
+    arguments.terminal_equity_cache = cache
+    terminal_equity = TerminalEquity()
+    timer = time.time()
+    terminal_equity.set_board(board)
+    return terminal_equity, time.time() - timer
+
+if __name__ == "__main__":
+    first_round_board = arguments.Tensor()
+    uncached, uncached_time = set_board(first_round_board, False)
+    set_board(first_round_board, True)
+    cached, cached_time = set_board(first_round_board, True)
+    print(f'first round set_board: computed {uncached_time:.4f}s, cached {cached_time:.6f}s')
+    assert torch.equal(uncached.equity_matrix, cached.equity_matrix)
+    assert torch.equal(uncached.fold_matrix, cached.fold_matrix)
+
+    # a precomputed file is loaded instead of computing the matrices
+    cache_file = os.path.join(tempfile.mkdtemp(), 'terminal_equity.pt')
+    terminal_equity_module.precompute_terminal_equity_matrices()
+    terminal_equity_module.save_terminal_equity_matrices(cache_file)
+    print(f'cache file: {os.path.getsize(cache_file)} bytes')
+    terminal_equity_module.terminal_equity_matrices.clear()
+    arguments.terminal_equity_cache_file = cache_file
+
+    boards = card_tools.get_second_round_boards()
+    for i in range(boards.size(0)):
+        loaded, _ = set_board(boards[i], True)
+        computed, _ = set_board(boards[i], False)
+        assert torch.equal(loaded.equity_matrix, computed.equity_matrix)
+        assert torch.equal(loaded.fold_matrix, computed.fold_matrix)
+
+    # the matrices of another precision are not shared
+    for precision in ['float64', 'float32']:
+        precision_policy.configure(precision)
+        for i in range(boards.size(0)):
+            cached, _ = set_board(boards[i], True)
+            assert cached.equity_matrix.type() == arguments.Tensor().type()
+            assert cached.fold_matrix.type() == arguments.Tensor().type()
+            computed, _ = set_board(boards[i], False)
+            assert torch.equal(cached.equity_matrix, computed.equity_matrix)
@@ -0,0 +1,56 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.game_settings import game_settings
+from Source.Game.card_tools import card_tools
+from Source.Game.Evaluation.evaluator import evaluator
+from Source.TerminalEquity.terminal_equity import TerminalEquity
+import torch
+import time
+
+def timed(value, ranges, result, repeats):
+    timer = time.time()
+    for _ in range(repeats):
+        value(ranges, result)
+    return (time.time() - timer) / repeats
+
+if __name__ == "__main__":
+    batch_size = 100
+    repeats = 20
+    # the evaluator allows at most two cards of each rank, so the deck grows by its ranks
+    for rank_count in [3, 13, 50, 200, 800]:
+        game_settings.rank_count = rank_count
+        game_settings.card_count = game_settings.suit_count * rank_count
+        board = arguments.IntTensor([1])
+
+        # both evaluations share the memoized hand strengths, and the matrices are built instead of read from the cache
+        evaluator.batch_eval(board)
+        arguments.terminal_equity_cache = False
+        terminal_equity = TerminalEquity()
+        timer = time.time()
+        terminal_equity.set_board(board, sort_based=True)
+        sorted_setup_time = time.time() - timer
+        # the sort-based evaluation builds neither matrix
+        assert terminal_equity.equity_matrix is None and terminal_equity.fold_matrix is None
+        matrix_terminal_equity = TerminalEquity()
+        timer = time.time()
+        matrix_terminal_equity.set_board(board, sort_based=False)
+        matrix_setup_time = time.time() - timer
+        arguments.terminal_equity_cache = True
+        print(f'{game_settings.card_count} cards, set_board: matrices {matrix_setup_time * 1000:.3f}ms, sorted {sorted_setup_time * 1000:.3f}ms')
+        if rank_count == 800:
+            assert sorted_setup_time < matrix_setup_time
+        torch.manual_seed(rank_count)
+        ranges = arguments.Tensor(batch_size, game_settings.card_count).uniform_()
+        ranges.mul_(card_tools.get_possible_hand_indexes(board).view(1, -1))
+        matrix_result = ranges.clone()
+        sorted_result = ranges.clone()
+
+        for name, matrix in [('call', matrix_terminal_equity.equity_matrix), ('fold', matrix_terminal_equity.fold_matrix)]:
+            value = terminal_equity.call_value if name == 'call' else terminal_equity.fold_value
+            matrix_value = lambda ranges, result: torch.mm(ranges, matrix, out=result)
+            matrix_time = timed(matrix_value, ranges, matrix_result, repeats)
+            sorted_time = timed(value, ranges, sorted_result, repeats)
+            print(f'{game_settings.card_count} cards, {name}: matmul {matrix_time * 1000:.3f}ms, sorted {sorted_time * 1000:.3f}ms, speedup: {matrix_time / sorted_time:.2f}x')
+            # both evaluations must give the same values
+            assert torch.allclose(matrix_result, sorted_result, rtol=1e-4, atol=1e-3), (matrix_result - sorted_result).abs().max()
@@ -0,0 +1,64 @@
+''' Evaluates the terminal equity on several boards at once.
+
+Holds the call and fold matrices of a set of boards stacked in BxKxK tensors, so
+that ranges on different boards are evaluated with a single batched matrix product
+instead of one @{terminal_equity|TerminalEquity} per board.
+'''
+
+from Source.Settings.game_settings import game_settings
+from Source.Settings.arguments import arguments
+from Source.TerminalEquity.terminal_equity import TerminalEquity
+import torch
+
+class BatchedTerminalEquity:
+    def __init__(self):
+        super().__init__()
+
+    def set_boards(self, boards):
+        ''' Sets the boards of the evaluator and stacks their matrices.
+
+        Params:
+            boards: a list of B possibly empty vectors of board cards, or a BxC tensor
+                of boards with C cards each
+        '''
+        self.board_count = len(boards)
+        self.equity_matrices = arguments.Tensor(self.board_count, game_settings.card_count, game_settings.card_count)
+        self.fold_matrices = arguments.Tensor(self.board_count, game_settings.card_count, game_settings.card_count)
+        terminal_equity = TerminalEquity()
+        for board in range(self.board_count):
+            terminal_equity.set_board(boards[board])
+            self.equity_matrices[board].copy_(terminal_equity.equity_matrix)
+            self.fold_matrices[board].copy_(terminal_equity.fold_matrix)
+
+    def call_value(self, ranges, result):
+        ''' Computes (a batch of) counterfactual values that a player achieves at a terminal node
+        where no player has folded, on every board.
+
+        @{set_boards} must be called before this def.
+
+        Params:
+            ranges: a batch of opponent ranges for each board in a BxNxK tensor, where B is
+                the number of boards, N is the batch size and K is the range size
+            result: a BxNxK tensor in which to save the cfvs '''
+        torch.bmm(ranges, self.equity_matrices, out=result)
+
+    def fold_value(self, ranges, result):
+        ''' Computes (a batch of) counterfactual values that a player achieves at a terminal node
+        where a player has folded, on every board.
+
+        @{set_boards} must be called before this def.
+
+        Params:
+            ranges: a batch of opponent ranges for each board in a BxNxK tensor, where B is
+                the number of boards, N is the batch size and K is the range size
+            result: A BxNxK tensor in which to save the cfvs. Positive cfvs are returned, and
+                must be negated if the player in question folded. '''
+        torch.bmm(ranges, self.fold_matrices, out=result)
+
+    def get_call_matrices(self):
+        ''' Returns the matrices which give showdown equity for any ranges on each board.
+
+        @{set_boards} must be called before this def.
+
+        Return a BxKxK tensor with the @{terminal_equity.get_call_matrix} of each board '''
+        return self.equity_matrices
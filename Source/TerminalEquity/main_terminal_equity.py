@@ -0,0 +1,11 @@
+''' Script that precomputes the call and fold matrices of every board and saves them
+to `arguments.terminal_equity_cache_file`.'''
+import sys
+sys.path.append(sys.path[0] + '/../../')
+from Source.Settings.arguments import arguments
+from Source.TerminalEquity.terminal_equity import precompute_terminal_equity_matrices, save_terminal_equity_matrices
+
+if __name__ == "__main__":
+    assert arguments.terminal_equity_cache_file != None, 'terminal_equity_cache_file is not set'
+    precompute_terminal_equity_matrices()
+    save_terminal_equity_matrices(arguments.terminal_equity_cache_file)
@@ -3,10 +3,90 @@ from Source.Game.card_tools import card_tools
 from Source.Game.Evaluation.evaluator import evaluator
 from Source.Settings.arguments import arguments
 import torch
+import threading
+import os
+
+# call and fold matrices of the boards seen by this process, keyed by the tensor type, the game and the board (see @{TerminalEquity.set_board})
+terminal_equity_matrices = {}
+# guards the matrices, since lookaheads may be built by several threads (see @{continual_resolving})
+terminal_equity_matrices_lock = threading.Lock()
+
+def _board_key(board):
+    ''' Gives the key of a board in `terminal_equity_matrices`.
+
+    Params:
+        board: a possibly empty vector of board cards
+    Return a hashable key of the board, which also holds the tensor type (precision and
+    device) of the matrices and the game settings which they depend on'''
+    cards = () if board.dim() == 0 else tuple(int(card) for card in board.view(-1).tolist())
+    return (arguments.Tensor().type(), game_settings.suit_count, game_settings.rank_count, game_settings.board_card_count, cards)
+
+def get_terminal_equity_matrices(board):
+    ''' Gives the call and fold matrices of a board, computing them at the first request.
+
+    The matrices are shared by every caller and must not be modified.
+
+    Params:
+        board: a possibly empty vector of board cards
+    Return the call matrix and the fold matrix of the board'''
+    cache_file = arguments.terminal_equity_cache_file
+    if len(terminal_equity_matrices) == 0 and cache_file != None and os.path.exists(cache_file):
+        load_terminal_equity_matrices(cache_file)
+    key = _board_key(board)
+    with terminal_equity_matrices_lock:
+        matrices = terminal_equity_matrices.get(key)
+    if matrices == None:
+        terminal_equity = TerminalEquity()
+        terminal_equity._set_call_matrix(board)
+        terminal_equity._set_fold_matrix(board)
+        matrices = (terminal_equity.equity_matrix, terminal_equity.fold_matrix)
+        with terminal_equity_matrices_lock:
+            terminal_equity_matrices[key] = matrices
+    return matrices
+
+def precompute_terminal_equity_matrices():
+    ''' Computes the call and fold matrices of the empty board and of every second-round board.'''
+    get_terminal_equity_matrices(arguments.Tensor())
+    boards = card_tools.get_second_round_boards()
+    for board in range(boards.size(0)):
+        get_terminal_equity_matrices(boards[board])
+
+def save_terminal_equity_matrices(path):
+    ''' Saves the matrices computed by this process to a file.
+
+    The file keys the matrices without their tensor type, since they are converted
+    to the type in use when they are loaded.
+
+    Params:
+        path: the file to write
+    '''
+    with terminal_equity_matrices_lock:
+        matrices = {key[1:]: (equity_matrix.cpu(), fold_matrix.cpu()) for key, (equity_matrix, fold_matrix) in terminal_equity_matrices.items()}
+    torch.save(matrices, path)
+
+def load_terminal_equity_matrices(path):
+    ''' Loads matrices saved by @{save_terminal_equity_matrices}.
+
+    With torch 2.1 or later, the file is memory-mapped, so processes which load the same
+    file share its pages instead of holding a copy of the matrices each.
+
+    Params:
+        path: the file to read
+    '''
+    try:
+        matrices = torch.load(path, mmap=True, weights_only=True)
+    except TypeError:
+        # older versions of torch can only read the whole file
+        matrices = torch.load(path)
+    tensor_type = arguments.Tensor().type()
+    with terminal_equity_matrices_lock:
+        for key, (equity_matrix, fold_matrix) in matrices.items():
+            terminal_equity_matrices[(tensor_type,) + key] = (equity_matrix.type(arguments.Tensor), fold_matrix.type(arguments.Tensor))
 
 class TerminalEquity:
     def __init__(self):
         super().__init__()
+        self.sort_based = False
 
     def get_last_round_call_matrix(self, board_cards, call_matrix):
         ''' Constructs the matrix that turns player ranges into showdown equity.
@@ -93,13 +173,76 @@ class TerminalEquity:
             # impossible street
             assert False, 'impossible street'
 
-    def set_board(self, board):
+    def _set_sorted_hands(self, board):
+        ''' Sets the data structures of the sort-based evaluation of the terminal
+        equity on a last-round board.
+
+        Sorts the valid private hands by strength value, so that the hands which beat
+        each hand form a prefix of the sorted order and the hands which it beats form a suffix.
+
+        Params:
+            board: a non-empty vector of board cards
+        '''
+        strength = evaluator.batch_eval(board)
+        self.possible_hands = card_tools.get_possible_hand_indexes(board)
+        valid_hands = self.possible_hands.nonzero().view(-1)
+        sorted_strength, order = strength.index_select(0, valid_hands).sort()
+        self.sorted_hands = valid_hands.index_select(0, order)
+        # the hands which beat a hand end before the first hand of equal strength,
+        # the hands which it beats start after the last hand of equal strength
+        self.winners_end = torch.searchsorted(sorted_strength, strength, right=False)
+        self.losers_start = torch.searchsorted(sorted_strength, strength, right=True)
+
+    def set_board(self, board, sort_based=None):
         ''' Sets the board cards for the evaluator and creates its internal data structures.
 
         Params:
-            board: a possibly empty vector of board cards '''
-        self._set_call_matrix(board)
-        self._set_fold_matrix(board)
+            board: a possibly empty vector of board cards
+            sort_based [opt]: whether @{call_value} and @{fold_value} sort the hands by
+                strength instead of multiplying by the equity matrices, only possible on a
+                last-round board. Defaults to `arguments.terminal_equity_sort_min_cards` '''
+        street = card_tools.board_to_street(board)
+        if sort_based is None:
+            min_cards = arguments.terminal_equity_sort_min_cards
+            sort_based = min_cards != None and game_settings.card_count >= min_cards
+        # the first-round call matrix averages over the boards, so it has no single order of the hands
+        self.sort_based = sort_based and street == 2
+        if self.sort_based:
+            # the sorted hands replace both matrices, so nothing quadratic in the deck is built
+            self.equity_matrix, self.fold_matrix = None, None
+            self._set_sorted_hands(board)
+        elif arguments.terminal_equity_cache:
+            self.equity_matrix, self.fold_matrix = get_terminal_equity_matrices(board)
+        else:
+            self._set_call_matrix(board)
+            self._set_fold_matrix(board)
+
+    def _sorted_call_value(self, ranges, result):
+        ''' Computes @{call_value} from prefix sums of the ranges over the hands sorted
+        by strength, in O(NK) after the hands were sorted by @{set_board}.
+
+        Params:
+            ranges: a batch of opponent ranges in an NxK tensor
+            result: a NxK tensor in which to save the cfvs '''
+        sorted_ranges = ranges.index_select(1, self.sorted_hands)
+        # prefix[:, i] is the range mass of the i strongest valid hands
+        prefix = torch.nn.functional.pad(sorted_ranges.cumsum(dim=1), (1, 0))
+        winners = prefix.index_select(1, self.winners_end)
+        losers = prefix[:, -1:] - prefix.index_select(1, self.losers_start)
+        # a hand only blocks itself, which ties and so is in neither sum
+        torch.sub(losers, winners, out=result)
+        result.mul_(self.possible_hands.view(1, -1))
+
+    def _sorted_fold_value(self, ranges, result):
+        ''' Computes @{fold_value} as the range mass of the valid hands, less the
+        hand which each hand blocks.
+
+        Params:
+            ranges: a batch of opponent ranges in an NxK tensor
+            result: a NxK tensor in which to save the cfvs '''
+        valid_ranges = ranges * self.possible_hands.view(1, -1)
+        torch.sub(valid_ranges.sum(dim=1, keepdim=True), valid_ranges, out=result)
+        result.mul_(self.possible_hands.view(1, -1))
 
     def call_value(self, ranges, result ):
         ''' Computes (a batch of) counterfactual values that a player achieves at a terminal node
@@ -111,6 +254,9 @@ class TerminalEquity:
             ranges: a batch of opponent ranges in an NxK tensor, where N is the batch size
                 and K is the range size
             result: a NxK tensor in which to save the cfvs '''
+        if self.sort_based:
+            self._sorted_call_value(ranges, result)
+            return
         torch.mm(ranges, self.equity_matrix, out=result)
 
     def fold_value(self, ranges, result ):
@@ -124,6 +270,9 @@ class TerminalEquity:
                 and K is the range size
             result: A NxK tensor in which to save the cfvs. Positive cfvs are returned, and
                 must be negated if the player in question folded. '''
+        if self.sort_based:
+            self._sorted_fold_value(ranges, result)
+            return
         torch.mm(ranges, self.fold_matrix, out=result)
 
     def get_call_matrix(self):
@@ -133,7 +282,8 @@ class TerminalEquity:
         
         Return For nodes in the last betting round, the matrix `A` such that for player ranges
         `x` and `y`, `x'Ay` is the equity for the first player when no player folds. For nodes
-        in the first betting round, the weighted average of all such possible matrices. '''
+        in the first betting round, the weighted average of all such possible matrices. `None`
+        if the evaluation is sort-based, which builds no matrices. '''
         return self.equity_matrix
 
     def tree_node_call_value(self, ranges, result ):
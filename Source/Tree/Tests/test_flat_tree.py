@@ -0,0 +1,52 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Tree.tree_builder import *
+from Source.Game.card_to_string_conversion import card_to_string
+import torch
+import time
+
+def check_same_tree(node, view):
+    assert node.current_player == view.current_player
+    assert node.street == view.street
+    assert node.terminal == view.terminal
+    assert node.type == view.type
+    assert node.node_type == view.node_type
+    assert node.depth == view.depth
+    assert node.board.tolist() == view.board.tolist()
+    assert torch.equal(node.bets, view.bets)
+    assert torch.equal(node.actions, view.actions)
+    if not node.terminal and len(node.children) > 0:
+        assert torch.allclose(node.strategy, view.strategy)
+    assert len(node.children) == len(view.children)
+    for child, child_view in zip(node.children, view.children):
+        check_same_tree(child, child_view)
+
+def count_nodes(node):
+    return 1 + sum(count_nodes(child) for child in node.children)
+
+if __name__ == "__main__":
+    # the default bet sizing and a larger tree with several bet sizes
+    for bet_sizing in [arguments.bet_sizing, [0.5, 1, 2]]:
+        arguments.bet_sizing = bet_sizing
+        builder = PokerTreeBuilder()
+        params = TreeParams()
+        params.root_node = TreeNode()
+        params.root_node.board = card_to_string.string_to_board('')
+        params.root_node.street = 1
+        params.root_node.current_player = constants.players.P1
+        params.root_node.bets = arguments.Tensor([100, 100])
+
+        timer = time.time()
+        tree = builder.build_tree(params)
+        tree_time = time.time() - timer
+
+        params.bet_sizing = None
+        timer = time.time()
+        flat_tree = builder.build_flat_tree(params)
+        flat_time = time.time() - timer
+        print(f'bet sizing {bet_sizing}: {flat_tree.get_node_count()} nodes, TreeNode build {tree_time:.3f}s, flat build {flat_time:.3f}s')
+
+        assert flat_tree.get_node_count() == count_nodes(tree)
+        check_same_tree(tree, flat_tree.to_tree())
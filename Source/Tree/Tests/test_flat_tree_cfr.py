@@ -0,0 +1,57 @@
+import sys
+sys.path.append(sys.path[0] + '/../../../')
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Settings.game_settings import game_settings
+from Source.Tree.tree_builder import *
+from Source.Game.card_to_string_conversion import card_to_string
+from Source.Tree.tree_cfr import TreeCFR
+from Source.Tree.flat_tree_cfr import FlatTreeCFR
+from Source.Tree.tree_values import TreeValues
+import torch
+import time
+
+def check_same_strategy(node, view):
+    if not node.terminal and len(node.children) > 0:
+        assert torch.allclose(node.strategy, view.strategy, atol=1e-3), (node.strategy - view.strategy).abs().max()
+    for child, child_view in zip(node.children, view.children):
+        check_same_strategy(child, child_view)
+
+if __name__ == "__main__":
+    iter_count = 200
+    # the Leduc tree and a larger tree with several bet sizes
+    for bet_sizing in [arguments.bet_sizing, [0.5, 1, 2]]:
+        arguments.bet_sizing = bet_sizing
+        builder = PokerTreeBuilder()
+        params = TreeParams()
+        params.root_node = TreeNode()
+        params.root_node.board = card_to_string.string_to_board('')
+        params.root_node.street = 1
+        params.root_node.current_player = constants.players.P1
+        params.root_node.bets = arguments.Tensor([100, 100])
+
+        starting_ranges = arguments.Tensor(constants.players_count, game_settings.card_count)
+        starting_ranges[0].copy_(card_tools.get_uniform_range(params.root_node.board))
+        starting_ranges[1].copy_(card_tools.get_uniform_range(params.root_node.board))
+
+        tree = builder.build_tree(params)
+        timer = time.time()
+        TreeCFR().run_cfr(tree, starting_ranges, iter_count)
+        tree_time = time.time() - timer
+
+        params.bet_sizing = None
+        flat_tree = builder.build_flat_tree(params)
+        flat_tree_cfr = FlatTreeCFR()
+        timer = time.time()
+        flat_tree_cfr.run_cfr(flat_tree, starting_ranges, iter_count)
+        flat_time = time.time() - timer
+        print(f'bet sizing {bet_sizing}, {flat_tree.get_node_count()} nodes: TreeCFR {tree_time:.3f}s, FlatTreeCFR {flat_time:.3f}s, speedup: {tree_time / flat_time:.2f}x')
+
+        # both solvers apply the same updates
+        solved_tree = flat_tree.to_tree(strategy=flat_tree_cfr.strategy)
+        check_same_strategy(tree, solved_tree)
+
+        tree_values = TreeValues()
+        tree_values.compute_values(tree, starting_ranges)
+        tree_values.compute_values(solved_tree, starting_ranges)
+        print(f'exploitability: TreeCFR {tree.exploitability.item():.4f}, FlatTreeCFR {solved_tree.exploitability.item():.4f} [chips]')
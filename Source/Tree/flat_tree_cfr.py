@@ -0,0 +1,149 @@
+''' Runs Counterfactual Regret Minimization (CFR) on a @{tree_builder.FlatTree}.
+
+Applies the same CFR+ updates as @{tree_cfr}, but processes all nodes of a level
+of the tree at once with gather and scatter operations instead of recursing over
+the nodes, and evaluates all terminal nodes with one batched matrix product.
+
+The strategies, regrets and average strategies are indexed by the child node:
+row `i` belongs to the action (or chance outcome) which leads to node `i`.
+'''
+from Source.Settings.arguments import arguments
+from Source.Settings.constants import constants
+from Source.Settings.game_settings import game_settings
+from Source.TerminalEquity.batched_terminal_equity import BatchedTerminalEquity
+from tqdm import tqdm
+import torch
+
+class FlatTreeCFR:
+    def __init__(self):
+        super().__init__()
+        # for ease of implementation, we use small epsilon rather than zero when working with regrets
+        self.regret_epsilon = 1/1000000000
+
+    def _set_tree(self, tree):
+        ''' Creates the index tensors and the CFR state of a tree.
+
+        Params:
+            tree: the @{tree_builder.FlatTree} to solve
+        '''
+        self.tree = tree
+        node_count = tree.get_node_count()
+        players = torch.arange(constants.players_count).view(1, -1)
+
+        # the children of player nodes, whose actions have regrets
+        children = torch.arange(1, node_count)
+        parent = tree.parent[1:]
+        acting_player = tree.current_player[parent]
+        chance_child = acting_player == constants.players.chance
+        self.player_children = children[chance_child.logical_not()]
+        self.player_children_parent = parent[chance_child.logical_not()]
+        self.player_children_acting = acting_player[chance_child.logical_not()]
+        self.player_nodes = torch.unique(self.player_children_parent)
+        self.player_nodes_acting = tree.current_player[self.player_nodes]
+
+        # the ranges which the probability of an action multiplies: the acting player's, or both after chance
+        self.cfv_mask = torch.zeros(node_count, constants.players_count, 1, dtype=torch.bool)
+        self.cfv_mask[1:, :, 0] = players == acting_player.view(-1, 1)
+        self.reach_mask = self.cfv_mask.clone()
+        self.reach_mask[1:][chance_child] = True
+
+        # terminal nodes, with the matrices of their boards and their pots
+        terminal_equity = BatchedTerminalEquity()
+        terminal_equity.set_boards([tree.get_board(board_id) for board_id in range(tree.empty_board_id + 1)])
+        self.call_nodes = (tree.node_type == constants.node_types.terminal_call).nonzero().view(-1)
+        self.fold_nodes = (tree.node_type == constants.node_types.terminal_fold).nonzero().view(-1)
+        self.call_matrices = terminal_equity.equity_matrices[tree.board_id[self.call_nodes]]
+        self.fold_matrices = terminal_equity.fold_matrices[tree.board_id[self.fold_nodes]]
+        self.call_pots = tree.pot[self.call_nodes].view(-1, 1, 1)
+        # the player who folded is the one who acted at the parent
+        fold_sign = arguments.Tensor(self.fold_nodes.size(0), constants.players_count, 1).fill_(1)
+        fold_sign[torch.arange(self.fold_nodes.size(0)), 1 - tree.current_player[self.fold_nodes]] = -1
+        self.fold_pots = tree.pot[self.fold_nodes].view(-1, 1, 1) * fold_sign
+
+        offsets = tree.level_offsets.tolist()
+        self.levels = [(offsets[level], offsets[level + 1]) for level in range(1, len(offsets) - 1)]
+
+        # the chance probabilities are never updated, so the strategies start from the uniform filling
+        self.strategy = tree.get_uniform_strategy()
+        self.current_strategy = self.strategy.clone()
+        self.regrets = arguments.Tensor(node_count, game_settings.card_count).fill_(self.regret_epsilon)
+        self.iter_weight_sum = arguments.Tensor(node_count, game_settings.card_count).fill_(0)
+        self.ranges_absolute = arguments.Tensor(node_count, constants.players_count, game_settings.card_count).fill_(0)
+        self.cf_values = arguments.Tensor(node_count, constants.players_count, game_settings.card_count).fill_(0)
+
+    def _compute_current_strategy(self):
+        ''' Computes the current strategy of every player node from its positive regrets.'''
+        positive_regrets = self.regrets[self.player_children].clamp(min=self.regret_epsilon)
+        regrets_sum = arguments.Tensor(self.regrets.size()).zero_()
+        regrets_sum.index_add_(0, self.player_children_parent, positive_regrets)
+        self.current_strategy[self.player_children] = positive_regrets / regrets_sum[self.player_children_parent]
+
+    def _compute_ranges(self):
+        ''' Computes the ranges of every node from the root down, one level at a time.'''
+        for start, end in self.levels:
+            parent = self.tree.parent[start:end]
+            strategy = self.current_strategy[start:end].unsqueeze(1)
+            reach = torch.where(self.reach_mask[start:end], strategy, torch.ones_like(strategy))
+            self.ranges_absolute[start:end] = self.ranges_absolute[parent] * reach
+
+    def _compute_terminal_values(self):
+        ''' Computes the values of every terminal node, each player's from the opponent's range.'''
+        call_values = torch.bmm(self.ranges_absolute[self.call_nodes].flip(1), self.call_matrices)
+        self.cf_values[self.call_nodes] = call_values * self.call_pots
+        fold_values = torch.bmm(self.ranges_absolute[self.fold_nodes].flip(1), self.fold_matrices)
+        self.cf_values[self.fold_nodes] = fold_values * self.fold_pots
+
+    def _compute_values(self):
+        ''' Computes the values of every node from the leaves up, one level at a time.'''
+        for start, end in reversed(self.levels):
+            parent = self.tree.parent[start:end]
+            values = self.cf_values[start:end]
+            strategy = self.current_strategy[start:end].unsqueeze(1)
+            # the acting player's values are weighted by the strategy, the others' are already weighted by the ranges
+            self.cf_values.index_add_(0, parent, torch.where(self.cfv_mask[start:end], values * strategy, values))
+
+    def _update_regrets(self):
+        ''' Updates the regrets of every action with the values of the current iteration.'''
+        children_values = self.cf_values[self.player_children, self.player_children_acting]
+        parent_values = self.cf_values[self.player_children_parent, self.player_children_acting]
+        regrets = self.regrets[self.player_children] + children_values - parent_values
+        self.regrets[self.player_children] = regrets.clamp(min=self.regret_epsilon)
+
+    def _update_average_strategy(self, _iter):
+        ''' Updates the average strategy of every player node with the current strategy.
+
+        Params:
+            iter: the iteration number of the current CFR iteration'''
+        if _iter < arguments.cfr_skip_iters:
+            return
+        iter_weight_contribution = self.ranges_absolute[self.player_nodes, self.player_nodes_acting]
+        iter_weight_contribution = iter_weight_contribution.masked_fill(iter_weight_contribution.le(0), self.regret_epsilon)
+        self.iter_weight_sum[self.player_nodes] += iter_weight_contribution
+        iter_weight = arguments.Tensor(self.iter_weight_sum.size()).zero_()
+        iter_weight[self.player_nodes] = iter_weight_contribution / self.iter_weight_sum[self.player_nodes]
+        children_weight = iter_weight[self.player_children_parent]
+        strategy = self.strategy[self.player_children] * (1 - children_weight)
+        self.strategy[self.player_children] = strategy + self.current_strategy[self.player_children] * children_weight
+
+    def run_cfr(self, tree, starting_ranges, iter_count=arguments.cfr_iters):
+        ''' Run CFR to solve the given game tree.
+
+        The average strategy is left in `strategy`, which @{tree_builder.FlatTree.to_tree}
+        can fill the nodes of the tree with.
+
+        Params:
+            tree: the @{tree_builder.FlatTree} to solve
+            starting_ranges: probability vectors over player private hands at the root node
+            iter_count [opt]: the number of iterations to run CFR for (default @{arguments.cfr_iters})'''
+        assert starting_ranges is not None
+        self._set_tree(tree)
+        self.ranges_absolute[0].copy_(starting_ranges)
+
+        for i in tqdm(range(iter_count)):
+            self._compute_current_strategy()
+            self._compute_ranges()
+            self.cf_values.zero_()
+            self._compute_terminal_values()
+            self._compute_values()
+            self._update_regrets()
+            self._update_average_strategy(i)
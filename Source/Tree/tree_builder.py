@@ -17,14 +17,19 @@ Each node of the tree contains the following fields.
 * `pot`. half the pot size, equal to the smaller number in `bets`
 # 
 * `children`. a list of children nodes
+
+@{PokerTreeBuilder.build_flat_tree} builds the same tree as a @{FlatTree}, which
+stores these fields in one array per field instead of one object per node.
 @classmod tree_builder
 '''
 from Source.Settings.arguments import arguments
 from Source.Settings.constants import constants
+from Source.Settings.game_settings import game_settings
 from Source.Game.card_tools import card_tools
 from Source.Game.card_to_string_conversion import card_to_string
 from Source.Tree.strategy_filling import StrategyFilling
 from Source.Game.bet_sizing import BetSizing
+import torch
 
 class TreeNode:
     def __init__(self):
@@ -58,6 +63,133 @@ class TreeParams:
         self.bet_sizing = None
         self.limit_to_street = None
 
+class FlatTree:
+    ''' A public tree stored as a struct of arrays.
+
+    The nodes are numbered in breadth-first order, so the nodes of each level and
+    the children of each node are contiguous. For N nodes, the tree holds:
+
+    * `parent`. the index of the parent of each node (-1 for the root)
+
+    * `first_child`, `children_count`. the index of the first child and the number
+    of children of each node
+
+    * `node_type`. `terminal_fold`, `terminal_call`, `chance_node` or `inner_node`
+    from @{constants.node_types}
+
+    * `terminal`. whether each node is terminal
+
+    * `current_player`. the player acting at each node
+
+    * `street`. the betting round of each node
+
+    * `bets`. an Nx2 tensor of the chips committed by each player
+
+    * `pot`. half the pot size at each node
+
+    * `board_id`. the @{card_tools.get_board_index} of the board of each node, or the
+    number of second-round boards for the empty board
+
+    * `action`. the action which leads to each node from its parent, as in the
+    `actions` of a @{TreeNode}
+
+    * `level`. the distance of each node from the root, with `level_offsets[l]` the
+    index of the first node of level `l`
+
+    * `depth`. the height of the subtree rooted at each node
+    '''
+    def __init__(self):
+        super().__init__()
+        self.boards = card_tools.get_second_round_boards()
+        self.empty_board_id = self.boards.size(0)
+
+    def get_node_count(self):
+        ''' Gives the number of nodes of the tree.
+
+        Return the number of nodes'''
+        return self.parent.size(0)
+
+    def get_board(self, board_id):
+        ''' Gives the board cards of a board id.
+
+        Params:
+            board_id: an entry of `board_id`
+        Return a possibly empty vector of board cards'''
+        if board_id == self.empty_board_id:
+            return arguments.IntTensor()
+        return self.boards[board_id]
+
+    def get_uniform_strategy(self):
+        ''' Gives the uniform strategy which @{strategy_filling} fills a tree with.
+
+        Return an NxK tensor with the probability of the action (or chance outcome)
+        which leads to each node for every private hand, 1 for the root'''
+        strategy = arguments.Tensor(self.get_node_count(), game_settings.card_count).fill_(1)
+        parent = self.parent[1:]
+        chance_child = self.current_player[parent] == constants.players.chance
+        player_child = chance_child.logical_not()
+        children_strategy = strategy[1:]
+        children_strategy[player_child] = self.children_count[parent[player_child]].view(-1, 1).type_as(strategy).reciprocal()
+        # remove 2 because each player holds one card
+        board_masks = torch.stack([card_tools.get_possible_hand_indexes(self.get_board(board_id)) for board_id in range(self.empty_board_id + 1)])
+        children_strategy[chance_child] = board_masks[self.board_id[1:][chance_child]] / (game_settings.card_count - 2)
+        return strategy
+
+    def get_node(self, index):
+        ''' Gives a @{TreeNode} view of a node, without its children.
+
+        Params:
+            index: the index of the node
+        Return a @{TreeNode} with the fields of the node'''
+        node = TreeNode()
+        node_type = self.node_type[index].item()
+        node.current_player = self.current_player[index].item()
+        node.street = self.street[index].item()
+        node.board = self.get_board(self.board_id[index].item())
+        node.board_string = card_to_string.cards_to_string(node.board)
+        node.bets = self.bets[index]
+        node.pot = self.pot[index]
+        node.depth = self.depth[index].item()
+        parent = self.parent[index].item()
+        # the fields are set as @{PokerTreeBuilder.build_tree} sets them, which leaves `terminal`
+        # unset (None) on all non-terminal nodes but checks
+        if self.terminal[index]:
+            node.terminal = True
+            node.type = node_type
+        elif node_type == constants.node_types.chance_node:
+            node.node_type = node_type
+        elif parent >= 0 and self.current_player[parent] == constants.players.chance:
+            node.node_type = constants.node_types.inner_node
+        elif parent >= 0 and self.action[index] == constants.actions.ccall:
+            node.terminal = False
+            node.type = constants.node_types.check
+        first_child = self.first_child[index].item()
+        node.actions = self.action[first_child : first_child + self.children_count[index].item()]
+        return node
+
+    def to_tree(self, index=0, strategy=None):
+        ''' Gives the subtree rooted at a node as linked @{TreeNode} views, as built by
+        @{PokerTreeBuilder.build_tree}.
+
+        Params:
+            index [opt]: the index of the root of the subtree (default the root)
+            strategy [opt]: an NxK strategy as given by @{get_uniform_strategy} to fill
+                the nodes with (default uniform)
+        Return the root @{TreeNode} of the subtree'''
+        if strategy is None:
+            strategy = self.get_uniform_strategy()
+        node = self.get_node(index)
+        first_child = self.first_child[index].item()
+        children_count = self.children_count[index].item()
+        node.children = []
+        if not node.terminal:
+            node.strategy = strategy[first_child : first_child + children_count]
+        for child in range(first_child, first_child + children_count):
+            child_node = self.to_tree(child, strategy)
+            child_node.parent = node
+            node.children.append(child_node)
+        return node
+
 class PokerTreeBuilder:
     
     def _get_children_nodes_transition_call(self, parent_node):
@@ -78,43 +210,6 @@ class PokerTreeBuilder:
 
         return [chance_node]
 
-    def _get_children_nodes_chance_node(self, parent_node):
-        ''' Creates the children nodes after a chance node.
-
-        Params:
-            parent_node: the chance node
-        Return a list of children nodes
-        '''
-        assert parent_node.current_player == constants.players.chance
-        
-        if self.limit_to_street:
-            return []
-
-        next_boards = card_tools.get_second_round_boards()
-        next_boards_count = next_boards.size(0)
-
-        subtree_height = -1
-        children = []
-
-        # 1.0 iterate over the next possible boards to build the corresponding subtrees
-        for i in range(next_boards_count):
-            next_board = next_boards[i]
-            next_board_string = card_to_string.cards_to_string(next_board)
-
-            child = TreeNode()
-
-            child.node_type = constants.node_types.inner_node
-            child.parent = parent_node
-            child.current_player = constants.players.P1
-            child.street = parent_node.street + 1
-            child.board = next_board
-            child.board_string = next_board_string
-            child.bets = parent_node.bets.clone()
-
-            children.append(child)
-
-        return children
-
     def _fill_additional_attributes(self, node):
         ''' Fills in additional convenience attributes which only depend on existing
         node attributes.
@@ -124,77 +219,56 @@ class PokerTreeBuilder:
         '''
         node.pot = node.bets.min()
 
-    def _get_children_player_node(self, parent_node):
-        ''' Creates the children nodes after a player node.
+    def _set_next_boards(self):
+        ''' Sets the boards which the children of chance nodes are dealt.
+        '''
+        self.next_boards = card_tools.get_second_round_boards()
+        self.next_boards_count = self.next_boards.size(0)
+
+    def _get_children_specs(self, node):
+        ''' Gives the children of a node, which both @{build_tree} and
+        @{build_flat_tree} create their nodes from.
 
         Params:
-            parent_node: the chance node
-        Return a list of children nodes
+            node: the node, with its `current_player`, `street`, `terminal` and `bets`
+                (a tensor or a list)
+        Return a list of `(node_type, terminal, current_player, street, bets, next_board)`
+        tuples, one for each child, where `node_type` is `check` for the non-terminal check child,
+        `bets` is a list and `next_board` is the index of the board of the child in
+        @{card_tools.get_second_round_boards}, or None for the board of the node
         '''
-        assert parent_node.current_player != constants.players.chance
-
-        children = []
-        
-        # 1.0 fold action
-        fold_node = TreeNode()
-        fold_node.type = constants.node_types.terminal_fold
-        fold_node.terminal = True
-        fold_node.current_player = 1 - parent_node.current_player
-        fold_node.street = parent_node.street 
-        fold_node.board = parent_node.board
-        fold_node.board_string = parent_node.board_string
-        fold_node.bets = parent_node.bets.clone()
-        children.append(fold_node)
-        
-        # 2.0 check action
-        if parent_node.current_player == constants.players.P1 and (parent_node.bets[0] == parent_node.bets[1]):
-            check_node = TreeNode()
-            check_node.type = constants.node_types.check
-            check_node.terminal = False
-            check_node.current_player = 1 - parent_node.current_player
-            check_node.street = parent_node.street 
-            check_node.board = parent_node.board
-            check_node.board_string = parent_node.board_string
-            check_node.bets = parent_node.bets.clone()
-            children.append(check_node)
+        if node.terminal:
+            return []
+        types = constants.node_types
+        bets = node.bets if isinstance(node.bets, list) else node.bets.tolist()
+        street = node.street
+
+        # 1.0 chance node -> one child for every next board
+        if node.current_player == constants.players.chance:
+            if self.limit_to_street:
+                return []
+            return [(types.inner_node, False, constants.players.P1, street + 1, bets, board) for board in range(self.next_boards_count)]
+
+        opponent = 1 - node.current_player
+        called_bets = [max(bets), max(bets)]
+        # 2.0 fold action
+        children = [(types.terminal_fold, True, opponent, street, bets, None)]
+        # 3.0 check action
+        if node.current_player == constants.players.P1 and bets[0] == bets[1]:
+            children.append((types.check, False, opponent, street, bets, None))
         # transition call
-        elif parent_node.street == 1 and ( (parent_node.current_player == constants.players.P2 and parent_node.bets[0] == parent_node.bets[1]) \
-            or (parent_node.bets[0] != parent_node.bets[1] and parent_node.bets.max() < arguments.stack) ): 
-            chance_node = TreeNode()
-            chance_node.node_type = constants.node_types.chance_node
-            chance_node.street = parent_node.street
-            chance_node.board = parent_node.board
-            chance_node.board_string = parent_node.board_string
-            chance_node.current_player = constants.players.chance  
-            chance_node.bets = parent_node.bets.clone().fill_(parent_node.bets.max())
-            children.append(chance_node)
+        elif street == 1 and ((node.current_player == constants.players.P2 and bets[0] == bets[1]) or (bets[0] != bets[1] and max(bets) < arguments.stack)):
+            children.append((types.chance_node, False, constants.players.chance, street, called_bets, None))
+        # terminal call - either last street or allin
         else:
-        # 2.0 terminal call - either last street or allin
-            terminal_call_node = TreeNode()
-            terminal_call_node.type = constants.node_types.terminal_call
-            terminal_call_node.terminal = True
-            terminal_call_node.current_player = 1 - parent_node.current_player
-            terminal_call_node.street = parent_node.street 
-            terminal_call_node.board = parent_node.board
-            terminal_call_node.board_string = parent_node.board_string
-            terminal_call_node.bets = parent_node.bets.clone().fill_(parent_node.bets.max())
-            children.append(terminal_call_node)
-
-        # 3.0 bet actions    
-        possible_bets = self.bet_sizing.get_possible_bets(parent_node)
-        
+            children.append((types.terminal_call, True, opponent, street, called_bets, None))
+
+        # 4.0 bet actions
+        possible_bets = self.bet_sizing.get_possible_bets(node)
         if possible_bets.dim() != 0 and possible_bets.size(0) > 0:
             assert possible_bets.size(1) == 2
-            for i in range(possible_bets.size(0)):
-                child = TreeNode()
-                child.parent = parent_node
-                child.current_player = 1 - parent_node.current_player
-                child.street = parent_node.street 
-                child.board = parent_node.board
-                child.board_string = parent_node.board_string
-                child.bets = possible_bets[i]
-                children.append(child)
-        
+            for child_bets in possible_bets.tolist():
+                children.append((types.inner_node, False, opponent, street, child_bets, None))
         return children
 
     def _get_children_nodes(self, parent_node):
@@ -204,21 +278,30 @@ class PokerTreeBuilder:
             parent_node: the node to create children for
         Return a list of children nodes
         '''
-        # is this a transition call node (leading to a chance node)?
-        call_is_transit = parent_node.current_player == constants.players.P2 and parent_node.bets[0] == parent_node.bets[1] and parent_node.street < constants.streets_count
-        
-        chance_node = parent_node.current_player == constants.players.chance
-        # transition call -> create a chance node
-        if parent_node.terminal:
-            return []
-        # chance node
-        elif chance_node:
-            return self._get_children_nodes_chance_node(parent_node)
-        # inner nodes -> handle bet sizes
-        else:
-            return self._get_children_player_node(parent_node)
-
-        assert False
+        children = []
+        for node_type, terminal, current_player, street, bets, next_board in self._get_children_specs(parent_node):
+            child = TreeNode()
+            child.current_player = current_player
+            child.street = street
+            child.bets = arguments.Tensor(bets)
+            if next_board is None:
+                child.board = parent_node.board
+                child.board_string = parent_node.board_string
+            else:
+                child.board = self.next_boards[next_board]
+                child.board_string = card_to_string.cards_to_string(child.board)
+            # terminal nodes and checks only set `type`, chance nodes and their
+            # children only `node_type`, and bets neither
+            if terminal:
+                child.type = node_type
+                child.terminal = True
+            elif node_type == constants.node_types.check:
+                child.type = node_type
+                child.terminal = False
+            elif next_board is not None or node_type == constants.node_types.chance_node:
+                child.node_type = node_type
+            children.append(child)
+        return children
 
     def _build_tree_dfs(self, current_node):
         ''' Recursively build the (sub)tree rooted at the current node.
@@ -250,6 +333,70 @@ class PokerTreeBuilder:
         
         return current_node
 
+    def build_flat_tree(self, params):
+        ''' Builds the tree as a @{FlatTree}.
+
+        Gives the same tree as @{build_tree} without creating an object and small
+        tensors for every node, which dominates building trees with many bet sizes.
+
+        Params:
+            params: table of tree parameters, as for @{build_tree}
+        Return the built @{FlatTree}'''
+        if not params.bet_sizing:
+            params.bet_sizing = BetSizing(arguments.Tensor(arguments.bet_sizing))
+        self.bet_sizing = params.bet_sizing
+        self.limit_to_street = params.limit_to_street
+        self._set_next_boards()
+        # the node which the children are queried for
+        query = TreeNode()
+
+        tree = FlatTree()
+        root = params.root_node
+        root_board_id = tree.empty_board_id if card_tools.board_to_street(root.board) == 1 else card_tools.get_board_index(root.board).item()
+        parent, node_type, terminal, current_player = [-1], [constants.node_types.inner_node], [False], [root.current_player]
+        street, board_id, bets, action, level = [root.street], [root_board_id], [root.bets.tolist()], [0], [0]
+        first_child, children_count = [], []
+
+        # the children are appended as their parents are visited, so the nodes are in breadth-first order
+        index = 0
+        while index < len(parent):
+            query.current_player, query.street, query.bets, query.terminal = current_player[index], street[index], bets[index], terminal[index]
+            children = self._get_children_specs(query)
+            first_child.append(len(parent))
+            children_count.append(len(children))
+            for i, (child_type, child_terminal, child_player, child_street, child_bets, next_board) in enumerate(children):
+                parent.append(index)
+                # the flat tree stores checks as inner nodes, as @{FlatTree.get_node} tells them by their action
+                node_type.append(constants.node_types.inner_node if not child_terminal and child_type == constants.node_types.check else child_type)
+                terminal.append(child_terminal)
+                current_player.append(child_player)
+                street.append(child_street)
+                board_id.append(board_id[index] if next_board is None else next_board)
+                bets.append(child_bets)
+                action.append(constants.actions.fold if i == 0 else constants.actions.ccall if i == 1 else max(child_bets))
+                level.append(level[index] + 1)
+            index += 1
+
+        depth = [1] * len(parent)
+        for index in range(len(parent) - 1, 0, -1):
+            depth[parent[index]] = max(depth[parent[index]], depth[index] + 1)
+
+        tree.parent = torch.tensor(parent, dtype=torch.long)
+        tree.first_child = torch.tensor(first_child, dtype=torch.long)
+        tree.children_count = torch.tensor(children_count, dtype=torch.long)
+        tree.node_type = torch.tensor(node_type, dtype=torch.long)
+        tree.terminal = torch.tensor(terminal, dtype=torch.bool)
+        tree.current_player = torch.tensor(current_player, dtype=torch.long)
+        tree.street = torch.tensor(street, dtype=torch.long)
+        tree.board_id = torch.tensor(board_id, dtype=torch.long)
+        tree.bets = arguments.Tensor(bets)
+        tree.pot = tree.bets.min(dim=1)[0]
+        tree.action = arguments.Tensor(action)
+        tree.level = torch.tensor(level, dtype=torch.long)
+        tree.level_offsets = torch.cat([torch.zeros(1, dtype=torch.long), torch.bincount(tree.level).cumsum(0)])
+        tree.depth = torch.tensor(depth, dtype=torch.long)
+        return tree
+
     def build_tree(self, params):
         ''' Builds the tree.
 
@@ -277,6 +424,7 @@ class PokerTreeBuilder:
 
         self.bet_sizing = params.bet_sizing
         self.limit_to_street = params.limit_to_street
+        self._set_next_boards()
 
         self._build_tree_dfs(root)
         
@@ -258,14 +258,15 @@ class TreeStrategyFilling:
         assert(resolving)
         assert(our_last_action)
         assert(not node.terminal and node.current_player == constants.players.chance)
-        # on chance node we need to recompute values in next round
+        # on chance node we need to recompute values in next round, for all boards at once
+        boards_cf_values = resolving.get_chance_action_cfvs(our_last_action)
         for i in range(len(node.children)):
             child_node = node.children[i]
 
             assert(child_node.current_player == constants.players.P1)
             assert(not child_node.terminal)
             # computing cf_values for the child node
-            child_cf_values = resolving.get_chance_action_cfv(our_last_action, child_node.board)
+            child_cf_values = boards_cf_values[card_tools.get_board_index(child_node.board)]
             # we need to remove impossible hands from the range and then renormalize it
             child_range = _range.clone()
             mask = card_tools.get_possible_hand_indexes(child_node.board)